@@ -58,6 +58,37 @@ COLORS = {
 }
 
 _LOGGER_LOCK_ID = '_logger_print_lock' 
+_LOGS_ARCHIVE_PREFIX = '_logs_archive'
+
+
+def _archive_files(path_zip, files):
+  """
+  Appends `files` to `path_zip` and returns the list of archived files.
+  Runs in a thread pool - zlib releases the GIL while compressing.
+  The files are appended to a temporary copy that replaces the archive only if the
+  whole period was archived: a failure leaves both the archive and the files as they
+  were so the next cleanup does not archive the same files twice.
+  """
+  import shutil
+  from zipfile import ZipFile, ZIP_DEFLATED
+  archived = []
+  path_tmp = path_zip + '.tmp'
+  try:
+    if os.path.isfile(path_zip):
+      shutil.copyfile(path_zip, path_tmp)
+    with ZipFile(file=path_tmp, mode='a', compression=ZIP_DEFLATED) as zip:
+      for path_file in files:
+        if os.path.isfile(path_file):
+          zip.write(path_file, arcname=os.path.basename(path_file))
+          archived.append(path_file)
+      #endfor
+    #endwith
+    os.replace(path_tmp, path_zip)
+  finally:
+    if os.path.isfile(path_tmp):
+      os.remove(path_tmp)
+  return archived
+
 
 class BaseLogger(object):
 
@@ -89,6 +120,8 @@ class BaseLogger(object):
     self._lock_table = OrderedDict({
       _LOGGER_LOCK_ID: threading.Lock(),
       })
+    self._logs_cleanup_thread = None
+    self._logs_cleanup_stop = None
 
     self._base_folder = base_folder
     self._app_folder = app_folder
@@ -292,15 +325,37 @@ class BaseLogger(object):
     return self.file_prefix
   
   
-  def cleanup_logs(self, archive_older_than_days=2):
+  def cleanup_logs(self, archive_older_than_days=2, archive_period='month',
+                   max_archives_gb=None, nr_workers=None):
+    """
+    Archives the logs older than `archive_older_than_days` days in per-day or
+    per-month zip archives (`_logs_archive_<YYYYMM|YYYYMMDD>.zip`). Each archive
+    is written by a different worker thread so several periods are compressed in
+    parallel and no single ever-growing archive is re-opened.
+
+    Parameters
+    ----------
+    archive_older_than_days : int, optional
+      The default is 2.
+
+    archive_period : str, optional
+      'day' or 'month'. The default is 'month'.
+
+    max_archives_gb : float, optional
+      If provided, the oldest archives are deleted while the total size of the
+      archives exceeds this value. The default is None (keep everything).
+
+    nr_workers : int, optional
+      Max number of worker threads. The default is None (nr of cpus).
+    """
+    assert archive_period in ['day', 'month'], "Unknown archive_period '{}'".format(archive_period)
     self.P("Cleaning logs older than {} days...".format(archive_older_than_days), color='y')
     str_old_date = (dt.today() - timedelta(days=archive_older_than_days)).strftime('%Y%m%d')
     int_old_date = int(str_old_date)
+    period_len = 8 if archive_period == 'day' else 6
     logs = os.listdir(self._logs_dir)
-    archive_list = []
-    show_list = []
-    zip_fn = os.path.join(self._logs_dir, "_logs_archive.zip")
-    for fn in logs:
+    dct_archives = OrderedDict()
+    for fn in sorted(logs):
       if fn[-4:] == '.txt':
         str_date = fn[:8]
         int_date = None
@@ -310,18 +365,95 @@ class BaseLogger(object):
           except:
             pass
         if int_date is not None and int_date < int_old_date:
-          full_fn = os.path.join(self._logs_dir, fn)
-          archive_list.append(full_fn)
-          show_list.append(fn)
-    if len(archive_list) > 0:
-      self.P("  Archiving {} logs...".format(len(archive_list)), color='y')
-      self.add_files_to_zip(zip_fn, archive_list)
-      for full_fn in archive_list:
+          zip_fn = os.path.join(self._logs_dir, "{}_{}.zip".format(_LOGS_ARCHIVE_PREFIX, str_date[:period_len]))
+          if zip_fn not in dct_archives:
+            dct_archives[zip_fn] = []
+          dct_archives[zip_fn].append(os.path.join(self._logs_dir, fn))
+    nr_files = sum(len(x) for x in dct_archives.values())
+    if nr_files > 0:
+      self.P("  Archiving {} logs in {} archives...".format(nr_files, len(dct_archives)), color='y')
+      archived = []
+      if len(dct_archives) == 1:
+        for zip_fn, files in dct_archives.items():
+          try:
+            archived += _archive_files(zip_fn, files)
+          except Exception as e:
+            self.P("  Exception occured while archiving logs: {}".format(e), color='r')
+      else:
+        # threads and not processes: forking a process that runs server threads is unsafe
+        from concurrent.futures import ThreadPoolExecutor
+        nr_workers = min(nr_workers or os.cpu_count() or 1, len(dct_archives))
+        with ThreadPoolExecutor(max_workers=nr_workers) as executor:
+          futures = [
+            executor.submit(_archive_files, zip_fn, files)
+            for zip_fn, files in dct_archives.items()
+          ]
+          for future in futures:
+            try:
+              archived += future.result()
+            except Exception as e:
+              self.P("  Exception occured while archiving logs: {}".format(e), color='r')
+      for full_fn in archived:
         os.remove(full_fn)
+      self.P("  Archived {}/{} logs.".format(len(archived), nr_files), color='y')
     else:
       self.P("  Nothing to clean.")
+
+    if max_archives_gb is not None:
+      self._apply_logs_archives_retention(max_archives_gb)
+    return
+
+  def _apply_logs_archives_retention(self, max_archives_gb):
+    # archive names are chronologically sortable, the legacy single archive is the first one
+    archives = sorted([
+      os.path.join(self._logs_dir, x) for x in os.listdir(self._logs_dir)
+      if x.startswith(_LOGS_ARCHIVE_PREFIX) and x.endswith('.zip')
+    ])
+    sizes = [os.path.getsize(x) for x in archives]
+    total = sum(sizes)
+    max_bytes = max_archives_gb * 1024**3
+    for fn, size in zip(archives, sizes):
+      if total <= max_bytes:
+        break
+      self.P("  Deleting old logs archive '{}' ({:.1f} MB)".format(
+        os.path.basename(fn), size / 1024**2), color='y'
+      )
+      os.remove(fn)
+      total -= size
+    return
+
+  def start_logs_cleanup_thread(self, interval_hours=24, min_idle_seconds=60, **kwargs):
+    """
+    Starts a daemon thread that runs `cleanup_logs(**kwargs)` every `interval_hours`
+    hours as soon as the logger is idle (nothing logged in the last `min_idle_seconds`).
+    """
+    if self._logs_cleanup_thread is not None and self._logs_cleanup_thread.is_alive():
+      self.P("Logs cleanup thread already running", color='r')
+      return
+    self._logs_cleanup_stop = threading.Event()
+
+    def _run():
+      while not self._logs_cleanup_stop.wait(interval_hours * 3600):
+        while (tm() - self.last_time) < min_idle_seconds:
+          if self._logs_cleanup_stop.wait(min_idle_seconds):
+            return
+        try:
+          self.cleanup_logs(**kwargs)
+        except Exception as e:
+          self.P("Exception in logs cleanup thread: {}".format(e), color='r')
+      return
+
+    self._logs_cleanup_thread = threading.Thread(target=_run, name='logs_cleanup', daemon=True)
+    self._logs_cleanup_thread.start()
+    self.P("Started logs cleanup thread every {} hrs".format(interval_hours), color='y')
+    return
+
+  def stop_logs_cleanup_thread(self):
+    if self._logs_cleanup_thread is not None:
+      self._logs_cleanup_stop.set()
+      self._logs_cleanup_thread.join()
+      self._logs_cleanup_thread = None
     return
-                    
 
 
   def _logger(self, logstr, show=True, noprefix=False, show_time=False, color=None):
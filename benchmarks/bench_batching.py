@@ -0,0 +1,125 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.  
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI
+@project: 
+@description:
+  Throughput / latency of the model server workers with and without micro-batching,
+  using `FakeBatchWorker` (no Flask, requests are sent by client threads directly
+  to the workers pool). Run from the parent folder of `libraries`:
+    python libraries/benchmarks/bench_batching.py
+"""
+
+import os
+import sys
+sys.path.append(os.getcwd())
+
+import argparse
+import tempfile
+import threading
+import numpy as np
+
+from time import perf_counter
+
+from libraries import Logger
+from libraries.model_server_v2.workers_pool import WorkersPool
+from libraries.model_server_v2.micro_batcher import MicroBatcher
+from libraries.model_server_v2.example_endpoints.fake_batch import FakeBatchWorker, _CONFIG
+
+
+def create_pool(log, nr_workers):
+  pool = WorkersPool()
+  for i in range(nr_workers):
+    pool.add_worker(FakeBatchWorker(
+      log=log,
+      default_config=_CONFIG,
+      verbosity_level=0,
+      worker_id=i,
+    ))
+  return pool
+
+
+def run_clients(func, nr_clients, nr_requests):
+  """ `nr_clients` threads that send `nr_requests` requests each; returns (elapsed, latencies) """
+  latencies = [[] for _ in range(nr_clients)]
+
+  def _client(idx):
+    for i in range(nr_requests):
+      t_start = perf_counter()
+      func({'INPUT_VALUE': i}, idx * nr_requests + i)
+      latencies[idx].append(perf_counter() - t_start)
+    return
+
+  threads = [threading.Thread(target=_client, args=(i,)) for i in range(nr_clients)]
+  t_start = perf_counter()
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+  elapsed = perf_counter() - t_start
+  return elapsed, np.concatenate(latencies)
+
+
+def bench_batching(log, nr_workers, nr_clients, nr_requests, max_batch_size, max_wait_ms):
+  pool = create_pool(log, nr_workers)
+
+  def predict_single(inputs, counter):
+    wid = pool.acquire()
+    try:
+      return pool.workers[wid].execute(inputs=inputs, counter=counter)
+    finally:
+      pool.release(wid)
+
+  batcher = MicroBatcher(workers_pool=pool, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+  def predict_batched(inputs, counter):
+    return batcher.submit(inputs=inputs, counter=counter)[1]
+
+  results = []
+  for name, func in [('single', predict_single), ('batched', predict_batched)]:
+    elapsed, latencies = run_clients(func, nr_clients=nr_clients, nr_requests=nr_requests)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    results.append((name, len(latencies) / elapsed, p50, p95, p99))
+  #endfor
+  log.P("Workers: {}, clients: {}, MAX_BATCH_SIZE: {}, MAX_WAIT_MS: {}, avg batch: {:.1f}".format(
+    nr_workers, nr_clients, max_batch_size, max_wait_ms, batcher.avg_batch_size
+  ))
+  for name, throughput, p50, p95, p99 in results:
+    log.P("  {:>8}: {:8.1f} req/s  p50 {:7.1f}ms  p95 {:7.1f}ms  p99 {:7.1f}ms".format(
+      name, throughput, p50, p95, p99
+    ))
+  return results
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--nr_workers', type=int, default=2)
+  parser.add_argument('--nr_clients', type=int, default=32)
+  parser.add_argument('--nr_requests', type=int, default=20)
+  parser.add_argument('--max_batch_size', type=int, default=16)
+  parser.add_argument('--max_wait_ms', type=float, default=5)
+  args = parser.parse_args()
+
+  log = Logger(lib_name='BBTC', base_folder=tempfile.mkdtemp(), app_folder='_bench', TF_KERAS=False)
+
+  bench_batching(
+    log,
+    nr_workers=args.nr_workers,
+    nr_clients=args.nr_clients,
+    nr_requests=args.nr_requests,
+    max_batch_size=args.max_batch_size,
+    max_wait_ms=args.max_wait_ms,
+  )
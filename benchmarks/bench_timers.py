@@ -0,0 +1,168 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.  
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI
+@project: 
+@description:
+  Micro-benchmarks for the timers mixin. Run from the parent folder of `libraries`:
+    python libraries/benchmarks/bench_timers.py
+
+  Empty block overhead (us/block, best of 5, Xeon VM, Python 3.11):
+                       before handles   lock-free fast path
+    start/end_timer         1.96              0.74
+    handle                    -               0.47
+    with timer                -               0.59
+    @timed                    -               0.58
+"""
+
+import os
+import sys
+sys.path.append(os.getcwd())
+
+import argparse
+import tempfile
+
+from time import perf_counter
+
+from libraries import Logger
+
+
+def bench_start_end_scaling(log, nr_iters, lst_nr_timers):
+  """
+  Per start/end pair overhead of one timer while the section holds more and more timers
+  """
+  results = []
+  for nr_timers in lst_nr_timers:
+    section = 'bench_scaling_{}'.format(nr_timers)
+    for i in range(nr_timers):
+      log.start_timer('t{}'.format(i), section=section)
+      log.end_timer('t{}'.format(i), section=section)
+    t_start = perf_counter()
+    for _ in range(nr_iters):
+      log.start_timer('t0', section=section)
+      log.end_timer('t0', section=section)
+    elapsed = perf_counter() - t_start
+    results.append((nr_timers, elapsed / nr_iters * 1e6))
+  #endfor
+  log.P("start_timer/end_timer overhead vs timers in section:")
+  for nr_timers, us_per_call in results:
+    log.P("  {:>6} timers: {:.2f} us/pair".format(nr_timers, us_per_call))
+  return results
+
+
+def bench_empty_block(log, nr_iters):
+  """
+  Overhead of timing an empty block with the string API, the pre-resolved handle,
+  the context manager and the decorator
+  """
+  section = 'bench_empty'
+  handle = log.timer('empty', section=section)
+
+  @log.timed('empty_deco', section=section)
+  def empty_func():
+    return
+
+  def run_strings():
+    for _ in range(nr_iters):
+      log.start_timer('empty', section=section)
+      log.end_timer('empty', section=section)
+
+  def run_handle():
+    start, end = handle.start, handle.end
+    for _ in range(nr_iters):
+      start()
+      end()
+
+  def run_context():
+    for _ in range(nr_iters):
+      with handle:
+        pass
+
+  def run_decorator():
+    for _ in range(nr_iters):
+      empty_func()
+
+  results = []
+  for name, func in [('start/end_timer', run_strings), ('handle', run_handle),
+                     ('with timer', run_context), ('@timed', run_decorator)]:
+    t_start = perf_counter()
+    func()
+    elapsed = perf_counter() - t_start
+    results.append((name, elapsed / nr_iters * 1e6))
+  #endfor
+  log.P("Empty block timing overhead:")
+  for name, us_per_call in results:
+    log.P("  {:>16}: {:.2f} us/block".format(name, us_per_call))
+  return results
+
+
+def bench_disabled(log, nr_iters):
+  """
+  Cost of the timers APIs with DEBUG on vs off and with a disabled section
+  """
+  section = 'bench_disabled'
+  handle = log.timer('t', section=section)
+
+  def run_strings():
+    for _ in range(nr_iters):
+      log.start_timer('t', section=section)
+      log.end_timer('t', section=section)
+
+  def run_context():
+    for _ in range(nr_iters):
+      with log.timer('t', section=section):
+        pass
+
+  def run_handle():
+    start, end = handle.start, handle.end
+    for _ in range(nr_iters):
+      start()
+      end()
+
+  def run_empty():
+    for _ in range(nr_iters):
+      pass
+
+  results = []
+  for state in ['DEBUG on', 'section off', 'DEBUG off']:
+    log.DEBUG = state != 'DEBUG off'
+    if state == 'section off':
+      log.disable_timers_section(section)
+    for name, func in [('start/end_timer', run_strings), ('with log.timer', run_context),
+                       ('handle', run_handle), ('empty loop', run_empty)]:
+      t_start = perf_counter()
+      func()
+      elapsed = perf_counter() - t_start
+      results.append((state, name, elapsed / nr_iters * 1e6))
+    log.enable_timers_section(section)
+  #endfor
+  log.DEBUG = True
+  log.P("Timers cost with DEBUG on/off:")
+  for state, name, us_per_call in results:
+    log.P("  {:>11} {:>16}: {:.3f} us/block".format(state, name, us_per_call))
+  return results
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--nr_iters', type=int, default=100_000)
+  args = parser.parse_args()
+
+  log = Logger(lib_name='BTMR', base_folder=tempfile.mkdtemp(), app_folder='_bench', TF_KERAS=False)
+
+  bench_start_end_scaling(log, nr_iters=args.nr_iters, lst_nr_timers=[1, 10, 100, 1000, 5000])
+  bench_empty_block(log, nr_iters=args.nr_iters)
+  bench_disabled(log, nr_iters=args.nr_iters)
@@ -0,0 +1,80 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.  
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI
+@project: 
+@description:
+  Throughput benchmark for `add_files_to_zip` - sequential vs parallel deflate
+  and 'auto' (stored) vs 'deflated' mode on a mix of compressible and
+  incompressible files. Run from the parent folder of `libraries`:
+    python libraries/benchmarks/bench_zip.py
+"""
+
+import os
+import sys
+sys.path.append(os.getcwd())
+
+import argparse
+import tempfile
+import numpy as np
+
+from time import perf_counter
+
+from libraries import Logger
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--nr_files', type=int, default=64)
+  parser.add_argument('--file_mb', type=float, default=4)
+  parser.add_argument('--nr_workers', type=int, default=os.cpu_count())
+  args = parser.parse_args()
+
+  tmp_folder = tempfile.mkdtemp()
+  log = Logger(lib_name='BZIP', base_folder=tmp_folder, app_folder='_bench', TF_KERAS=False)
+
+  file_size = int(args.file_mb * 1024**2)
+  files = []
+  for i in range(args.nr_files):
+    if i % 2 == 0:
+      # compressible - repetitive text-like data
+      data = np.random.randint(97, 105, size=file_size, dtype=np.uint8).tobytes()
+      fn = os.path.join(tmp_folder, 'file_{:03d}.txt'.format(i))
+    else:
+      # incompressible - already compressed-like data
+      data = np.random.bytes(file_size)
+      fn = os.path.join(tmp_folder, 'file_{:03d}.bin'.format(i))
+    with open(fn, 'wb') as fh:
+      fh.write(data)
+    files.append(fn)
+  #endfor
+  total_mb = args.nr_files * args.file_mb
+
+  results = []
+  for compression in ['deflated', 'auto']:
+    for nr_workers in sorted(set([1, args.nr_workers])):
+      path_zip = os.path.join(tmp_folder, 'bench_{}_{}.zip'.format(compression, nr_workers))
+      t_start = perf_counter()
+      log.add_files_to_zip(path_zip, files, compression=compression, nr_workers=nr_workers)
+      elapsed = perf_counter() - t_start
+      results.append((compression, nr_workers, elapsed, os.path.getsize(path_zip) / 1024**2))
+    #endfor
+  #endfor
+
+  log.P("Results for {} files, {:.1f} MB total:".format(args.nr_files, total_mb))
+  for compression, nr_workers, elapsed, zip_mb in results:
+    log.P("  {:>8} workers={:<3} {:6.2f}s  {:7.1f} MB/s  zip: {:.1f} MB".format(
+      compression, nr_workers, elapsed, total_mb / elapsed, zip_mb
+    ))
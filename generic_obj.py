@@ -146,13 +146,14 @@ class LummetryObject(object):
     #endif
     return _r
 
-  def start_timer(self, tmr_id):
-    return self.log.start_timer(sname=self.__name__ + '_' + tmr_id)
+  def start_timer(self, tmr_id, section=None):
+    return self.log.start_timer(sname=self.__name__ + '_' + tmr_id, section=section)
 
-  def end_timer(self, tmr_id, skip_first_timing=True):
+  def end_timer(self, tmr_id, skip_first_timing=True, section=None):
     return self.log.end_timer(
       sname=self.__name__ + '_' + tmr_id,
-      skip_first_timing=skip_first_timing
+      skip_first_timing=skip_first_timing,
+      section=section,
     )
 
   def raise_error(self, error_text):
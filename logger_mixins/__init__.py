@@ -134,6 +134,11 @@ try:
 except ModuleNotFoundError:
   _ProcessMixin = None
 
+try:
+  from .profiler_mixin import _SamplingProfilerMixin
+except ModuleNotFoundError:
+  _SamplingProfilerMixin = None
+
 try:
   from .public_tfkeras_mixin import _PublicTFKerasMixin
 except ModuleNotFoundError:
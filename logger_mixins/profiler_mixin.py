@@ -0,0 +1,245 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.  
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI
+@project: 
+@description:
+"""
+
+import os
+import sys
+import threading
+
+from time import perf_counter
+
+
+DEFAULT_PROFILER_INTERVAL_MS = 10
+DEFAULT_PROFILER_MAX_DEPTH = 128
+
+# leaf functions of threads that are just waiting - not interesting for the profile.
+# Matched by module file and function name so that user functions with the same
+# names (`get`, `wait`, ...) are still profiled
+PROFILER_IDLE_FUNCTIONS = {
+  'threading.py': {'wait', '_wait_for_tstate_lock'},
+  'queue.py': {'get', 'put'},
+  'selectors.py': {'select'},
+  'socket.py': {'accept', 'readinto'},
+  'socketserver.py': {'serve_forever'},
+  'ssl.py': {'read', 'recv', 'recv_into'},
+  'connection.py': {'_recv_bytes', '_recv', 'recv', '_poll', 'poll', 'wait'},
+  'subprocess.py': {'wait', '_wait', '_try_wait'},
+}
+
+
+class _SamplingProfilerMixin(object):
+  """
+  Mixin for sampling profiler functionalities that are attached to `libraries.logger.Logger`.
+
+  This mixin cannot be instantiated because it is built just to provide some additional
+  functionalities for `libraries.logger.Logger`
+
+  In this mixin we can use any attribute/method of the Logger.
+  """
+
+  def __init__(self):
+    super(_SamplingProfilerMixin, self).__init__()
+    self._profiler_thread = None
+    self._profiler_stop = None
+    self._profiler_stacks = {} # (thread name, code objects root->leaf) -> count
+    self._profiler_nr_samples = 0
+    self._profiler_elapsed = 0 # seconds spent by the sampler itself
+    self._profiler_start_time = None
+    self._profiler_labels = {}
+    self._profiler_idle_codes = {} # code object -> is idle
+    return
+
+  @staticmethod
+  def _get_frame_label(code):
+    return '{} ({}:{})'.format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+  def _is_idle_code(self, code):
+    is_idle = self._profiler_idle_codes.get(code)
+    if is_idle is None:
+      functions = PROFILER_IDLE_FUNCTIONS.get(os.path.basename(code.co_filename), ())
+      is_idle = code.co_name in functions
+      self._profiler_idle_codes[code] = is_idle
+    return is_idle
+
+  def _sample_stacks(self, own_ident, thread_names, max_depth, include_idle):
+    stacks = self._profiler_stacks
+    for tid, frame in sys._current_frames().items():
+      if tid == own_ident:
+        continue
+      if not include_idle and self._is_idle_code(frame.f_code):
+        continue
+      codes = []
+      while frame is not None and len(codes) < max_depth:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+      codes.reverse()
+      if tid not in thread_names:
+        thread_names.update({t.ident: t.name for t in threading.enumerate()})
+      key = (thread_names.get(tid, str(tid)), tuple(codes))
+      stacks[key] = stacks.get(key, 0) + 1
+    #endfor
+    self._profiler_nr_samples += 1
+    return
+
+  def start_sampling_profiler(self, interval_ms=DEFAULT_PROFILER_INTERVAL_MS,
+                              max_depth=DEFAULT_PROFILER_MAX_DEPTH,
+                              include_idle=False,
+                              duration=None):
+    """
+    Starts a daemon thread that samples the stacks of all the threads every `interval_ms`
+    (`sys._current_frames`) and aggregates them as collapsed stacks. Nothing has to be
+    instrumented so it can be started/stopped on a running server.
+
+    Parameters
+    ----------
+    interval_ms : float, optional
+      Sampling interval. The default is 10.
+
+    max_depth : int, optional
+      Max number of frames kept from each stack (leaf side). The default is 128.
+
+    include_idle : bool, optional
+      Also count the threads that are waiting (locks, sockets, sleep). The default is False.
+
+    duration : float, optional
+      If given, the profiler stops and saves the results after `duration` seconds.
+      The default is None (until `stop_sampling_profiler`).
+    """
+    if self._profiler_thread is not None and self._profiler_thread.is_alive():
+      self.P("Sampling profiler already running", color='r')
+      return
+    self._profiler_stop = threading.Event()
+    self._profiler_stacks = {}
+    self._profiler_nr_samples = 0
+    self._profiler_elapsed = 0
+    self._profiler_start_time = perf_counter()
+    interval = interval_ms / 1000
+
+    def _run():
+      own_ident = threading.get_ident()
+      thread_names = {}
+      t_end = None if duration is None else perf_counter() + duration
+      while not self._profiler_stop.wait(interval):
+        t_start = perf_counter()
+        if self._profiler_nr_samples % 1000 == 0:
+          thread_names = {} # thread ids can be reused by new threads
+        try:
+          self._sample_stacks(own_ident, thread_names, max_depth, include_idle)
+        except Exception as e:
+          self.P("Exception in sampling profiler: {}".format(e), color='r')
+        self._profiler_elapsed += perf_counter() - t_start
+        if t_end is not None and t_start > t_end:
+          threading.Thread(target=self.stop_sampling_profiler, daemon=True).start()
+          break
+      #endwhile
+      return
+
+    self._profiler_thread = threading.Thread(target=_run, name='sampling_profiler', daemon=True)
+    self._profiler_thread.start()
+    self.P("Started sampling profiler every {}ms".format(interval_ms), color='y')
+    return
+
+  def get_sampling_profile(self):
+    """ returns the collapsed stacks as a dict 'thread;frame;...;leaf' -> nr samples """
+    dct_folded = {}
+    for (thread_name, codes), count in list(self._profiler_stacks.items()):
+      labels = [thread_name]
+      for code in codes:
+        label = self._profiler_labels.get(code)
+        if label is None:
+          label = self._get_frame_label(code)
+          self._profiler_labels[code] = label
+        labels.append(label)
+      key = ';'.join(x.replace(';', ':') for x in labels)
+      dct_folded[key] = dct_folded.get(key, 0) + count
+    return dct_folded
+
+  def get_sampling_profile_top(self, top_n=30):
+    """
+    Returns the `top_n` functions by self samples (leaf) and by total samples
+    (function anywhere on the stack) as lists of (label, samples, percent)
+    """
+    dct_self, dct_total = {}, {}
+    nr_stacks = 0
+    for key, count in self.get_sampling_profile().items():
+      labels = key.split(';')[1:]
+      if len(labels) == 0:
+        continue
+      nr_stacks += count
+      dct_self[labels[-1]] = dct_self.get(labels[-1], 0) + count
+      for label in set(labels):
+        dct_total[label] = dct_total.get(label, 0) + count
+    #endfor
+    def _top(dct):
+      items = sorted(dct.items(), key=lambda x: x[1], reverse=True)[:top_n]
+      return [(label, count, count / max(nr_stacks, 1) * 100) for label, count in items]
+    return _top(dct_self), _top(dct_total)
+
+  def stop_sampling_profiler(self, save=True, top_n=30, fname=None):
+    """
+    Stops the sampling profiler and saves in `_output`:
+      - `<fname>.folded` : collapsed stacks (flamegraph.pl / speedscope compatible)
+      - `<fname>_top.txt` : top `top_n` functions by self and total samples
+
+    Returns
+    -------
+    dict : paths of the saved files (empty if `save=False`)
+    """
+    if self._profiler_thread is None:
+      return {}
+    self._profiler_stop.set()
+    if self._profiler_thread is not threading.current_thread():
+      self._profiler_thread.join()
+    self._profiler_thread = None
+
+    wall_time = perf_counter() - self._profiler_start_time
+    overhead = self._profiler_elapsed / wall_time * 100 if wall_time > 0 else 0
+    self.P("Sampling profiler stopped: {} samples in {:.1f}s (sampler overhead {:.2f}%)".format(
+      self._profiler_nr_samples, wall_time, overhead
+    ))
+    if not save:
+      return {}
+
+    if fname is None:
+      fname = '{}_profile'.format(self.now_str())
+    path_folded = os.path.join(self.get_output_folder(), fname + '.folded')
+    with open(path_folded, 'w') as fh:
+      for key, count in sorted(self.get_sampling_profile().items()):
+        fh.write('{} {}\n'.format(key, count))
+
+    top_self, top_total = self.get_sampling_profile_top(top_n=top_n)
+    lines = [
+      "Sampling profile: {} samples in {:.1f}s, sampler overhead {:.2f}%".format(
+        self._profiler_nr_samples, wall_time, overhead
+      ),
+      "",
+      "Top {} by self samples:".format(top_n),
+    ]
+    lines += ["  {:6.2f}% {:>8}  {}".format(prc, count, label) for label, count, prc in top_self]
+    lines += ["", "Top {} by total samples:".format(top_n)]
+    lines += ["  {:6.2f}% {:>8}  {}".format(prc, count, label) for label, count, prc in top_total]
+    path_top = os.path.join(self.get_output_folder(), fname + '_top.txt')
+    with open(path_top, 'w') as fh:
+      fh.write('\n'.join(lines) + '\n')
+
+    for line in lines[2:min(len(lines), 13)]:
+      self.P(line)
+    self.P("Saved profile: {}, {}".format(path_folded, path_top))
+    return {'FOLDED': path_folded, 'TOP': path_top}
@@ -20,9 +20,25 @@ Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Res
 """
 
 import os
+import sys
 import pickle
 import numpy as np
 
+ZIP_STORED_EXTENSIONS = [
+  '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.pklz',
+  '.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp3', '.mp4', '.avi', '.mkv', '.mov',
+]
+ZIP_ENTROPY_SAMPLE = 64 * 1024
+ZIP_ENTROPY_THRESHOLD = 7.5 # bits per byte - above this the data is considered already compressed
+ZIP_MAX_PARALLEL_MEMBER_SIZE = 64 * 1024**2
+# pre-deflated members are written with `ZipFile` internals checked up to this Python version
+ZIP_INTERNALS_MAX_PYTHON = (3, 13)
+ZIP_INTERNALS = ['fp', 'start_dir', 'filelist', 'NameToInfo', '_writecheck', '_didModify', '_seekable', '_allowZip64']
+
+STREAM_MAGIC = b'LZS1'
+STREAM_ALGORITHMS = {'zlib': 0, 'bz2': 1, 'lzma': 2}
+STREAM_CHUNK_SIZE = 1024**2
+
 class _GeneralSerializationMixin(object):
   """
   Mixin for general serialization functionalities that are attached to `libraries.logger.Logger`:
@@ -173,20 +189,105 @@ class _GeneralSerializationMixin(object):
         pickle.dump(data, handle, protocol=pickle.HIGHEST_PROTOCOL)
   
   
-  def add_file_to_zip(self, path_zip, path_file):
+  @staticmethod
+  def _zip_member_is_compressed(path_file):
+    """
+    Returns True if `path_file` is most likely already compressed - either by
+    extension or by the byte entropy of its first `ZIP_ENTROPY_SAMPLE` bytes
+    """
+    ext = os.path.splitext(path_file)[1].lower()
+    if ext in ZIP_STORED_EXTENSIONS:
+      return True
+    with open(path_file, 'rb') as fh:
+      sample = fh.read(ZIP_ENTROPY_SAMPLE)
+    if len(sample) < 1024:
+      return False
+    counts = np.bincount(np.frombuffer(sample, dtype=np.uint8), minlength=256)
+    probs = counts[counts > 0] / len(sample)
+    entropy = -(probs * np.log2(probs)).sum()
+    return entropy >= ZIP_ENTROPY_THRESHOLD
+
+  def _get_zip_member_compression(self, path_file, compression):
+    from zipfile import ZIP_STORED, ZIP_DEFLATED
+    if compression == 'auto':
+      return ZIP_STORED if self._zip_member_is_compressed(path_file) else ZIP_DEFLATED
+    elif compression == 'stored':
+      return ZIP_STORED
+    elif compression == 'deflated':
+      return ZIP_DEFLATED
+    raise ValueError("Unknown zip compression '{}' - valid options are 'auto', 'deflated', 'stored'".format(
+      compression))
+
+  @staticmethod
+  def _deflate_zip_member(path_file, compresslevel):
+    """
+    Reads and raw-deflates a file (runs in the worker pool - zlib releases the GIL)
+    """
+    import zlib
+    with open(path_file, 'rb') as fh:
+      data = fh.read()
+    level = compresslevel if compresslevel is not None else zlib.Z_DEFAULT_COMPRESSION
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    return len(data), zlib.crc32(data), compressed
+
+  @staticmethod
+  def _can_write_deflated_zip_member(zip):
+    """
+    True if the `ZipFile` internals used by `_write_deflated_zip_member` are
+    available - otherwise the members are compressed by `ZipFile.write`
+    """
+    if sys.version_info[:2] > ZIP_INTERNALS_MAX_PYTHON:
+      return False
+    if not all(hasattr(zip, attr) for attr in ZIP_INTERNALS):
+      return False
+    return zip._seekable
+
+  @staticmethod
+  def _write_deflated_zip_member(zip, path_file, arcname, file_size, crc, compressed):
+    """
+    Appends an already deflated member to an open (writable) `ZipFile` - the same
+    steps `ZipFile.open(..., 'w')` does, minus the compression.
+    """
+    from zipfile import ZipInfo, ZIP_DEFLATED, ZIP64_LIMIT, LargeZipFile
+    zinfo = ZipInfo.from_file(path_file, arcname=arcname)
+    zinfo.compress_type = ZIP_DEFLATED
+    zinfo.file_size = file_size
+    zinfo.compress_size = len(compressed)
+    zinfo.CRC = crc
+    zip64 = file_size > ZIP64_LIMIT or zinfo.compress_size > ZIP64_LIMIT
+    if zip64 and not zip._allowZip64:
+      raise LargeZipFile("Member '{}' requires ZIP64 extensions".format(arcname))
+    zip._writecheck(zinfo)
+    zip._didModify = True
+    zip.fp.seek(zip.start_dir)
+    zinfo.header_offset = zip.fp.tell()
+    zip.fp.write(zinfo.FileHeader(zip64))
+    zip.fp.write(compressed)
+    zip.start_dir = zip.fp.tell()
+    zip.filelist.append(zinfo)
+    zip.NameToInfo[zinfo.filename] = zinfo
+    return
+
+  def add_file_to_zip(self, path_zip, path_file, compression='auto', compresslevel=None):
+    """
+    Appends a file to `path_zip`. The file is streamed so it can be larger than RAM.
+
+    compression: 'auto' (store already compressed files), 'deflated' or 'stored'
+    compresslevel: deflate level 0-9, default None (zlib default)
+    """
     try:
-      from zipfile import ZipFile, ZIP_DEFLATED
+      from zipfile import ZipFile
       if not os.path.isfile(path_file):
         self.P("Adding to zip '{}' failed: missing '{}' ".format(path_zip, path_file), color='r')
         return
-      zip = ZipFile(
-        file=path_zip, 
-        mode='a', 
-        compression=ZIP_DEFLATED
-      )
-      self.P("Archiving (zip) '{}' => {}".format(path_file, path_zip), color='y')
-      zip.write(path_file, arcname=os.path.basename(path_file))
-      zip.close()
+      compress_type = self._get_zip_member_compression(path_file, compression)
+      with ZipFile(file=path_zip, mode='a') as zip:
+        self.P("Archiving (zip) '{}' => {}".format(path_file, path_zip), color='y')
+        zip.write(
+          path_file, arcname=os.path.basename(path_file),
+          compress_type=compress_type, compresslevel=compresslevel,
+        )
     except Exception as e:
       self.P("Exception occured while archiving '{}' in '{}': {}".format(
         path_file, path_zip, e), color='r'
@@ -194,49 +295,292 @@ class _GeneralSerializationMixin(object):
       return
     return path_zip
     
-  def add_files_to_zip(self, path_zip, files):
+  def add_files_to_zip(self, path_zip, files, compression='auto', compresslevel=None,
+                       nr_workers=1, max_parallel_file_size=ZIP_MAX_PARALLEL_MEMBER_SIZE):
+    """
+    Appends `files` to `path_zip` (members are written in the order of `files`).
+
+    Parameters
+    ----------
+    compression : str, optional
+      'auto' (store already compressed files detected by extension or entropy),
+      'deflated' or 'stored'. The default is 'auto'.
+
+    compresslevel : int, optional
+      Deflate level 0-9. The default is None (zlib default).
+
+    nr_workers : int, optional
+      If > 1 the members are deflated in parallel on a worker pool and written
+      in order. The default is 1.
+
+    max_parallel_file_size : int, optional
+      Files larger than this (bytes) are not loaded in memory but streamed
+      directly in the archive. The default is 64 MB.
+    """
+    executor = None
     try:
       from zipfile import ZipFile, ZIP_DEFLATED
-      zip = ZipFile(
-        file=path_zip, 
-        mode='a', 
-        compression=ZIP_DEFLATED
-      )
+      from collections import deque
+      from concurrent.futures import ThreadPoolExecutor
+
       self.P("  Adding {} files to archive (zip) {}".format(
         len(files),
         path_zip, 
         ), color='y'
       )
       written = 0
-      for path_file in files:
-        if not os.path.isfile(path_file):
-          self.P("    Adding to zip '{}' failed: missing '{}' ".format(path_zip, path_file), color='r')
-          continue        
-        zip.write(path_file, arcname=os.path.basename(path_file))
-        print(".",  flush=True, end='')
-        written += 1
-      zip.close()
+      pending = deque()
+      max_pending = 2 * nr_workers # bounds the memory used by compressed members
+
+      def _write_pending(zip, nr_keep):
+        while len(pending) > nr_keep:
+          path_file, future = pending.popleft()
+          self._write_deflated_zip_member(zip, path_file, os.path.basename(path_file), *future.result())
+        return
+
+      with ZipFile(file=path_zip, mode='a') as zip:
+        if nr_workers > 1 and self._can_write_deflated_zip_member(zip):
+          executor = ThreadPoolExecutor(max_workers=nr_workers)
+        for path_file in files:
+          if not os.path.isfile(path_file):
+            self.P("    Adding to zip '{}' failed: missing '{}' ".format(path_zip, path_file), color='r')
+            continue
+          compress_type = self._get_zip_member_compression(path_file, compression)
+          if (
+            executor is not None and compress_type == ZIP_DEFLATED and
+            os.path.getsize(path_file) <= max_parallel_file_size
+          ):
+            pending.append((path_file, executor.submit(self._deflate_zip_member, path_file, compresslevel)))
+            _write_pending(zip, nr_keep=max_pending)
+          else:
+            _write_pending(zip, nr_keep=0)
+            zip.write(
+              path_file, arcname=os.path.basename(path_file),
+              compress_type=compress_type, compresslevel=compresslevel,
+            )
+          written += 1
+        #endfor
+        _write_pending(zip, nr_keep=0)
+      #endwith
       self.P("    Added {} files.".format(written), color='y')
     except Exception as e:
       self.P("Exception occured while archiving {} files in '{}': {}".format(
         len(files), path_zip, e), color='r'
       )
       return
+    finally:
+      if executor is not None:
+        executor.shutdown(cancel_futures=True)
     return path_zip
   
   
-  def compress_bytes(self, data):
+  def compress_bytes(self, data, level=-1):
+    """
+    One-shot zlib compression. Bytes-like inputs (bytes, bytearray, memoryview)
+    are compressed as they are, `str` is utf-8 encoded and anything else is
+    converted with `str()`
+    """
     import zlib
-    if not isinstance(data, bytes):
-      data = bytes(str(data), 'utf-8')
-    zip_data = zlib.compress(data)
+    zip_data = zlib.compress(_as_bytes_like(data), level)
     return zip_data
   
   def decompress_bytes(self, zip_data):
-    if not isinstance(zip_data, bytes):
+    if not isinstance(zip_data, (bytes, bytearray, memoryview)):
       raise ValueError('`decompress_bytes` input must be bytes type')
     import zlib
     data = zlib.decompress(zip_data)
     return data
-    
-    
\ No newline at end of file
+
+  def get_bytes_compressor(self, algorithm='zlib', level=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Returns a `BytesStreamCompressor` - see `compress_stream` for usage
+    """
+    return BytesStreamCompressor(algorithm=algorithm, level=level, chunk_size=chunk_size)
+
+  def get_bytes_decompressor(self, max_output_size=STREAM_CHUNK_SIZE):
+    """
+    Returns a `BytesStreamDecompressor` - the algorithm is read from the stream header
+    """
+    return BytesStreamDecompressor(max_output_size=max_output_size)
+
+  def compress_stream(self, chunks, algorithm='zlib', level=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Generator that compresses an iterable of bytes-like chunks into a framed stream
+    """
+    compressor = self.get_bytes_compressor(algorithm=algorithm, level=level, chunk_size=chunk_size)
+    for chunk in chunks:
+      for out in compressor.iter_compress(chunk):
+        yield out
+    yield compressor.flush()
+
+  def decompress_stream(self, chunks, max_output_size=STREAM_CHUNK_SIZE):
+    """
+    Generator that decompresses an iterable of arbitrary slices of a framed stream
+    yielding pieces of at most `max_output_size` bytes
+    """
+    decompressor = self.get_bytes_decompressor(max_output_size=max_output_size)
+    for chunk in chunks:
+      for out in decompressor.iter_decompress(chunk):
+        yield out
+    if not decompressor.eof:
+      raise ValueError('Compressed stream ended before the end frame')
+
+
+def _as_bytes_like(data):
+  if isinstance(data, (bytes, bytearray, memoryview)):
+    return data
+  if isinstance(data, str):
+    return data.encode('utf-8')
+  return bytes(str(data), 'utf-8')
+
+
+def _get_stream_codec(algorithm, level=None, decompress=False):
+  import zlib
+  import bz2
+  import lzma
+  if algorithm == 'zlib':
+    if decompress:
+      return zlib.decompressobj()
+    return zlib.compressobj(-1 if level is None else level)
+  elif algorithm == 'bz2':
+    if decompress:
+      return bz2.BZ2Decompressor()
+    return bz2.BZ2Compressor(9 if level is None else level)
+  elif algorithm == 'lzma':
+    if decompress:
+      return lzma.LZMADecompressor()
+    return lzma.LZMACompressor(preset=level)
+  raise ValueError("Unknown compression algorithm '{}' - valid options are {}".format(
+    algorithm, list(STREAM_ALGORITHMS)))
+
+
+class BytesStreamCompressor(object):
+  """
+  Incremental compressor producing a framed stream:
+    header: STREAM_MAGIC + 1 byte algorithm id
+    frames: 4 bytes big-endian payload length + payload, a zero length frame ends the stream
+
+  Input is consumed in `chunk_size` slices (no copies for memoryview/bytes).
+  `iter_compress` yields one frame per slice so the memory it uses is bounded by
+  the chunk size regardless of the payload size, while `compress` returns all
+  the frames of its input joined.
+  """
+  def __init__(self, algorithm='zlib', level=None, chunk_size=STREAM_CHUNK_SIZE):
+    self.algorithm = algorithm
+    self.chunk_size = chunk_size
+    self._codec = _get_stream_codec(algorithm, level=level)
+    self._header_sent = False
+    self._finished = False
+    self.bytes_in = 0
+    self.bytes_out = 0
+    return
+
+  def _frame(self, payload):
+    out = bytearray()
+    if not self._header_sent:
+      out += STREAM_MAGIC + bytes([STREAM_ALGORITHMS[self.algorithm]])
+      self._header_sent = True
+    if len(payload) > 0:
+      out += len(payload).to_bytes(4, 'big')
+      out += payload
+    self.bytes_out += len(out)
+    return bytes(out)
+
+  def iter_compress(self, data):
+    """
+    Generator that compresses `data` one `chunk_size` slice at a time and
+    yields the resulting (non empty) frames
+    """
+    assert not self._finished, "Cannot compress after `flush`"
+    view = memoryview(_as_bytes_like(data)).cast('B')
+    for start in range(0, len(view), self.chunk_size):
+      chunk = view[start:start + self.chunk_size]
+      out = self._frame(self._codec.compress(chunk))
+      self.bytes_in += len(chunk)
+      if len(out) > 0:
+        yield out
+    return
+
+  def compress(self, data):
+    return b''.join(self.iter_compress(data))
+
+  def flush(self):
+    if self._finished:
+      return b''
+    out = self._frame(self._codec.flush()) + (0).to_bytes(4, 'big')
+    self.bytes_out += 4
+    self._finished = True
+    return out
+
+
+class BytesStreamDecompressor(object):
+  """
+  Incremental decompressor for `BytesStreamCompressor` streams. Accepts arbitrary
+  slices of the stream and never produces more than `max_output_size` bytes per
+  output piece (see `iter_decompress`).
+  """
+  def __init__(self, max_output_size=STREAM_CHUNK_SIZE):
+    self.max_output_size = max_output_size
+    self.algorithm = None
+    self.eof = False
+    self._codec = None
+    self._buffer = bytearray()
+    return
+
+  def _decompress_payload(self, payload):
+    if self.algorithm == 'zlib':
+      out = self._codec.decompress(payload, self.max_output_size)
+      if len(out) > 0:
+        yield out
+      while len(self._codec.unconsumed_tail) > 0:
+        out = self._codec.decompress(self._codec.unconsumed_tail, self.max_output_size)
+        if len(out) > 0:
+          yield out
+    else:
+      out = self._codec.decompress(payload, self.max_output_size)
+      if len(out) > 0:
+        yield out
+      while not self._codec.eof and not self._codec.needs_input:
+        out = self._codec.decompress(b'', self.max_output_size)
+        if len(out) > 0:
+          yield out
+    return
+
+  def iter_decompress(self, data):
+    """
+    Generator that consumes `data` (any slice of the stream) and yields the
+    decompressed pieces
+    """
+    if self.eof:
+      raise ValueError('Data received after the end of the compressed stream')
+    self._buffer += _as_bytes_like(data)
+    if self._codec is None:
+      header_size = len(STREAM_MAGIC) + 1
+      if len(self._buffer) < header_size:
+        return
+      if bytes(self._buffer[:len(STREAM_MAGIC)]) != STREAM_MAGIC:
+        raise ValueError('Invalid compressed stream header')
+      algo_id = self._buffer[len(STREAM_MAGIC)]
+      algorithms = {v: k for k, v in STREAM_ALGORITHMS.items()}
+      if algo_id not in algorithms:
+        raise ValueError("Unknown compressed stream algorithm id {} - known ids are {}".format(
+          algo_id, algorithms))
+      self.algorithm = algorithms[algo_id]
+      self._codec = _get_stream_codec(self.algorithm, decompress=True)
+      del self._buffer[:header_size]
+    while len(self._buffer) >= 4:
+      size = int.from_bytes(self._buffer[:4], 'big')
+      if size == 0:
+        self.eof = True
+        del self._buffer[:4]
+        return
+      if len(self._buffer) < 4 + size:
+        return
+      payload = bytes(self._buffer[4:4 + size])
+      del self._buffer[:4 + size]
+      for out in self._decompress_payload(payload):
+        yield out
+    return
+
+  def decompress(self, data):
+    return b''.join(self.iter_decompress(data))
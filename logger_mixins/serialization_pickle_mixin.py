@@ -22,6 +22,14 @@ Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Res
 import os
 import bz2
 import pickle
+import functools
+
+from time import time
+from threading import Lock
+
+MEMOIZE_SUBFOLDER = '_memoize'
+MEMOIZE_STALE_TMP_TIME = 3600 # orphaned partial writes older than 1 hour are removed
+MEMOIZE_EVICT_CHECK_INTERVAL = 100 # misses between full cache folder scans
 
 class _PickleSerializationMixin(object):
   """
@@ -35,6 +43,8 @@ class _PickleSerializationMixin(object):
 
   def __init__(self):
     super(_PickleSerializationMixin, self).__init__()
+    self._memoize_stats = {} # function name -> hits/misses
+    self._memoize_lock = Lock()
     return
 
   def _save_compressed_pickle(self, full_filename, myobj, locking=False):
@@ -87,6 +97,8 @@ class _PickleSerializationMixin(object):
                   ):
     """
     compressed: True if compression is required OR you can just add '.pklz' to `fn`
+
+    Returns the saved file path or None if the pickle could not be written.
     """
 
     def P(s):
@@ -119,6 +131,7 @@ class _PickleSerializationMixin(object):
         P("  Compressed pickle {} saved in {}".format(fn, folder))
       else:
         P("  FAILED compressed pickle save!")
+        datafile = None
     else:
       if subfolder_path is None:
         P("Saving uncompressed pickle {} in '{}'".format(fn, folder))
@@ -126,13 +139,17 @@ class _PickleSerializationMixin(object):
         P("Saving uncompressed pickle {} in '{}'/'{}'".format(fn, folder, subfolder_path))
       if locking:
         self.lock_resource(datafile)
+      saved = True
       try:
         with open(datafile, 'wb') as fhandle:
           pickle.dump(data, fhandle, protocol=pickle.HIGHEST_PROTOCOL)
-      except:
-        pass
+      except Exception as e:
+        self.P("ERROR: File {} cannot be written: {}".format(datafile, e), color='r')
+        saved = False
       if locking:
         self.unlock_resource(datafile)
+      if not saved:
+        return None
       if verbose:
         P("  Saved pickle '{}' in '{}' folder".format(fn, folder))
     return datafile
@@ -326,4 +343,212 @@ class _PickleSerializationMixin(object):
     
     self.unlock_resource(datafile)
     return result
-      
\ No newline at end of file
+
+
+  def _memoize_evict(self, cache_folder, max_bytes):
+    """
+    LRU eviction by total size of a memoization cache folder. The last access
+    time of each entry is explicitly set on every hit/write so it does not depend
+    on the `atime` mount options.
+    """
+    self.lock_resource(cache_folder)
+    try:
+      now = time()
+      entries = []
+      total = 0
+      for entry in os.scandir(cache_folder):
+        if not entry.is_file():
+          continue
+        st = entry.stat()
+        if entry.name.endswith('.tmp'):
+          if (now - st.st_mtime) > MEMOIZE_STALE_TMP_TIME:
+            try:
+              os.remove(entry.path)
+            except OSError:
+              pass
+          continue
+        entries.append((st.st_atime, st.st_size, entry.path))
+        total += st.st_size
+      #endfor
+      if max_bytes is not None and total > max_bytes:
+        entries.sort()
+        for _, size, path in entries:
+          if total <= max_bytes:
+            break
+          try:
+            os.remove(path)
+            total -= size
+          except OSError:
+            # maybe already removed by other process
+            pass
+        #endfor
+      #endif
+    finally:
+      self.unlock_resource(cache_folder)
+    return total
+
+
+  def memoize(self, folder='data', ttl=None, max_bytes=None, version=None,
+              compressed=False, verbose=False):
+    """
+    Disk-backed memoization decorator. Usage:
+
+      @log.memoize(folder='data', ttl=3600, max_bytes=2 * 1024**3)
+      def expensive_features(df, window=10):
+        ...
+
+    The cache key is the md5 of the function qualified name, its source code,
+    `version` and the call arguments (all must be pickleable - otherwise the
+    call is executed without caching). Results are saved with `save_pickle`
+    in `<folder>/_memoize/<module.qualname>/`.
+
+    Parameters
+    ----------
+    folder : str, optional
+      Logger target folder ('data', 'output', 'models'). The default is 'data'.
+
+    ttl : float, optional
+      Max age in seconds of a cached result. The default is None (no expiry).
+
+    max_bytes : int, optional
+      Max total size of the function cache folder; least recently used results
+      are evicted once the cache outgrows it. The default is None (unbounded).
+
+    version : any, optional
+      Additional key component - change it to invalidate previous results.
+
+    compressed : bool, optional
+      Use bz2 compressed pickles. The default is False.
+
+    Hits and misses are counted for each function - see `get_memoize_stats`.
+    """
+    import inspect
+
+    def P(s, color=None):
+      if verbose:
+        self.P(s, color=color)
+      return
+
+    def decorator(func):
+      func_name = '{}.{}'.format(func.__module__, func.__qualname__)
+      try:
+        func_src = inspect.getsource(func)
+      except (OSError, TypeError):
+        func_src = getattr(getattr(func, '__code__', None), 'co_code', None)
+      func_hash = self.hash_object((func_name, func_src, version))
+      subfolder_path = os.path.join(
+        MEMOIZE_SUBFOLDER, func_name.replace('<', '').replace('>', '')
+      )
+      cache_folder = os.path.join(self.get_target_folder(folder), subfolder_path)
+      os.makedirs(cache_folder, exist_ok=True)
+      ext = '.pklz' if compressed else '.pkl'
+      with self._memoize_lock:
+        dct_stats = self._memoize_stats.setdefault(func_name, {'HITS': 0, 'MISSES': 0})
+      # estimated size of the cache folder so that it is not scanned on each miss
+      dct_size = {'BYTES': None, 'MISSES': 0}
+
+      @functools.wraps(func)
+      def wrapper(*args, **kwargs):
+        try:
+          key = self.hash_object((func_hash, args, sorted(kwargs.items())))
+        except Exception as e:
+          P("Memoize '{}' cannot hash call arguments ({}), running uncached".format(func_name, e), color='r')
+          return func(*args, **kwargs)
+        fn = key + ext
+        datafile = os.path.join(cache_folder, fn)
+
+        try:
+          st = os.stat(datafile)
+          is_valid = ttl is None or (time() - st.st_mtime) <= ttl
+        except OSError:
+          is_valid = False
+
+        if is_valid:
+          payload = self.load_pickle(
+            fn, folder=folder, subfolder_path=subfolder_path,
+            verbose=False, locking=False,
+          )
+          if payload is not None:
+            with self._memoize_lock:
+              dct_stats['HITS'] += 1
+            try:
+              # mark as recently used for the LRU eviction, keep mtime for ttl
+              os.utime(datafile, (time(), st.st_mtime))
+            except OSError:
+              pass
+            P("Memoize '{}' hit {}".format(func_name, key))
+            return payload['RESULT']
+          #endif
+        #endif
+
+        with self._memoize_lock:
+          dct_stats['MISSES'] += 1
+        result = func(*args, **kwargs)
+        # write to a process-unique temporary file then atomically move it in place
+        tmp_fn = '{}.{}_{}.tmp'.format(fn, os.getpid(), self.get_unique_id())
+        tmp_file = self.save_pickle(
+          {'RESULT': result}, fn=tmp_fn, folder=folder,
+          subfolder_path=subfolder_path, compressed=compressed,
+          verbose=False, locking=False,
+        )
+        if tmp_file is None:
+          P("Memoize '{}' could not save result".format(func_name), color='r')
+          try:
+            os.remove(os.path.join(cache_folder, tmp_fn))
+          except OSError:
+            pass
+          return result
+        try:
+          size = os.path.getsize(tmp_file)
+          os.replace(tmp_file, datafile)
+        except OSError as e:
+          P("Memoize '{}' could not save result: {}".format(func_name, e), color='r')
+          return result
+        P("Memoize '{}' miss {}".format(func_name, key))
+
+        if max_bytes is not None:
+          with self._memoize_lock:
+            dct_size['MISSES'] += 1
+            if dct_size['BYTES'] is not None:
+              dct_size['BYTES'] += size
+            must_evict = (
+              dct_size['BYTES'] is None or dct_size['BYTES'] > max_bytes or
+              dct_size['MISSES'] % MEMOIZE_EVICT_CHECK_INTERVAL == 0 # writes of other processes
+            )
+          if must_evict:
+            total = self._memoize_evict(cache_folder, max_bytes=max_bytes)
+            with self._memoize_lock:
+              dct_size['BYTES'] = total
+        return result
+
+      def cache_clear():
+        for entry in os.scandir(cache_folder):
+          if entry.is_file():
+            try:
+              os.remove(entry.path)
+            except OSError:
+              pass
+        return
+
+      wrapper.cache_folder = cache_folder
+      wrapper.cache_clear = cache_clear
+      return wrapper
+    #enddef
+    return decorator
+
+
+  def get_memoize_stats(self):
+    """
+    Returns a dict with hits/misses/hit-ratio for each memoized function
+    (hits are counted only for successfully loaded results)
+    """
+    dct_stats = {}
+    with self._memoize_lock:
+      for func_name, dct in self._memoize_stats.items():
+        total = dct['HITS'] + dct['MISSES']
+        dct_stats[func_name] = {
+          'HITS': dct['HITS'],
+          'MISSES': dct['MISSES'],
+          'HIT_RATIO': dct['HITS'] / total if total > 0 else 0,
+        }
+    return dct_stats
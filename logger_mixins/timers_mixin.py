@@ -18,10 +18,19 @@ Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Res
 @project: 
 @description:
 """
+import os
+import re
+import json
+import gzip
+import functools
+import math
+import tracemalloc
+import weakref
 import numpy as np
 
 from collections import OrderedDict, deque
-from time import perf_counter, time
+from threading import Lock, Event, Thread, get_ident, current_thread, local
+from time import perf_counter, time, thread_time, process_time
 
 
 DEFAULT_SECTION = 'main'
@@ -32,6 +41,657 @@ ZERO_THRESHOLD = 5e-4
 
 OBSOLETE_SECTION_TIME = 3600 # sections older than 1 hour are archived
 
+HIST_PRECISION = 0.01 # relative width of the percentiles histogram buckets
+HIST_MIN_VALUE = 1e-6 # laps below 1 microsecond share the first bucket
+DEFAULT_PERCENTILES = [50, 95, 99]
+
+DEFAULT_MAX_SPANS = 100_000
+
+FOLD_SIZE = 1_024 # fast path laps kept per timer handle before being folded in the statistics
+
+TIMERS_SNAPSHOTS_SUBFOLDER = 'timers_snapshots'
+
+MAX_ARCHIVED_SECTIONS = 1_000 # summaries of evicted sections kept in memory
+ARCHIVE_CHECK_INTERVAL = 60 # seconds between automatic obsolete sections checks
+
+METRICS_PREFIX = 'lummetry'
+METRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+class TimerLaps(object):
+  """
+  Fixed size ring buffer of laps (seconds) backed by a preallocated float64 numpy
+  array. Behaves like the previous `deque(maxlen=...)` for reading: `len`, iteration,
+  indexing and `np.array(laps)` all use chronological order.
+
+  Window statistics (mean, std, sum, zero laps) are maintained in O(1) per append:
+  running sums are kept relative to a shift (the window mean) for numerical
+  stability and are recomputed exactly each time the buffer wraps so that no
+  floating point drift accumulates.
+  """
+  def __init__(self, maxlen=MAX_LAPS):
+    self._buffer = np.zeros(maxlen, dtype=np.float64)
+    self._maxlen = maxlen
+    self._pos = 0
+    self._count = 0
+    self._shift = 0.0
+    self._sum = 0.0 # sum of (lap - shift)
+    self._sum_sq = 0.0 # sum of (lap - shift) ** 2
+    self._zero_count = 0
+    return
+
+  @property
+  def maxlen(self):
+    return self._maxlen
+
+  def append(self, value):
+    pos = self._pos
+    buffer = self._buffer
+    shift = self._shift
+    if self._count == self._maxlen:
+      old = float(buffer[pos]) - shift
+      self._sum -= old
+      self._sum_sq -= old * old
+      if old + shift <= ZERO_THRESHOLD:
+        self._zero_count -= 1
+    else:
+      self._count += 1
+    buffer[pos] = value
+    delta = value - shift
+    self._sum += delta
+    self._sum_sq += delta * delta
+    if value <= ZERO_THRESHOLD:
+      self._zero_count += 1
+    pos += 1
+    if pos == self._maxlen:
+      pos = 0
+      self._recompute_stats()
+    self._pos = pos
+    return
+
+  def _recompute_stats(self):
+    laps = self._buffer[:self._count]
+    if self._count == 0:
+      self._shift, self._sum, self._sum_sq, self._zero_count = 0.0, 0.0, 0.0, 0
+      return
+    self._shift = float(laps.mean())
+    deltas = laps - self._shift
+    self._sum = float(deltas.sum())
+    self._sum_sq = float((deltas * deltas).sum())
+    self._zero_count = int((laps <= ZERO_THRESHOLD).sum())
+    return
+
+  def clear(self):
+    self._pos = 0
+    self._count = 0
+    self._recompute_stats()
+    return
+
+  def sum(self):
+    return self._shift * self._count + self._sum
+
+  def mean(self):
+    return self._shift + self._sum / self._count if self._count > 0 else -1
+
+  def std(self):
+    if self._count == 0:
+      return -1
+    mean_delta = self._sum / self._count
+    return math.sqrt(max(self._sum_sq / self._count - mean_delta * mean_delta, 0))
+
+  @property
+  def zero_count(self):
+    return self._zero_count
+
+  def last(self):
+    return float(self._buffer[self._pos - 1]) if self._count > 0 else -1
+
+  def extend(self, values):
+    values = np.asarray(values, dtype=np.float64).ravel()
+    nr_values = len(values)
+    if nr_values == 0:
+      return
+    maxlen = self._maxlen
+    if nr_values >= maxlen:
+      self._buffer[:] = values[-maxlen:]
+      self._pos = 0
+      self._count = maxlen
+      self._recompute_stats()
+      return
+    pos = self._pos
+    overwrites = self._count + nr_values > maxlen
+    first = min(nr_values, maxlen - pos)
+    self._buffer[pos:pos + first] = values[:first]
+    if first < nr_values:
+      self._buffer[:nr_values - first] = values[first:]
+    self._pos = (pos + nr_values) % maxlen
+    self._count = min(self._count + nr_values, maxlen)
+    if overwrites or self._pos <= pos:
+      # evicted laps or wrapped buffer - exact recompute as in `append`
+      self._recompute_stats()
+    else:
+      deltas = values - self._shift
+      self._sum += float(deltas.sum())
+      self._sum_sq += float((deltas * deltas).sum())
+      self._zero_count += int((values <= ZERO_THRESHOLD).sum())
+    return
+
+  def values(self):
+    """ view (no copy) of the stored laps - NOT in chronological order """
+    return self._buffer[:self._count]
+
+  def to_numpy(self):
+    """ chronological copy of the stored laps """
+    if self._count < self._maxlen:
+      return self._buffer[:self._count].copy()
+    return np.concatenate((self._buffer[self._pos:], self._buffer[:self._pos]))
+
+  def __array__(self, dtype=None, copy=None):
+    arr = self.to_numpy()
+    return arr if dtype is None else arr.astype(dtype)
+
+  def __len__(self):
+    return self._count
+
+  def __iter__(self):
+    return iter(self.to_numpy().tolist())
+
+  def __getitem__(self, idx):
+    if isinstance(idx, (int, np.integer)):
+      if idx < 0:
+        idx += self._count
+      if idx < 0 or idx >= self._count:
+        raise IndexError("laps index out of range")
+      start = 0 if self._count < self._maxlen else self._pos
+      return float(self._buffer[(start + idx) % self._maxlen])
+    return self.to_numpy()[idx]
+
+  def __repr__(self):
+    return "TimerLaps({}, maxlen={})".format(self.to_numpy().tolist(), self._maxlen)
+
+
+class TimerHistogram(object):
+  """
+  Sparse log-bucket (HDR-style) histogram of the laps of a timer over its whole life.
+  Bucket `i > 0` holds values in [min_value * b^(i-1), min_value * b^i) with
+  b = 1 + precision so any reported percentile is within `precision` of the real
+  lap. Constant memory per distinct bucket, O(1) `add` and mergeable (`merge`)
+  across timers, processes or servers with the same settings.
+  """
+  def __init__(self, precision=HIST_PRECISION, min_value=HIST_MIN_VALUE):
+    self.precision = precision
+    self.min_value = min_value
+    self._log_base = math.log1p(precision)
+    self.counts = {}
+    self.count = 0
+    return
+
+  def add(self, value):
+    if value <= self.min_value:
+      idx = 0
+    else:
+      idx = int(math.log(value / self.min_value) / self._log_base) + 1
+    counts = self.counts
+    counts[idx] = counts.get(idx, 0) + 1
+    self.count += 1
+    return
+
+  def add_many(self, values):
+    """ vectorized `add` of an array of values """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+      return
+    indexes = np.log(np.maximum(values, self.min_value) / self.min_value) / self._log_base
+    indexes = indexes.astype(np.int64) + 1
+    indexes[values <= self.min_value] = 0
+    counts = self.counts
+    for idx, cnt in zip(*np.unique(indexes, return_counts=True)):
+      idx = int(idx)
+      counts[idx] = counts.get(idx, 0) + int(cnt)
+    self.count += len(values)
+    return
+
+  def merge(self, other):
+    assert self.precision == other.precision and self.min_value == other.min_value, \
+      "Cannot merge histograms with different precision/min_value"
+    counts = self.counts
+    for idx, cnt in other.counts.items():
+      counts[idx] = counts.get(idx, 0) + cnt
+    self.count += other.count
+    return self
+
+  def to_dict(self):
+    """ compact json-able form """
+    return {
+      'PRECISION': self.precision,
+      'MIN_VALUE': self.min_value,
+      'BUCKETS': [[idx, cnt] for idx, cnt in sorted(self.counts.items())],
+    }
+
+  @staticmethod
+  def from_dict(dct):
+    hist = TimerHistogram(precision=dct['PRECISION'], min_value=dct['MIN_VALUE'])
+    for idx, cnt in dct['BUCKETS']:
+      hist.counts[int(idx)] = cnt
+      hist.count += cnt
+    return hist
+
+  def bucket_value(self, idx):
+    """ representative (geometric middle) value of a bucket """
+    if idx == 0:
+      return self.min_value
+    return self.min_value * math.exp((idx - 0.5) * self._log_base)
+
+  def percentiles(self, percentiles=DEFAULT_PERCENTILES):
+    """ returns the list of values for the given percentiles (0..100) or -1 if empty """
+    if self.count == 0:
+      return [-1 for _ in percentiles]
+    indexes = sorted(self.counts)
+    cumulative = np.cumsum([self.counts[idx] for idx in indexes])
+    results = []
+    for prc in percentiles:
+      rank = max(math.ceil(prc / 100 * self.count), 1)
+      pos = min(int(np.searchsorted(cumulative, rank)), len(indexes) - 1)
+      results.append(self.bucket_value(indexes[pos]))
+    return results
+
+  def __len__(self):
+    return self.count
+
+  def __repr__(self):
+    return "TimerHistogram(count={}, buckets={})".format(self.count, len(self.counts))
+
+
+class TimerHandle(object):
+  """
+  Timer with pre-resolved references to its section structures so that start/end
+  do not perform any section/timer string lookups. Obtained with `log.timer(...)`.
+  The handle keeps no per-call state (start times live in the per-thread stacks)
+  so the same handle can be used concurrently and recursively.
+
+  A top level lap of a timer whose graph position is already recorded takes the
+  fast path: no lock, only a thread-local stack push/pop and the lap appended to
+  a pending list. Pending laps are folded in batches into the timer statistics
+  (on `FOLD_SIZE` laps or whenever the timers are read). Nested timers, resources
+  tracking, overhead correction and tracing use the complete path. Any change
+  of the timers structures or settings marks the handles as stale so they
+  re-resolve on their next use.
+  """
+  def __init__(self, log, sname, section):
+    self._log = log
+    self.sname = sname
+    self.section = section
+    self._pending = [] # laps ended on the fast path and not yet folded in the timer
+    self._last_end = 0
+    self._stale = True
+    self._fast = False
+    return
+
+  def _invalidate(self):
+    self._fast = False
+    self._stale = True
+    return
+
+  def _resolve(self):
+    log = self._log
+    section, sname = self.section, self.sname
+    if self._pending:
+      # laps of the previous resolution belong to the previous timer dict
+      self._fold()
+    log._maybe_create_timers_section(section)
+    with log._timers_lock:
+      if section not in log.timers:
+        # archived meanwhile
+        log._create_timers_section(section)
+      lock = log._timers_sections_locks[section]
+      with lock:
+        if sname not in log.timers[section]:
+          max_timers = log._timers_max_per_section
+          if max_timers is not None and len(log.timers[section]) >= max_timers:
+            log._evict_lru_timer(section)
+          log.timers[section][sname] = log.get_empty_timer()
+          log._faulty_timers[section].pop(sname, None)
+        graph = log.timers_graph[section]
+        if sname not in graph:
+          graph[sname] = {"SLOW" : OrderedDict(), "FAST" : OrderedDict()}
+        ctimer = log.timers[section][sname]
+        # timers imported from older versions
+        if 'HIST' not in ctimer:
+          ctimer['HIST'] = TimerHistogram()
+        if 'M2' not in ctimer:
+          ctimer['MIN'] = 0
+          ctimer['M2'] = 0
+        if 'RES_COUNT' not in ctimer:
+          ctimer.update(_TimersMixin._get_empty_resources())
+        self._ctimer = ctimer
+        self._graph = graph
+        self._node = graph[sname]
+        self._root = graph["ROOT"]
+        self._lock = lock
+        self._tls = log._timers_tls[section]
+        self._faulty = log._faulty_timers[section]
+        log._timers_handles[section][sname] = self
+      #endwith
+    #endwith
+    self._enabled = log._timers_enabled and section not in log._timers_disabled_sections
+    self._root_ready = False # set by the first complete start at top level
+    self._stale = False
+    self._fast = self._enabled and not (
+      log._timers_track_cpu or log._timers_track_memory or
+      log._timers_overhead_correction or log._trace_spans is not None
+    )
+    return
+
+  def _new_stack(self):
+    # the stack is also registered in `opened_timers` so it can be inspected from other threads
+    stack = deque()
+    self._tls.stack = stack
+    opened_timers = self._log.opened_timers.get(self.section)
+    if opened_timers is not None:
+      opened_timers[get_ident()] = stack
+    return stack
+
+  def start(self):
+    if self._fast:
+      try:
+        stack = self._tls.stack
+      except AttributeError:
+        stack = self._new_stack()
+      if not stack and self._root_ready:
+        curr_time = perf_counter()
+        self._ctimer['START'] = curr_time
+        stack.append((self.sname, curr_time, self))
+        return curr_time
+    #endif
+    if self._stale:
+      self._resolve()
+    if not self._enabled:
+      return -1
+    return self._start_full()
+
+  def _start_full(self):
+    log = self._log
+    try:
+      stack = self._tls.stack
+    except AttributeError:
+      stack = self._new_stack()
+    tid = get_ident()
+    sname = self.sname
+    # restarting a timer already opened by the same thread means a missing `end_timer`
+    is_faulty = False
+    for opened in stack:
+      if opened[0] == sname:
+        is_faulty = True
+        break
+    if len(stack) > 0:
+      parent_handle = stack[-1][2]
+      parent_handle._root_ready = False # its children changed
+      parent = parent_handle._node
+    else:
+      parent = self._root
+    ctimer = self._ctimer
+    show_faulty = False
+    with self._lock:
+      ctimer['LEVEL'] = len(stack)
+      self._node["FAST"].clear() ## there is no ordered set, so we use OrderedDict with no values
+      parent["FAST"][sname] = None
+      parent["SLOW"][sname] = None
+      ctimer['START_COUNT'] += 1
+      if is_faulty:
+        self._faulty[sname] = None
+        if not log._timer_error[self.section]:
+          log._timer_error[self.section] = True
+          show_faulty = True
+      curr_time = perf_counter()
+      ctimer['START'] = curr_time
+    #endwith
+    # next top level starts of this timer can skip the graph update
+    self._root_ready = len(stack) == 0
+    if show_faulty:
+      log._show_faulty_timers(self.section)
+      curr_time = perf_counter()
+    if log._timers_track_cpu or log._timers_track_memory or log._timers_overhead_correction:
+      # [name, start, handle, thread cpu, process cpu, traced memory, traced peak, timers started]
+      mem_start = None
+      nr_started = None
+      if log._timers_overhead_correction:
+        # number of timers started so far by this thread - used to discount the nested timers cost
+        nr_started = log._timers_thread_started.get(tid, 0) + 1
+        log._timers_thread_started[tid] = nr_started
+      if log._timers_track_memory and tracemalloc.is_tracing():
+        # the traced peak is reset for each timer so the outer opened timers of
+        # this thread first collect the peak reached so far
+        mem_start, mem_peak = tracemalloc.get_traced_memory()
+        for opened in stack:
+          if len(opened) > 6 and opened[6] is not None and mem_peak > opened[6]:
+            opened[6] = mem_peak
+        tracemalloc.reset_peak()
+      if log._timers_track_cpu:
+        stack.append([sname, curr_time, self, thread_time(), process_time(), mem_start, mem_start, nr_started])
+      else:
+        stack.append([sname, curr_time, self, None, None, mem_start, mem_start, nr_started])
+    else:
+      # [name, start, handle, None] - the fast path entries have only 3 items
+      stack.append([sname, curr_time, self, None])
+    return curr_time
+
+  def end(self, skip_first_timing=False):
+    end_time = perf_counter()
+    if self._fast:
+      try:
+        stack = self._tls.stack
+        opened_timer = stack[-1]
+      except (AttributeError, IndexError):
+        opened_timer = None
+      if (opened_timer is not None and opened_timer[2] is self and len(opened_timer) == 3 and
+          not self._faulty and not (skip_first_timing and self._ctimer['PASS'])):
+        stack.pop()
+        result = end_time - opened_timer[1]
+        pending = self._pending
+        pending.append(result)
+        self._last_end = end_time
+        if len(pending) >= FOLD_SIZE:
+          self._fold()
+        return result
+    #endif
+    # the thread stacks of the section where the timer was started (even if archived/reset meanwhile)
+    tls = self._tls
+    if self._stale:
+      self._resolve()
+    if not self._enabled:
+      return 0
+    return self._end_full(skip_first_timing, end_time, tls)
+
+  def _end_full(self, skip_first_timing, end_time, tls):
+    log = self._log
+    log.sections_last_used[self.section] = time()
+    sname = self.sname
+    tid = get_ident()
+    stack = getattr(tls, 'stack', None)
+    start_time = None
+    fast_started = False
+    nr_opened = 0
+    resources = None
+    correction = 0
+    opened_timer = None
+    if stack is not None:
+      opened_timer = log._pop_opened_timer(stack, sname)
+      if opened_timer is not None and len(opened_timer) > 4:
+        # the thread resources deltas are meaningful only for the starting thread
+        resources = self._get_resources_deltas(opened_timer)
+        if opened_timer[7] is not None and log._timers_overhead_correction:
+          nr_nested = log._timers_thread_started.get(tid, 0) - opened_timer[7]
+          overhead = log._timers_overhead
+          correction = overhead['LAP'] + nr_nested * overhead['PAIR']
+    if opened_timer is None:
+      # started by another thread
+      stack, opened_timer = log._pop_other_threads_opened_timer(self.section, sname)
+    if opened_timer is not None:
+      start_time = opened_timer[1]
+      # fast path starts are counted when their lap is recorded
+      fast_started = len(opened_timer) == 3
+    if stack is not None:
+      for opened in list(stack):
+        if opened[0] == sname:
+          nr_opened += 1
+    ctimer = self._ctimer
+    with self._lock:
+      # keep the laps in chronological order
+      self._fold_locked()
+      if start_time is None:
+        # timer not opened by current thread
+        start_time = ctimer['START']
+      if fast_started:
+        ctimer['START_COUNT'] += 1
+      ctimer['STOP_COUNT'] += 1
+      if nr_opened <= 1:
+        self._faulty.pop(sname, None)
+      ctimer['END'] = end_time
+      result = end_time - start_time
+      if correction > 0:
+        result = max(result - correction, 0)
+      ctimer['LAPS'].append(result)
+      if log._trace_spans is not None:
+        self._add_span(start_time, end_time)
+      _count = ctimer['COUNT']
+
+      if ctimer['PASS'] and skip_first_timing:
+        ctimer['PASS'] = False
+        return result  # do not record first timing in average nor the max
+
+      if result > ctimer['MAX']:
+        ctimer['MAX'] = result
+      if _count == 0 or result < ctimer['MIN']:
+        ctimer['MIN'] = result
+      ctimer['HIST'].add(result)
+
+      old_mean = ctimer['MEAN']
+      new_mean = (_count * old_mean + result) / (_count + 1)
+      ctimer['COUNT'] = _count + 1
+      ctimer['MEAN'] = new_mean
+      ctimer['M2'] += (result - old_mean) * (result - new_mean) # Welford
+
+      if resources is not None:
+        cpu_thread, cpu_process, mem_delta, mem_peak = resources
+        ctimer['RES_COUNT'] += 1
+        if cpu_thread is not None:
+          ctimer['CPU_THREAD'] += cpu_thread
+          ctimer['CPU_PROCESS'] += cpu_process
+        if mem_delta is not None:
+          ctimer['MEM_DELTA'] += mem_delta
+          if mem_peak > ctimer['MEM_PEAK']:
+            ctimer['MEM_PEAK'] = mem_peak
+    return result
+
+  def _fold(self):
+    with self._lock:
+      self._fold_locked()
+    return
+
+  def _fold_locked(self):
+    """ adds the pending fast path laps to the timer statistics - section lock must be held """
+    pending = self._pending
+    nr_laps = len(pending)
+    if nr_laps == 0:
+      return
+    laps = np.array(pending[:nr_laps], dtype=np.float64)
+    del pending[:nr_laps] # laps appended meanwhile by other threads are kept
+    ctimer = self._ctimer
+    ctimer['LAPS'].extend(laps)
+    ctimer['HIST'].add_many(laps)
+    _count = ctimer['COUNT']
+    total = _count + nr_laps
+    laps_mean = float(laps.mean())
+    laps_m2 = float(((laps - laps_mean) ** 2).sum())
+    delta = laps_mean - ctimer['MEAN']
+    # parallel Welford
+    ctimer['M2'] += laps_m2 + delta * delta * _count * nr_laps / total
+    ctimer['MEAN'] += delta * nr_laps / total
+    laps_max, laps_min = float(laps.max()), float(laps.min())
+    if laps_max > ctimer['MAX']:
+      ctimer['MAX'] = laps_max
+    if _count == 0 or laps_min < ctimer['MIN']:
+      ctimer['MIN'] = laps_min
+    ctimer['COUNT'] = total
+    ctimer['START_COUNT'] += nr_laps
+    ctimer['STOP_COUNT'] += nr_laps
+    last_end = self._last_end
+    if last_end > ctimer['END']:
+      ctimer['END'] = last_end
+    last_used = time() - (perf_counter() - last_end)
+    if last_used > self._log.sections_last_used.get(self.section, 0):
+      self._log.sections_last_used[self.section] = last_used
+    return
+
+  @staticmethod
+  def _get_resources_deltas(opened_timer):
+    cpu_thread, cpu_process, mem_delta, mem_peak = None, None, None, None
+    if opened_timer[3] is not None:
+      cpu_thread = thread_time() - opened_timer[3]
+      cpu_process = process_time() - opened_timer[4]
+    if opened_timer[5] is not None and tracemalloc.is_tracing():
+      current, peak = tracemalloc.get_traced_memory()
+      mem_delta = current - opened_timer[5]
+      mem_peak = max(peak, opened_timer[6]) - opened_timer[5]
+    return cpu_thread, cpu_process, mem_delta, mem_peak
+
+  def _add_span(self, start_time, end_time):
+    log = self._log
+    tid = get_ident()
+    if tid not in log._trace_threads:
+      log._trace_threads[tid] = current_thread().name
+    log._trace_spans.append((self.sname, self.section, tid, start_time, end_time))
+    return
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, exc_type, exc_value, exc_traceback):
+    self.end()
+    return False
+
+
+class _NullTimerHandle(object):
+  """ no-op timer handle returned by `log.timer` while the timers are disabled """
+  def start(self):
+    return -1
+
+  def end(self, skip_first_timing=False):
+    return 0
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, exc_traceback):
+    return False
+
+
+NULL_TIMER = _NullTimerHandle()
+
+
+def _disabled_start_timer(sname, section=None):
+  return -1
+
+
+def _disabled_end_timer(sname, skip_first_timing=False, section=None):
+  return 0
+
+
+def _disabled_timer(sname, section=None):
+  return NULL_TIMER
+
+
+# public timers APIs replaced by the stubs above while DEBUG is off
+DISABLED_TIMERS_STUBS = {
+  'start_timer': _disabled_start_timer,
+  'end_timer': _disabled_end_timer,
+  'stop_timer': _disabled_end_timer,
+  'end_timer_no_skip': _disabled_end_timer,
+  'timer': _disabled_timer,
+}
+
+
 class _TimersMixin(object):
   """
   Mixin for timers functionalities that are attached to `libraries.logger.Logger`.
@@ -42,39 +702,391 @@ class _TimersMixin(object):
   In this mixin we can use any attribute/method of the Logger.
   """
 
+  _timers_enabled = True
+
   def __init__(self):
     super(_TimersMixin, self).__init__()
+    self._timers_disabled_sections = set()
     self.timers = None
-    self.timer_level = None # no actual purpose following addition of graph
     self.sections_last_used = {}
-    self.opened_timers = None
+    self.opened_timers = None # section -> thread id -> stack of [timer name, start time, graph node]
     self.timers_graph = None
     self._timer_error = None
-    self.default_timers_section = DEFAULT_SECTION
+    self._faulty_timers = None
+    self._timers_sections_locks = None
+    self._timers_lock = Lock()
+    self._timers_handles = None # section -> timer name -> handle
+    self._timers_default_handles = None # handles of the default section (no section lookup)
+    self._timers_all_handles = weakref.WeakValueDictionary() # every live handle, to be invalidated
+    self._timers_tls = None # section -> thread local with the stack of opened timers
+    self._trace_spans = None # bounded deque of spans while tracing is active
+    self._last_trace_spans = None
+    self._trace_threads = {}
+    self._timers_track_cpu = False
+    self._timers_track_memory = False
+    self._timers_started_tracemalloc = False
+    self._timers_snapshots_thread = None
+    self._timers_snapshots_stop = None
+    self.timers_archive = OrderedDict() # section -> summaries of archived/evicted timers
+    self._timers_archive_lock = Lock()
+    self._timers_max_sections = None
+    self._timers_max_per_section = None
+    self._timers_spill_archived = False
+    self._timers_archive_obsolete = False # automatic archiving of the unused sections is opt-in
+    self._timers_persistent_sections = set() # never archived automatically
+    self._timers_last_archive_check = time()
+    self._timers_overhead = None # calibrated instrumentation cost
+    self._timers_overhead_correction = False
+    self._timers_thread_started = {}
+    self._default_timers_section = DEFAULT_SECTION
 
     self.reset_timers()
     return
 
+  @property
+  def default_timers_section(self):
+    return self._default_timers_section
+
+  @default_timers_section.setter
+  def default_timers_section(self, section):
+    self._default_timers_section = section
+    if self.timers is not None:
+      self._maybe_create_timers_section(section)
+      self._timers_default_handles = self._timers_handles[section]
+    return
+
+  @property
+  def DEBUG(self):
+    return self._timers_enabled
+
+  @DEBUG.setter
+  def DEBUG(self, value):
+    """
+    Turning DEBUG off replaces the public timers APIs of this logger with no-op stubs
+    (no section resolution, locking or bookkeeping at all); turning it on restores them.
+    """
+    value = bool(value)
+    if value == self._timers_enabled and (value or 'start_timer' in self.__dict__):
+      return
+    self._timers_enabled = value
+    if value:
+      for name in DISABLED_TIMERS_STUBS:
+        self.__dict__.pop(name, None)
+      if self.opened_timers is not None:
+        # timers started before disabling will never end - drop them
+        for section in list(self.opened_timers.keys()):
+          self._reset_opened_timers(section)
+    else:
+      self.__dict__.update(DISABLED_TIMERS_STUBS)
+    self._invalidate_timers_handles() # existing handles pick up the new state
+    return
+
+  def disable_timers_section(self, section):
+    """ turns off at runtime all the timers of a section (start/end become no-ops) """
+    self._timers_disabled_sections.add(section)
+    self._invalidate_timers_handles(section)
+    return
+
+  def enable_timers_section(self, section):
+    if section not in self._timers_disabled_sections:
+      return
+    self._timers_disabled_sections.discard(section)
+    if section in self.opened_timers:
+      self._reset_opened_timers(section)
+    self._invalidate_timers_handles(section)
+    return
+
+  def _reset_opened_timers(self, section):
+    self.opened_timers[section] = {}
+    self._timers_tls[section] = local()
+    return
+
+  def _invalidate_timers_handles(self, section=None):
+    """ makes the handles (of a section or all) re-resolve their references on next use """
+    for handle in list(self._timers_all_handles.values()):
+      if section is None or handle.section == section:
+        handle._invalidate()
+    return
+
+  def _flush_timers(self, section=None):
+    """ folds the pending fast path laps (of a section or all) in the timers statistics """
+    sections = [section] if section is not None else list(self._timers_handles.keys())
+    for sect in sections:
+      for handle in list(self._timers_handles.get(sect, {}).values()):
+        if handle._pending:
+          handle._fold()
+    return
+
+  def is_timers_section_enabled(self, section=None):
+    section = section or self.default_timers_section
+    return self._timers_enabled and section not in self._timers_disabled_sections
+
   def _maybe_create_timers_section(self, section=None):
     section = section or self.default_timers_section
 
     if section in self.timers:
       return
 
-    self.timers[section] = OrderedDict()
-    self.timer_level[section] = 0
-    self.opened_timers[section] = deque()
+    with self._timers_lock:
+      if section in self.timers:
+        # created by other thread meanwhile
+        return
+      self._create_timers_section(section)
+    #endwith
+    self._maybe_archive_timers_sections(new_section=section)
+    return
+
+  def _create_timers_section(self, section):
+    """ `_timers_lock` must be held """
+    self._timers_sections_locks[section] = Lock()
+    self._reset_opened_timers(section)
+    self._timers_handles[section] = {}
+    if section == self.default_timers_section:
+      self._timers_default_handles = self._timers_handles[section]
     self.timers_graph[section] = OrderedDict()
     self.timers_graph[section]["ROOT"] = {"SLOW" : OrderedDict(), "FAST" : OrderedDict()}
     self._timer_error[section] = False
+    self._faulty_timers[section] = OrderedDict() # ordered set of timers with open/close imbalance > 1
+    self.timers[section] = OrderedDict() # last one as it marks the section as created
+    return
+
+  def set_timers_limits(self, max_sections=None, max_timers_per_section=None, spill_to_disk=False,
+                        archive_obsolete=False):
+    """
+    Caps the number of live timer sections and of timers per section. When a cap is
+    exceeded the least recently used section/timer is archived: compacted to summary
+    statistics in `timers_archive` (and with `spill_to_disk` also saved as a timers
+    snapshot) and freed. With `archive_obsolete` the sections unused for more than
+    `OBSOLETE_SECTION_TIME` are archived as well. The default section and the
+    sections registered with `set_timers_section_persistent` are never archived
+    automatically.
+    """
+    self._timers_max_sections = max_sections
+    self._timers_max_per_section = max_timers_per_section
+    self._timers_spill_archived = spill_to_disk
+    self._timers_archive_obsolete = archive_obsolete
+    self._maybe_archive_timers_sections(force=True)
     return
 
+  def set_timers_section_persistent(self, section, persistent=True):
+    """ long-lived sections (e.g. rarely used but kept for reporting) are exempted from the automatic archiving """
+    if persistent:
+      self._timers_persistent_sections.add(section)
+    else:
+      self._timers_persistent_sections.discard(section)
+    return
+
+  def _is_timers_section_archivable(self, section):
+    return section != self.default_timers_section and section not in self._timers_persistent_sections
+
+  def _section_has_opened_timers(self, section):
+    return any(len(stack) > 0 for stack in list(self.opened_timers.get(section, {}).values()))
+
+  def _get_timer_summary(self, ctimer):
+    dct_summary = {
+      'COUNT': ctimer['COUNT'],
+      'START_COUNT': ctimer['START_COUNT'],
+      'MEAN': ctimer['MEAN'],
+      'MAX': ctimer['MAX'],
+      'MIN': ctimer.get('MIN', 0),
+      'STD': math.sqrt(ctimer.get('M2', 0) / ctimer['COUNT']) if ctimer['COUNT'] > 0 else 0,
+      'END': ctimer['END'],
+    }
+    hist = ctimer.get('HIST')
+    if hist is not None:
+      for prc, val in zip(DEFAULT_PERCENTILES, hist.percentiles(DEFAULT_PERCENTILES)):
+        dct_summary['P{}'.format(prc)] = val
+    return dct_summary
+
+  def _add_to_timers_archive(self, section, dct_summaries):
+    with self._timers_archive_lock:
+      dct_archived = self.timers_archive.pop(section, None) or {'TIMERS': {}}
+      dct_archived['TIME'] = time()
+      dct_archived['TIMERS'].update(dct_summaries)
+      self.timers_archive[section] = dct_archived
+      while len(self.timers_archive) > MAX_ARCHIVED_SECTIONS:
+        self.timers_archive.popitem(last=False)
+    return
+
+  def archive_timers_section(self, section, spill_to_disk=None):
+    """
+    Compacts a section to summary statistics in `timers_archive` and frees it.
+    Sections with opened timers are not archived.
+
+    Returns
+    -------
+    bool : True if archived
+    """
+    if spill_to_disk is None:
+      spill_to_disk = self._timers_spill_archived
+    lock = self._timers_sections_locks.get(section)
+    if section not in self.timers or lock is None or self._section_has_opened_timers(section):
+      return False
+    self._flush_timers(section)
+    with lock:
+      dct_summaries = {sname: self._get_timer_summary(ctimer) for sname, ctimer in self.timers[section].items()}
+    if spill_to_disk:
+      self.save_timers_snapshot(
+        fname='{}_{}_archived_timers.json.gz'.format(self.now_str(), re.sub(r'[^\w\-]', '_', section)),
+        selected_sections=[section], verbose=False,
+      )
+    if self._delete_timers_section(section):
+      self._add_to_timers_archive(section, dct_summaries)
+      return True
+    return False
+
+  def archive_obsolete_timers_sections(self, older_than=None):
+    """ archives the sections unused for more than `older_than` seconds (default `OBSOLETE_SECTION_TIME`) """
+    older_than = OBSOLETE_SECTION_TIME if older_than is None else older_than
+    now = time()
+    archived = []
+    for section, last_used in list(self.sections_last_used.items()):
+      if not self._is_timers_section_archivable(section) or (now - last_used) <= older_than:
+        continue
+      self._flush_timers(section) # pending laps update the last use
+      if (now - self.sections_last_used.get(section, last_used)) <= older_than:
+        continue
+      if self.archive_timers_section(section):
+        archived.append(section)
+    #endfor
+    self._timers_last_archive_check = now
+    return archived
+
+  def _maybe_archive_timers_sections(self, new_section=None, force=False):
+    if self._timers_archive_obsolete and (force or (time() - self._timers_last_archive_check) > ARCHIVE_CHECK_INTERVAL):
+      self.archive_obsolete_timers_sections()
+    max_sections = self._timers_max_sections
+    if max_sections is not None and len(self.timers) > max_sections:
+      candidates = [
+        x for x in list(self.timers.keys())
+        if x != new_section and self._is_timers_section_archivable(x) and not self._section_has_opened_timers(x)
+      ]
+      candidates.sort(key=lambda x: self.sections_last_used.get(x, 0))
+      for section in candidates[:len(self.timers) - max_sections]:
+        self.archive_timers_section(section)
+    if self._timers_max_per_section is not None and force:
+      for section in list(self.timers.keys()):
+        lock = self._timers_sections_locks.get(section)
+        if lock is None:
+          continue
+        with lock:
+          while section in self.timers and len(self.timers[section]) > self._timers_max_per_section:
+            if not self._evict_lru_timer(section):
+              break
+    return
+
+  def _evict_lru_timer(self, section):
+    """ archives and removes the least recently used timer of a section - section lock must be held """
+    for handle in list(self._timers_handles[section].values()):
+      handle._fold_locked()
+    opened = set(
+      opened_timer[0] for stack in list(self.opened_timers[section].values()) for opened_timer in list(stack)
+    )
+    timers = self.timers[section]
+    candidates = [sname for sname in timers if sname not in opened]
+    if len(candidates) == 0:
+      return False
+    sname = min(candidates, key=lambda x: max(timers[x]['START'], timers[x]['END']))
+    dct_summary = self._get_timer_summary(timers[sname])
+    del timers[sname]
+    graph = self.timers_graph[section]
+    node = graph.pop(sname, {"SLOW" : OrderedDict(), "FAST" : OrderedDict()})
+    for parent in graph.values():
+      if sname in parent["SLOW"]:
+        # children of the evicted timer are moved to its parents
+        del parent["SLOW"][sname]
+        parent["FAST"].pop(sname, None)
+        for child in node["SLOW"]:
+          parent["SLOW"][child] = None
+    #endfor
+    self._faulty_timers[section].pop(sname, None)
+    handle = self._timers_handles[section].pop(sname, None)
+    if handle is not None:
+      handle._invalidate()
+    self._add_to_timers_archive(section, {sname: dct_summary})
+    return True
+
+  def _delete_timers_section(self, section):
+    with self._timers_lock:
+      if section not in self.timers:
+        return False
+      with self._timers_sections_locks[section]:
+        del self.timers[section] # first as it marks the section as existing
+        for dct in [self.timers_graph, self.opened_timers, self._timers_tls, self._timer_error,
+                    self._faulty_timers, self.sections_last_used]:
+          dct.pop(section, None)
+        # emptied as it may still be referenced as the default section handles
+        self._timers_handles.pop(section, {}).clear()
+      self._timers_sections_locks.pop(section, None)
+      self._invalidate_timers_handles(section)
+    return True
+
+  def delete_timers_section(self, section):
+    """ frees a section without keeping its statistics in `timers_archive` """
+    return self._delete_timers_section(section)
+
+  def _get_thread_opened_timers(self, section):
+    # each thread has its own stack of opened timers so no locking is needed
+    tls = self._timers_tls[section]
+    stack = getattr(tls, 'stack', None)
+    if stack is None:
+      stack = tls.stack = deque()
+      self.opened_timers[section][get_ident()] = stack
+    return stack
+
+  @staticmethod
+  def _pop_opened_timer(stack, sname):
+    """
+    Removes `sname` from the thread stack of opened timers and returns its entry
+    ([name, start, handle, ...]) or None if the timer was not opened by this thread
+    """
+    if len(stack) > 0 and stack[-1][0] == sname:
+      return stack.pop()
+    for i in range(len(stack) - 1, -1, -1):
+      if stack[i][0] == sname:
+        opened_timer = stack[i]
+        del stack[i]
+        return opened_timer
+    return
+
+  def _pop_other_threads_opened_timer(self, section, sname):
+    """
+    A timer ended by another thread than the one that started it: removes the oldest
+    `sname` entry from the stacks of the other threads so that it does not stay opened
+    there forever. Returns (stack, entry) or (None, None) if no thread opened it.
+    """
+    tid = get_ident()
+    with self._timers_lock:
+      for _ in range(3):
+        try:
+          candidates = [
+            (opened[1], stack, opened)
+            for other_tid, stack in list(self.opened_timers.get(section, {}).items()) if other_tid != tid
+            for opened in list(stack) if opened[0] == sname
+          ]
+          if len(candidates) == 0:
+            return None, None
+          _, stack, opened_timer = min(candidates, key=lambda x: x[0])
+          stack.remove(opened_timer)
+          return stack, opened_timer
+        except (ValueError, RuntimeError):
+          # the stack was changed meanwhile by its own thread
+          continue
+      #endfor
+    #endwith
+    return None, None
+
   def reset_timers(self):
     self.timers = {}
-    self.timer_level = {}
     self.opened_timers = {}
     self.timers_graph = {}
     self._timer_error = {}
+    self._faulty_timers = {}
+    self._timers_sections_locks = {}
+    self._timers_handles = {}
+    self._timers_tls = {}
+    self._invalidate_timers_handles()
+    self.timers_archive = OrderedDict()
 
     self._maybe_create_timers_section()
     return
@@ -84,6 +1096,8 @@ class _TimersMixin(object):
     return {
       'MEAN': 0,
       'MAX': 0,
+      'MIN': 0,
+      'M2': 0,
       'COUNT': 0,
       'START': 0,
       'END': 0,
@@ -93,66 +1107,127 @@ class _TimersMixin(object):
       'START_COUNT': 0,
       'STOP_COUNT': 0,
       
-      'LAPS' : deque(maxlen=MAX_LAPS),
+      'LAPS' : TimerLaps(maxlen=MAX_LAPS),
+      'HIST' : TimerHistogram(),
+
+      **_TimersMixin._get_empty_resources(),
     }
 
-  def restart_timer(self, sname, section=None):
-    section = section or self.default_timers_section
-    self.timers[section][sname] = self.get_empty_timer()
-    return
+  @staticmethod
+  def _get_empty_resources():
+    return {
+      'RES_COUNT': 0, # counted laps with resources tracking
+      'CPU_THREAD': 0, # total thread CPU seconds
+      'CPU_PROCESS': 0, # total process CPU seconds
+      'MEM_DELTA': 0, # total traced memory delta (bytes)
+      'MEM_PEAK': 0, # max traced memory peak above the start (bytes)
+    }
 
-  def _add_in_timers_graph(self, sname, section=None):
-    section = section or self.default_timers_section
-    self.timers[section][sname]['LEVEL'] = self.timer_level[section]
-    if sname not in self.timers_graph[section]:
-      self.timers_graph[section][sname] = {"SLOW" : OrderedDict(), "FAST" : OrderedDict()}
+  def enable_timers_resources(self, cpu=True, memory=False):
+    """
+    Enables the collection of thread/process CPU time (`cpu`) and of `tracemalloc`
+    allocation delta and peak (`memory`) for each timer lap. Memory tracking starts
+    `tracemalloc` if needed and has a significant overhead. The traced peak is
+    process wide so with concurrent threads it is an upper bound.
+    """
+    self._timers_track_cpu = cpu
+    if memory and not tracemalloc.is_tracing():
+      tracemalloc.start()
+      self._timers_started_tracemalloc = True
+    self._timers_track_memory = memory
+    self._invalidate_timers_handles()
+    return
 
-    self.timers_graph[section][sname]["FAST"] = OrderedDict() ## there is no ordered set, so we use OrderedDict with no values
+  def disable_timers_resources(self):
+    self._timers_track_cpu = False
+    self._timers_track_memory = False
+    if self._timers_started_tracemalloc:
+      tracemalloc.stop()
+      self._timers_started_tracemalloc = False
+    self._invalidate_timers_handles()
     return
 
-  def start_timer(self, sname, section=None):
+  def restart_timer(self, sname, section=None):
     section = section or self.default_timers_section
-    if section == self.default_timers_section:
-      assert self.is_main_thread, "Attempted to run threaded timer '{}' without section".format(sname)
+    self.timers[section][sname] = self.get_empty_timer()
+    self._faulty_timers[section].pop(sname, None)
+    handle = self._timers_all_handles.get((section, sname))
+    if handle is not None:
+      handle._pending.clear()
+      handle._invalidate() # must re-resolve the new timer dict
+    return
 
-    self._maybe_create_timers_section(section)
+  def timer(self, sname, section=None):
+    """
+    Returns the pre-resolved `TimerHandle` of a timer that can be used as a
+    context manager:
 
-    if not self.DEBUG:
-      return -1
+      with log.timer('predict', section='worker'):
+        ...
 
-    if sname not in self.timers[section]:
-      self.restart_timer(sname, section)
+    or directly with `handle.start()` / `handle.end()` in hot loops.
+    """
+    section = section or self.default_timers_section
+    handle = self._timers_handles.get(section, {}).get(sname)
+    if handle is None:
+      key = (section, sname)
+      handle = self._timers_all_handles.get(key)
+      if handle is None:
+        with self._timers_lock:
+          # a single handle per timer - the laps pending in a duplicate would never be folded
+          handle = self._timers_all_handles.get(key)
+          if handle is None:
+            handle = TimerHandle(log=self, sname=sname, section=section)
+            self._timers_all_handles[key] = handle
+        #endwith
+      handle._resolve()
+    return handle
+
+  def timed(self, sname=None, section=None, skip_first_timing=False):
+    """
+    Decorator that times each call of the decorated function (timer name defaults
+    to the function qualified name):
+
+      @log.timed(section='worker')
+      def predict(x):
+        ...
+    """
+    def decorator(func):
+      # the real handle even while DEBUG is off so the function is timed once enabled
+      handle = _TimersMixin.timer(self, sname or func.__qualname__, section=section)
+      start, end = handle.start, handle.end
+
+      @functools.wraps(func)
+      def wrapper(*args, **kwargs):
+        start()
+        try:
+          return func(*args, **kwargs)
+        finally:
+          end(skip_first_timing)
+      return wrapper
+    return decorator
 
-    curr_time = perf_counter()
-    self._add_in_timers_graph(sname, section=section)
-    self.timers[section][sname]['START'] = curr_time
-    self.timers[section][sname]['START_COUNT'] += 1
-    if len(self.opened_timers[section]) >= 1:
-      parent = self.opened_timers[section][-1]
+  def start_timer(self, sname, section=None):
+    if section is None:
+      handle = self._timers_default_handles.get(sname)
     else:
-      parent = "ROOT"
-    #endif
-
-    self.timers_graph[section][parent]["FAST"][sname] = None
-    self.timers_graph[section][parent]["SLOW"][sname] = None
-
-    self.timer_level[section] += 1
-    self.opened_timers[section].append(sname)
-
-    faulty_timers = self._get_section_faulty_timers(section)
-    if len(faulty_timers) > 0 and not self._timer_error[section]:
-      self.P("Something is wrong with the timers in section '{}':".format(section), color='r')
-      for ft in faulty_timers:
-        self.P("  {}: {}".format(ft, self.timers[section][ft]), color='r')
-      self._timer_error[section] = True
-    #endif
-
-    return curr_time
+      handle = self._timers_handles.get(section, {}).get(sname)
+    if handle is None:
+      section = section or self.default_timers_section
+      if not self.is_timers_section_enabled(section):
+        return -1
+      handle = self.timer(sname, section=section)
+    return handle.start()
 
   def get_time_until_now(self, sname, section=None):
     section = section or self.default_timers_section
-    ctimer = self.timers[section][sname]
-    return perf_counter() - ctimer['START']
+    start = None
+    for opened in self.opened_timers[section].get(get_ident(), []):
+      if opened[0] == sname:
+        start = opened[1]
+    if start is None:
+      start = self.timers[section][sname]['START']
+    return perf_counter() - start
 
   def get_faulty_timers(self):
     dct_faulty = {}
@@ -162,51 +1237,43 @@ class _TimersMixin(object):
 
   def _get_section_faulty_timers(self, section=None):
     section = section or self.default_timers_section
-    lst_faulty = []
-    for tmr_name, tmr in self.timers[section].items():
-      if (tmr['START_COUNT'] - tmr['STOP_COUNT']) > 1:
-        lst_faulty.append(tmr_name)
-    return lst_faulty
+    return list(self._faulty_timers[section].keys())
+
+  def _update_section_faulty_timers(self, section):
+    # full scan - only needed when a whole section is replaced
+    self._faulty_timers[section] = OrderedDict([
+      (tmr_name, None) for tmr_name, tmr in self.timers[section].items()
+      if (tmr['START_COUNT'] - tmr['STOP_COUNT']) > 1
+    ])
+    return
+
+  def _show_faulty_timers(self, section):
+    self.P("Something is wrong with the timers in section '{}':".format(section), color='r')
+    for ft in self._get_section_faulty_timers(section):
+      self.P("  {}: {}".format(ft, self.timers[section][ft]), color='r')
+    return
 
   def end_timer_no_skip(self, sname, section=None):
     return self.end_timer(sname, skip_first_timing=False, section=section)
 
   def end_timer(self, sname, skip_first_timing=False, section=None):
-    section = section or self.default_timers_section
-    if sname not in self.timers[section]:
-      return
-    result = 0
-    self.sections_last_used[section] = time()
-    if self.DEBUG:
-      self.opened_timers[section].pop()
-      self.timer_level[section] -= 1
-
-      ctimer = self.timers[section][sname]
-      ctimer['STOP_COUNT'] += 1
-      ctimer['END'] = perf_counter()
-      result = ctimer['END'] - ctimer['START']
-      ctimer['LAPS'].append(result)
-      _count = ctimer['COUNT']
-      _prev_avg = ctimer['MEAN']
-      avg = _count * _prev_avg
-
-      if ctimer['PASS'] and skip_first_timing:
-        ctimer['PASS'] = False
-        return result  # do not record first timing in average nor the max
-
-      ctimer['MAX'] = max(ctimer['MAX'], result)
-
-      ctimer['COUNT'] = _count + 1
-      avg += result
-      avg = avg / ctimer["COUNT"]
-      ctimer['MEAN'] = avg
-    return result
+    if section is None:
+      handle = self._timers_default_handles.get(sname)
+    else:
+      handle = self._timers_handles.get(section, {}).get(sname)
+    if handle is None:
+      section = section or self.default_timers_section
+      if sname not in self.timers.get(section, {}):
+        return
+      handle = self.timer(sname, section=section)
+    return handle.end(skip_first_timing)
 
   def stop_timer(self, sname, skip_first_timing=False, section=None):
     return self.end_timer(sname=sname, skip_first_timing=skip_first_timing, section=section)
 
   def show_timer_total(self, sname, section=None):
     section = section or self.default_timers_section
+    self._flush_timers(section)
     ctimer = self.timers[section][sname]
     cnt = ctimer['COUNT']
     val = ctimer['MEAN'] * cnt
@@ -219,6 +1286,8 @@ class _TimersMixin(object):
                    show_max=True,
                    show_last=True,
                    show_count=True,
+                   show_percentiles=True,
+                   show_resources=True,
                    div=None,
                    threshold_no_show=None,
                    max_key_size=30,
@@ -233,15 +1302,28 @@ class _TimersMixin(object):
       return
 
     mean_time = ctimer['MEAN']
-    np_laps = np.array(ctimer['LAPS'])
-    if len(np_laps) > 0:
-      laps_mean = np_laps.mean()
-      laps_std = np_laps.std()
-      laps_zcount = (np_laps <= ZERO_THRESHOLD).sum()
-      laps_nzcount = len(np_laps) - laps_zcount
-      laps_nz_mean = np_laps.sum() / laps_nzcount if laps_nzcount > 0 else -1
-      laps_low_cnt = (np_laps <= max(ZERO_THRESHOLD, laps_mean - laps_std)).sum()
-      laps_low_prc =  laps_low_cnt / np_laps.shape[0] * 100
+    laps = ctimer['LAPS']
+    nr_laps = len(laps)
+    if nr_laps > 0:
+      if isinstance(laps, TimerLaps):
+        # running window statistics - only the low count needs a pass over the laps
+        laps_mean = laps.mean()
+        laps_std = laps.std()
+        laps_zcount = laps.zero_count
+        laps_sum = laps.sum()
+        np_laps = laps.values()
+        current_time = laps.last()
+      else:
+        np_laps = np.array(laps)
+        laps_mean = np_laps.mean()
+        laps_std = np_laps.std()
+        laps_zcount = (np_laps <= ZERO_THRESHOLD).sum()
+        laps_sum = np_laps.sum()
+        current_time = np_laps[-1]
+      laps_nzcount = nr_laps - laps_zcount
+      laps_nz_mean = laps_sum / laps_nzcount if laps_nzcount > 0 else -1
+      laps_low_cnt = np.count_nonzero(np_laps <= max(ZERO_THRESHOLD, laps_mean - laps_std))
+      laps_low_prc =  laps_low_cnt / nr_laps * 100
     else:
       # not mandatory but nice for forever opened 1 time timers
       laps_mean = -1
@@ -251,6 +1333,7 @@ class _TimersMixin(object):
       laps_nz_mean = -1
       laps_low_cnt = -1
       laps_low_prc =  -1
+      current_time = -1
       # end not mandatory
 
     count = ctimer['COUNT']
@@ -259,7 +1342,6 @@ class _TimersMixin(object):
       return
 
     max_time = ctimer['MAX']
-    current_time = np_laps[-1] if len(np_laps) > 0 else -1 # ctimer['END'] - ctimer['START']
 
     if not was_recently_seen:
       key = '[' + key[:max_key_size] + ']'
@@ -282,6 +1364,19 @@ class _TimersMixin(object):
       msg += ", lst: {:.4f}s".format(current_time)
     if show_count:
       msg += ", c: {}/L:{:.0f}%".format(count, laps_low_prc)
+    if show_percentiles and ctimer.get('HIST') is not None:
+      p95, p99 = ctimer['HIST'].percentiles([95, 99])
+      msg += ", p95: {:.4f}s, p99: {:.4f}s".format(p95, p99)
+    res_count = ctimer.get('RES_COUNT', 0)
+    if show_resources and res_count > 0:
+      if ctimer['CPU_PROCESS'] > 0 or ctimer['CPU_THREAD'] > 0:
+        msg += ", cpu: {:.4f}s/proc:{:.4f}s".format(
+          ctimer['CPU_THREAD'] / res_count, ctimer['CPU_PROCESS'] / res_count
+        )
+      if ctimer['MEM_PEAK'] > 0 or ctimer['MEM_DELTA'] != 0:
+        msg += ", mem: {:+.1f}KB/pk:{:.1f}KB".format(
+          ctimer['MEM_DELTA'] / res_count / 1024, ctimer['MEM_PEAK'] / 1024
+        )
     if div is not None:
       msg += ", itr(B{}): {:.4f}s".format(div, mean_time / div)
     return msg
@@ -303,6 +1398,8 @@ class _TimersMixin(object):
                   show_max=True,
                   show_last=True,
                   show_count=True,
+                  show_percentiles=True,
+                  show_resources=True,
                   div=None,
                   threshold_no_show=None,
                   selected_sections=None,
@@ -328,7 +1425,8 @@ class _TimersMixin(object):
           was_recently_seen=was_recently_seen,
           summary=summary,
           show_levels=show_levels, show_last=show_last,
-          show_max=show_max, show_count=show_count, div=div,
+          show_max=show_max, show_count=show_count,
+          show_percentiles=show_percentiles, show_resources=show_resources, div=div,
           threshold_no_show=threshold_no_show
         )
         if formatted_node is not None:
@@ -352,6 +1450,7 @@ class _TimersMixin(object):
         header += " (discarding entries with time < {})".format(threshold_no_show)
       lst_logs.append(header)
 
+      self._flush_timers()
       ## SORTING sections and keeping the default section the first one ..
       keys = list(self.timers.keys())
       if selected_sections is not None:
@@ -367,27 +1466,121 @@ class _TimersMixin(object):
 
       old_sections = []
       for section in keys:
+        if section not in self.timers:
+          continue # archived meanwhile
         last_see_ago = None
         if section in self.sections_last_used:
           last_see_ago = time() - self.sections_last_used[section]
-          if last_see_ago > OBSOLETE_SECTION_TIME:
+          if last_see_ago > OBSOLETE_SECTION_TIME and self._is_timers_section_archivable(section):
             old_sections.append(section)
             continue
-        lst_logs.append("Section '{}'{}".format(
-          section, " last seen {:.1f}s ago".format(last_see_ago) if last_see_ago is not None else ""
+        section_overhead = self.get_timers_overhead(section)
+        lst_logs.append("Section '{}'{}{}".format(
+          section, " last seen {:.1f}s ago".format(last_see_ago) if last_see_ago is not None else "",
+          ", instrumentation ~{:.4f}s".format(section_overhead) if section_overhead else "",
         ))
         buffer_visited = set()
-        dfs(buffer_visited, self.timers_graph[section], "ROOT", True, lst_logs, section)
+        with self._timers_sections_locks.get(section, Lock()):
+          dfs(buffer_visited, self.timers_graph[section], "ROOT", True, lst_logs, section)
       if len(old_sections) > 0:
-        lst_logs.append("Archived sections older than {:.1f} hrs: {}".format(
-          OBSOLETE_SECTION_TIME / 3600, len(old_sections)
-        ))
+        if self._timers_archive_obsolete:
+          for section in old_sections:
+            self.archive_timers_section(section)
+          lst_logs.append("Archived sections older than {:.1f} hrs: {} (total archived: {})".format(
+            OBSOLETE_SECTION_TIME / 3600, len(old_sections), len(self.timers_archive)
+          ))
+        else:
+          lst_logs.append("Sections unused for more than {:.1f} hrs (not shown): {}".format(
+            OBSOLETE_SECTION_TIME / 3600, len(old_sections)
+          ))
     else:
       self.verbose_log("DEBUG not activated!")
     return lst_logs
 
+  def _measure_timers_pair(self, handle, nr_iters):
+    start, end = handle.start, handle.end
+    for _ in range(min(nr_iters, 100)): # warm-up
+      start()
+      end()
+    laps = []
+    t_start = perf_counter()
+    for _ in range(nr_iters):
+      start()
+      laps.append(end())
+    pair = (perf_counter() - t_start) / nr_iters
+    return laps, pair
+
+  def calibrate_timers_overhead(self, nr_iters=2000, verbose=True):
+    """
+    Measures the cost of the timers instrumentation on this machine:
+      - LAP: the part of the start/end cost that ends up inside a measured lap
+        (the median lap of an empty timed block)
+      - PAIR: the total cost of a start/end pair (what a nested timer adds to the
+        lap of its parent and what the instrumentation costs the program)
+      - FAST_PAIR: the cost of a start/end pair of a top level timer while the
+        overhead correction is off (the lock-free fast path)
+
+    Runs only on request (or from `set_timers_overhead_correction` if not calibrated
+    yet) on private timers: the sections, handles and settings of this logger are not
+    touched so it is safe while other threads are timing.
+
+    Returns
+    -------
+    dict : {'LAP': seconds, 'PAIR': seconds, 'FAST_PAIR': seconds}
+    """
+    if not self.DEBUG:
+      return self._timers_overhead
+    calibration = _TimersCalibration(track_cpu=self._timers_track_cpu, track_memory=self._timers_track_memory)
+    # measure on the same code path used when correcting (with a null correction)
+    calibration._timers_overhead = {'LAP': 0, 'PAIR': 0}
+    calibration._timers_overhead_correction = True
+    handle = calibration.timer('calibration')
+    laps, pair = self._measure_timers_pair(handle, nr_iters)
+    calibration._timers_overhead_correction = False
+    calibration._invalidate_timers_handles()
+    _, fast_pair = self._measure_timers_pair(handle, nr_iters)
+    self._timers_overhead = {'LAP': float(np.median(laps)), 'PAIR': pair, 'FAST_PAIR': fast_pair}
+    if verbose:
+      self.P("Timers overhead: {:.2f}us included in each lap, {:.2f}us per start/end pair ({:.2f}us fast path)".format(
+        self._timers_overhead['LAP'] * 1e6, pair * 1e6, fast_pair * 1e6
+      ))
+    return self._timers_overhead
+
+  def set_timers_overhead_correction(self, enabled=True):
+    """
+    When enabled the calibrated instrumentation cost (own lap overhead plus the
+    cost of the timers nested inside the lap) is subtracted from each new lap.
+    """
+    if enabled and self._timers_overhead is None:
+      self.calibrate_timers_overhead()
+    self._timers_thread_started = {}
+    self._timers_overhead_correction = enabled and self._timers_overhead is not None
+    self._invalidate_timers_handles()
+    return
+
+  def get_timers_overhead(self, section=None):
+    """
+    Estimated total instrumentation cost (seconds) of a section (all sections if None)
+    based on the number of started timers and the calibrated cost of a start/end pair.
+    """
+    if self._timers_overhead is None:
+      # not calibrated - `calibrate_timers_overhead` runs only on request
+      return None
+    self._flush_timers(section)
+    sections = [section] if section is not None else list(self.timers.keys())
+    nr_started = sum(
+      tmr['START_COUNT'] for sect in sections for tmr in list(self.timers.get(sect, {}).values())
+    )
+    overhead = self._timers_overhead
+    if self._timers_overhead_correction:
+      return nr_started * overhead['PAIR']
+    return nr_started * overhead.get('FAST_PAIR', overhead['PAIR'])
+
   def get_timing_dict(self, skey, section=None):
     section = section or self.default_timers_section
+    handle = self._timers_handles.get(section, {}).get(skey)
+    if handle is not None and handle._pending:
+      handle._fold()
     timers_section = self.timers.get(section, {})
     dct = timers_section.get(skey, {})
     return dct
@@ -403,9 +1596,54 @@ class _TimersMixin(object):
   def get_timer_mean(self, skey, section=None):
     tmr = self.get_timer(skey, section=section)
     laps = tmr.get('LAPS', [])
+    if isinstance(laps, TimerLaps):
+      return laps.mean()
     result = np.mean(laps) if len(laps) > 0 else -1
     return result
 
+  def get_timer_std(self, skey, section=None):
+    """ lifetime standard deviation of the counted laps (Welford) """
+    tmr = self.get_timer(skey, section=section)
+    count = tmr.get('COUNT', 0)
+    return math.sqrt(tmr.get('M2', 0) / count) if count > 0 else -1
+
+
+  def get_timer_percentiles(self, skey, percentiles=DEFAULT_PERCENTILES, section=None, window=False):
+    """
+    Latency percentiles of a timer
+
+    Parameters
+    ----------
+    skey : str, mandatory
+      timer name
+
+    percentiles : list, optional
+      percentiles in 0..100. The default is [50, 95, 99].
+
+    section : str, optional
+      The default is None (default timers section).
+
+    window : bool, optional
+      If True the percentiles are exact and computed only on the last `MAX_LAPS` laps,
+      otherwise they cover the whole life of the timer (within `HIST_PRECISION`).
+      The default is False.
+
+    Returns
+    -------
+    dict
+      percentile -> seconds (-1 if the timer has no laps)
+    """
+    tmr = self.get_timer(skey, section=section)
+    if window:
+      laps = np.array(tmr.get('LAPS', []))
+      if len(laps) > 0:
+        values = np.percentile(laps, percentiles).tolist()
+      else:
+        values = [-1 for _ in percentiles]
+    else:
+      hist = tmr.get('HIST', None)
+      values = hist.percentiles(percentiles) if hist is not None else [-1 for _ in percentiles]
+    return {prc : val for prc, val in zip(percentiles, values)}
 
   def get_timer_count(self, skey, section=None):
     tmr = self.get_timer(skey, section=section)
@@ -418,9 +1656,12 @@ class _TimersMixin(object):
         section, len(dct_timers)
       ), color='r')
       return False
+    self._maybe_create_timers_section(section)
     self.timers[section] = dct_timers
     self.timers_graph[section] = dct_timers_graph
     self.sections_last_used[section] = time()
+    self._update_section_faulty_timers(section)
+    self._invalidate_timers_handles(section)
     return True
   
   def export_timers_section(self, section=None):
@@ -430,6 +1671,532 @@ class _TimersMixin(object):
         section
       ), color='r')
       return None, None
+    self._flush_timers(section)
     dct_timers = self.timers[section]
     dct_timers_graph = self.timers_graph[section]
     return dct_timers, dct_timers_graph
+
+  def export_timers_compact(self, selected_sections=None, max_laps=100):
+    """
+    Compact json-able form of the timer sections that can be sent to another
+    process and loaded with `import_timers_compact`. Only the last `max_laps` laps
+    are kept, the whole distribution travels in the histogram.
+    """
+    sections = selected_sections if selected_sections is not None else list(self.timers.keys())
+    self._flush_timers()
+    dct_compact = {}
+    for section in sections:
+      lock = self._timers_sections_locks.get(section)
+      if section not in self.timers or lock is None:
+        continue
+      dct_section_timers = {}
+      with lock:
+        for sname, ctimer in self.timers[section].items():
+          dct_timer = {k: v for k, v in ctimer.items() if k not in ['LAPS', 'HIST']}
+          laps = np.array(ctimer['LAPS'])
+          dct_timer['LAPS'] = laps[-max_laps:].tolist() if max_laps > 0 else []
+          hist = ctimer.get('HIST')
+          dct_timer['HIST'] = hist.to_dict() if hist is not None else None
+          dct_section_timers[sname] = dct_timer
+        #endfor
+        dct_graph = {
+          node: [list(children['SLOW'].keys()), list(children['FAST'].keys())]
+          for node, children in self.timers_graph[section].items()
+        }
+      #endwith
+      dct_compact[section] = {'TIMERS': dct_section_timers, 'GRAPH': dct_graph}
+    #endfor
+    return dct_compact
+
+  def _timer_from_compact(self, dct_timer):
+    ctimer = self.get_empty_timer()
+    for k, v in dct_timer.items():
+      if k == 'LAPS':
+        ctimer['LAPS'].extend(v)
+      elif k == 'HIST':
+        if v is not None:
+          ctimer['HIST'] = TimerHistogram.from_dict(v)
+      else:
+        ctimer[k] = v
+    return ctimer
+
+  def import_timers_compact(self, dct_compact, section_prefix=''):
+    """
+    Loads (overwrites) the sections exported with `export_timers_compact` under
+    `<section_prefix><section>`. Returns the list of imported section names.
+    """
+    imported = []
+    for section, dct_section in dct_compact.items():
+      dct_timers = {
+        sname: self._timer_from_compact(dct_timer)
+        for sname, dct_timer in dct_section['TIMERS'].items()
+      }
+      dct_graph = {
+        node: {"SLOW": OrderedDict.fromkeys(slow), "FAST": OrderedDict.fromkeys(fast)}
+        for node, (slow, fast) in dct_section['GRAPH'].items()
+      }
+      name = section_prefix + section
+      if self.import_timers_section(dct_timers, dct_graph, section=name, overwrite=True):
+        imported.append(name)
+    #endfor
+    return imported
+
+  @staticmethod
+  def _merge_timer(dst, src):
+    """ merges the statistics of timer dict `src` into `dst` (parallel Welford for the variance) """
+    n_a, n_b = dst['COUNT'], src['COUNT']
+    n = n_a + n_b
+    if n_b > 0:
+      delta = src['MEAN'] - dst['MEAN']
+      dst['M2'] = dst.get('M2', 0) + src.get('M2', 0) + delta * delta * n_a * n_b / n
+      dst['MEAN'] = dst['MEAN'] + delta * n_b / n
+      dst['MIN'] = src.get('MIN', 0) if n_a == 0 else min(dst['MIN'], src.get('MIN', 0))
+      dst['MAX'] = max(dst['MAX'], src['MAX'])
+    dst['COUNT'] = n
+    for k in ['START_COUNT', 'STOP_COUNT', 'RES_COUNT', 'CPU_THREAD', 'CPU_PROCESS', 'MEM_DELTA']:
+      dst[k] = dst.get(k, 0) + src.get(k, 0)
+    dst['MEM_PEAK'] = max(dst.get('MEM_PEAK', 0), src.get('MEM_PEAK', 0))
+    dst['START'] = max(dst['START'], src['START'])
+    dst['END'] = max(dst['END'], src['END'])
+    dst['LEVEL'] = src['LEVEL']
+    dst['LAPS'].extend(np.array(src['LAPS']))
+    if src.get('HIST') is not None:
+      dst['HIST'].merge(src['HIST'])
+    return dst
+
+  def merge_timers_sections(self, sections, target_section):
+    """
+    Aggregates the timers with the same name from `sections` (e.g. the same section
+    imported from several processes) into `target_section` (overwritten).
+    Counts, sums, min/max, variance and lap distributions are merged.
+    """
+    dct_timers = {}
+    dct_graph = {}
+    for section in sections:
+      self._flush_timers(section)
+      lock = self._timers_sections_locks.get(section)
+      if section not in self.timers or lock is None:
+        continue
+      with lock:
+        for sname, ctimer in self.timers[section].items():
+          if sname not in dct_timers:
+            dct_timers[sname] = self.get_empty_timer()
+          self._merge_timer(dct_timers[sname], ctimer)
+        for node, children in self.timers_graph[section].items():
+          if node not in dct_graph:
+            dct_graph[node] = {"SLOW": OrderedDict(), "FAST": OrderedDict()}
+          dct_graph[node]["SLOW"].update(children["SLOW"])
+          dct_graph[node]["FAST"].update(children["FAST"])
+      #endwith
+    #endfor
+    if "ROOT" not in dct_graph:
+      dct_graph["ROOT"] = {"SLOW": OrderedDict(), "FAST": OrderedDict()}
+    return self.import_timers_section(dct_timers, dct_graph, section=target_section, overwrite=True)
+
+  def _get_timers_snapshots_folder(self):
+    folder = os.path.join(self.get_output_folder(), TIMERS_SNAPSHOTS_SUBFOLDER)
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+  def save_timers_snapshot(self, fname=None, selected_sections=None, max_laps=MAX_LAPS, verbose=True):
+    """
+    Saves all (or selected) timer sections in compact form (gzipped json) in
+    `_output/timers_snapshots`. The snapshots can be loaded with `load_timers_snapshot`
+    and compared with `compare_timers`.
+
+    Returns
+    -------
+    str : path of the snapshot
+    """
+    dct_snapshot = {
+      'TIME': self.now_str(nice_print=True),
+      'LIB': self.__lib__,
+      'PID': os.getpid(),
+      'SECTIONS': self.export_timers_compact(selected_sections=selected_sections, max_laps=max_laps),
+    }
+    if fname is None:
+      fname = '{}_timers.json.gz'.format(self.now_str())
+    path = os.path.join(self._get_timers_snapshots_folder(), fname)
+    path_tmp = path + '.tmp'
+    with gzip.open(path_tmp, 'wt') as fh:
+      json.dump(dct_snapshot, fh)
+    os.replace(path_tmp, path)
+    if verbose:
+      self.P("Saved timers snapshot: {}".format(path))
+    return path
+
+  def load_timers_snapshot(self, path):
+    """
+    Loads a snapshot saved with `save_timers_snapshot` (full path or file name in
+    the snapshots folder)
+    """
+    if not os.path.isfile(path):
+      path = os.path.join(self._get_timers_snapshots_folder(), path)
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as fh:
+      dct_snapshot = json.load(fh)
+    return dct_snapshot
+
+  def start_timers_snapshots(self, interval_seconds=600, max_snapshots=48, **kwargs):
+    """
+    Starts a daemon thread that saves a timers snapshot every `interval_seconds`,
+    keeping only the last `max_snapshots` periodic snapshots.
+    """
+    if self._timers_snapshots_thread is not None and self._timers_snapshots_thread.is_alive():
+      self.P("Timers snapshots thread already running", color='r')
+      return
+    self._timers_snapshots_stop = Event()
+
+    def _run():
+      while not self._timers_snapshots_stop.wait(interval_seconds):
+        try:
+          self.save_timers_snapshot(
+            fname='{}_periodic_timers.json.gz'.format(self.now_str()), verbose=False, **kwargs
+          )
+          folder = self._get_timers_snapshots_folder()
+          periodic = sorted(x for x in os.listdir(folder) if x.endswith('_periodic_timers.json.gz'))
+          for fn in periodic[:max(len(periodic) - max_snapshots, 0)]:
+            os.remove(os.path.join(folder, fn))
+        except Exception as e:
+          self.P("Exception in timers snapshots thread: {}".format(e), color='r')
+      return
+
+    self._timers_snapshots_thread = Thread(target=_run, name='timers_snapshots', daemon=True)
+    self._timers_snapshots_thread.start()
+    self.P("Started timers snapshots thread every {}s".format(interval_seconds), color='y')
+    return
+
+  def stop_timers_snapshots(self, save_last=True):
+    if self._timers_snapshots_thread is not None:
+      self._timers_snapshots_stop.set()
+      self._timers_snapshots_thread.join()
+      self._timers_snapshots_thread = None
+      if save_last:
+        self.save_timers_snapshot(fname='{}_periodic_timers.json.gz'.format(self.now_str()))
+    return
+
+  @staticmethod
+  def _welch_test(mean_a, var_a, n_a, mean_b, var_b, n_b):
+    """ two sided Welch's t-test p-value (normal approximation if scipy is missing) """
+    se2 = var_a / n_a + var_b / n_b
+    if se2 <= 0:
+      return 0.0 if mean_a != mean_b else 1.0
+    t = (mean_b - mean_a) / math.sqrt(se2)
+    df_den = (var_a / n_a) ** 2 / max(n_a - 1, 1) + (var_b / n_b) ** 2 / max(n_b - 1, 1)
+    df = se2 ** 2 / df_den if df_den > 0 else max(n_a + n_b - 2, 1)
+    try:
+      from scipy import stats
+      return float(2 * stats.t.sf(abs(t), df))
+    except ImportError:
+      return math.erfc(abs(t) / math.sqrt(2))
+
+  @staticmethod
+  def _bootstrap_percentile_diff(laps_a, laps_b, percentile, n_bootstrap, confidence, rng):
+    """ bootstrap confidence interval of percentile(laps_b) - percentile(laps_a) """
+    samples_a = rng.choice(laps_a, size=(n_bootstrap, len(laps_a)), replace=True)
+    samples_b = rng.choice(laps_b, size=(n_bootstrap, len(laps_b)), replace=True)
+    diffs = np.percentile(samples_b, percentile, axis=1) - np.percentile(samples_a, percentile, axis=1)
+    alpha = (1 - confidence) / 2 * 100
+    return np.percentile(diffs, alpha), np.percentile(diffs, 100 - alpha)
+
+  def compare_timers(self, baseline, current=None, selected_sections=None,
+                     confidence=0.95, min_change=0.05, n_bootstrap=1000, min_count=5,
+                     verbose=True):
+    """
+    Compares two timers snapshots and reports statistically meaningful changes.
+
+    The mean change is tested with Welch's t-test on the lifetime mean/variance of
+    each timer and the p95 change with a bootstrap confidence interval on the laps
+    stored in the snapshots.
+
+    Parameters
+    ----------
+    baseline : str or dict, mandatory
+      snapshot path/name or the loaded snapshot.
+
+    current : str or dict, optional
+      The default is None (the current timers of this logger).
+
+    selected_sections : list, optional
+      The default is None (all sections found in both snapshots).
+
+    confidence : float, optional
+      The default is 0.95.
+
+    min_change : float, optional
+      Minimal relative change to be reported as regression/improvement. The default is 0.05.
+
+    n_bootstrap : int, optional
+      The default is 1000.
+
+    min_count : int, optional
+      Timers with fewer laps in either snapshot are not tested. The default is 5.
+
+    Returns
+    -------
+    pandas.DataFrame
+      one row per timer, regressions first.
+    """
+    import pandas as pd
+
+    if isinstance(baseline, str):
+      baseline = self.load_timers_snapshot(baseline)
+    if current is None:
+      current = {'SECTIONS': self.export_timers_compact(selected_sections=selected_sections, max_laps=MAX_LAPS)}
+    elif isinstance(current, str):
+      current = self.load_timers_snapshot(current)
+
+    rng = np.random.default_rng(42)
+    alpha = 1 - confidence
+    rows = []
+    base_sections, curr_sections = baseline['SECTIONS'], current['SECTIONS']
+    for section in sorted(set(base_sections) & set(curr_sections)):
+      if selected_sections is not None and section not in selected_sections:
+        continue
+      base_timers = base_sections[section]['TIMERS']
+      curr_timers = curr_sections[section]['TIMERS']
+      for sname in sorted(set(base_timers) & set(curr_timers)):
+        tmr_a, tmr_b = base_timers[sname], curr_timers[sname]
+        n_a, n_b = tmr_a['COUNT'], tmr_b['COUNT']
+        if min(n_a, n_b) < max(min_count, 1):
+          continue
+        mean_a, mean_b = tmr_a['MEAN'], tmr_b['MEAN']
+        # single lap timers (`min_count` <= 1) have a null variance
+        var_a = tmr_a.get('M2', 0) / max(n_a - 1, 1)
+        var_b = tmr_b.get('M2', 0) / max(n_b - 1, 1)
+        mean_change = mean_b / mean_a - 1 if mean_a > 0 else 0
+        mean_pvalue = self._welch_test(mean_a, var_a, n_a, mean_b, var_b, n_b)
+
+        laps_a, laps_b = np.array(tmr_a['LAPS']), np.array(tmr_b['LAPS'])
+        p95_a, p95_b, p95_change, p95_low, p95_high = -1, -1, 0, 0, 0
+        p95_significant = False
+        if len(laps_a) >= min_count and len(laps_b) >= min_count:
+          p95_a, p95_b = np.percentile(laps_a, 95), np.percentile(laps_b, 95)
+          p95_change = p95_b / p95_a - 1 if p95_a > 0 else 0
+          p95_low, p95_high = self._bootstrap_percentile_diff(
+            laps_a, laps_b, 95, n_bootstrap=n_bootstrap, confidence=confidence, rng=rng,
+          )
+          p95_significant = p95_low > 0 or p95_high < 0
+
+        mean_significant = mean_pvalue < alpha
+        if (mean_significant and mean_change > min_change) or (p95_significant and p95_change > min_change):
+          status = 'REGRESSION'
+        elif (mean_significant and mean_change < -min_change) or (p95_significant and p95_change < -min_change):
+          status = 'IMPROVEMENT'
+        else:
+          status = 'SAME'
+        rows.append({
+          'SECTION': section, 'TIMER': sname, 'STATUS': status,
+          'MEAN_BASE': mean_a, 'MEAN_CURR': mean_b, 'MEAN_CHG': mean_change, 'MEAN_PVAL': mean_pvalue,
+          'P95_BASE': p95_a, 'P95_CURR': p95_b, 'P95_CHG': p95_change,
+          'P95_DIFF_LOW': p95_low, 'P95_DIFF_HIGH': p95_high,
+          'COUNT_BASE': n_a, 'COUNT_CURR': n_b,
+        })
+      #endfor
+    #endfor
+    df = pd.DataFrame(rows, columns=[
+      'SECTION', 'TIMER', 'STATUS', 'MEAN_BASE', 'MEAN_CURR', 'MEAN_CHG', 'MEAN_PVAL',
+      'P95_BASE', 'P95_CURR', 'P95_CHG', 'P95_DIFF_LOW', 'P95_DIFF_HIGH', 'COUNT_BASE', 'COUNT_CURR',
+    ])
+    if df.shape[0] > 0:
+      df['_ORDER'] = df['STATUS'].map({'REGRESSION': 0, 'IMPROVEMENT': 1, 'SAME': 2})
+      df = df.sort_values(['_ORDER', 'MEAN_CHG'], ascending=[True, False]).drop(columns='_ORDER').reset_index(drop=True)
+    if verbose:
+      for _, row in df[df.STATUS != 'SAME'].iterrows():
+        self.P("{} {}/{}: mean {:.4f}s -> {:.4f}s ({:+.1f}%, p={:.3g}), p95 {:.4f}s -> {:.4f}s ({:+.1f}%)".format(
+          row.STATUS, row.SECTION, row.TIMER, row.MEAN_BASE, row.MEAN_CURR, row.MEAN_CHG * 100,
+          row.MEAN_PVAL, row.P95_BASE, row.P95_CURR, row.P95_CHG * 100,
+        ), color='r' if row.STATUS == 'REGRESSION' else 'g')
+      self.P("Compared {} timers: {} regressions, {} improvements".format(
+        df.shape[0], (df.STATUS == 'REGRESSION').sum(), (df.STATUS == 'IMPROVEMENT').sum()
+      ))
+    return df
+
+  def start_tracing(self, max_spans=DEFAULT_MAX_SPANS):
+    """
+    Starts recording each timer lap as a span (name, section, thread, start, end).
+    Only the last `max_spans` spans are kept. Use `export_trace` to save them.
+    """
+    self._trace_threads = {}
+    self._trace_spans = deque(maxlen=max_spans)
+    self._invalidate_timers_handles() # spans are recorded on the complete path only
+    self.P("Timers tracing started (max {} spans)".format(max_spans))
+    return
+
+  def stop_tracing(self):
+    """ stops recording spans - already recorded spans are kept for `export_trace` """
+    spans = self._trace_spans
+    self._trace_spans = None
+    self._invalidate_timers_handles()
+    if spans is not None:
+      self._last_trace_spans = spans
+    return
+
+  def get_trace_spans(self):
+    spans = self._trace_spans
+    if spans is None:
+      spans = self._last_trace_spans or []
+    return list(spans)
+
+  def export_trace(self, fname=None, clear=False):
+    """
+    Saves the recorded spans in the output folder as Chrome Trace Event JSON
+    that can be loaded in chrome://tracing or https://ui.perfetto.dev
+
+    Parameters
+    ----------
+    fname : str, optional
+      The default is None ('<timestamp>_trace.json').
+
+    clear : bool, optional
+      Drop the exported spans. The default is False.
+
+    Returns
+    -------
+    str : path of the trace file
+    """
+    spans = self.get_trace_spans()
+    pid = os.getpid()
+    events = [{
+      'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+      'args': {'name': '{}:{}'.format(self.__lib__, pid)},
+    }]
+    for tid, thread_name in list(self._trace_threads.items()):
+      events.append({
+        'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+        'args': {'name': thread_name},
+      })
+    for sname, section, tid, start_time, end_time in spans:
+      events.append({
+        'name': sname, 'cat': section, 'ph': 'X', 'pid': pid, 'tid': tid,
+        'ts': start_time * 1e6, 'dur': (end_time - start_time) * 1e6,
+      })
+    trace = {
+      'traceEvents': events,
+      'displayTimeUnit': 'ms',
+      # perf_counter origin is arbitrary - this allows mapping the spans to wall time
+      'otherData': {'wall_time_offset': time() - perf_counter()},
+    }
+    if fname is None:
+      fname = '{}_trace.json'.format(self.now_str())
+    path = os.path.join(self.get_output_folder(), fname)
+    with open(path, 'w') as fh:
+      json.dump(trace, fh)
+    self.P("Saved {} spans trace: {}".format(len(spans), path))
+    if clear:
+      if self._trace_spans is not None:
+        self._trace_spans.clear()
+      self._last_trace_spans = None
+    return path
+
+  @staticmethod
+  def _metrics_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+  def export_metrics(self, selected_sections=None, prefix=METRICS_PREFIX,
+                     percentiles=DEFAULT_PERCENTILES):
+    """
+    Renders the timers as OpenMetrics (Prometheus) text exposition. Nothing is
+    printed/logged so it can be served on a `/metrics` endpoint.
+
+    Each timer produces a `<prefix>_timer_seconds` summary (lifetime quantiles,
+    sum and count) plus gauges for the max, last and window mean lap and a
+    counter of starts. All samples are labeled with `section`, `timer` and
+    `process` (`<lib_name>:<pid>`).
+
+    Parameters
+    ----------
+    selected_sections : list, optional
+      The default is None (all sections).
+
+    prefix : str, optional
+      Metric names prefix. The default is 'lummetry'.
+
+    percentiles : list, optional
+      Percentiles (0..100) exported as summary quantiles. The default is [50, 95, 99].
+
+    Returns
+    -------
+    str
+    """
+    process = self._metrics_label_value('{}:{}'.format(self.__lib__, os.getpid()))
+    families = OrderedDict([
+      ('timer_seconds', ('summary', 'Timer laps duration.', [])),
+      ('timer_max_seconds', ('gauge', 'Longest timer lap.', [])),
+      ('timer_last_seconds', ('gauge', 'Last timer lap.', [])),
+      ('timer_window_mean_seconds', ('gauge', 'Mean of the last timer laps.', [])),
+      ('timer_starts', ('counter', 'Number of timer starts.', [])),
+      ('timer_thread_cpu_seconds', ('counter', 'Thread CPU time spent in timer laps.', [])),
+      ('timer_process_cpu_seconds', ('counter', 'Process CPU time spent in timer laps.', [])),
+      ('timer_alloc_bytes', ('gauge', 'Mean traced memory delta per timer lap.', [])),
+      ('timer_alloc_peak_bytes', ('gauge', 'Max traced memory peak above the lap start.', [])),
+    ])
+
+    sections = selected_sections if selected_sections is not None else list(self.timers.keys())
+    self._flush_timers()
+    for section in sections:
+      if section not in self.timers:
+        continue
+      lock = self._timers_sections_locks.get(section)
+      if lock is None:
+        continue
+      with lock:
+        timers = [(sname, dict(ctimer)) for sname, ctimer in self.timers[section].items()]
+      for sname, ctimer in timers:
+        labels = 'section="{}",timer="{}",process="{}"'.format(
+          self._metrics_label_value(section), self._metrics_label_value(sname), process
+        )
+        hist = ctimer.get('HIST')
+        if hist is not None:
+          for prc, val in zip(percentiles, hist.percentiles(percentiles)):
+            if val >= 0:
+              families['timer_seconds'][2].append('{{{},quantile="{}"}} {}'.format(labels, prc / 100, repr(float(val))))
+        families['timer_seconds'][2].append('_sum{{{}}} {}'.format(labels, repr(float(ctimer['MEAN'] * ctimer['COUNT']))))
+        families['timer_seconds'][2].append('_count{{{}}} {}'.format(labels, ctimer['COUNT']))
+        families['timer_max_seconds'][2].append('{{{}}} {}'.format(labels, repr(float(ctimer['MAX']))))
+        laps = ctimer['LAPS']
+        if len(laps) > 0:
+          if isinstance(laps, TimerLaps):
+            last, window_mean = laps.last(), laps.mean()
+          else:
+            last, window_mean = laps[-1], np.mean(laps)
+          families['timer_last_seconds'][2].append('{{{}}} {}'.format(labels, repr(float(last))))
+          families['timer_window_mean_seconds'][2].append('{{{}}} {}'.format(labels, repr(float(window_mean))))
+        families['timer_starts'][2].append('_total{{{}}} {}'.format(labels, ctimer['START_COUNT']))
+        res_count = ctimer.get('RES_COUNT', 0)
+        if res_count > 0:
+          families['timer_thread_cpu_seconds'][2].append('_total{{{}}} {}'.format(labels, repr(float(ctimer['CPU_THREAD']))))
+          families['timer_process_cpu_seconds'][2].append('_total{{{}}} {}'.format(labels, repr(float(ctimer['CPU_PROCESS']))))
+          families['timer_alloc_bytes'][2].append('{{{}}} {}'.format(labels, repr(float(ctimer['MEM_DELTA'] / res_count))))
+          families['timer_alloc_peak_bytes'][2].append('{{{}}} {}'.format(labels, ctimer['MEM_PEAK']))
+      #endfor
+    #endfor
+
+    lines = []
+    for name, (metric_type, description, samples) in families.items():
+      full_name = '{}_{}'.format(prefix, name)
+      lines.append('# TYPE {} {}'.format(full_name, metric_type))
+      if name.endswith('_seconds'):
+        lines.append('# UNIT {} seconds'.format(full_name))
+      elif name.endswith('_bytes'):
+        lines.append('# UNIT {} bytes'.format(full_name))
+      lines.append('# HELP {} {}'.format(full_name, description))
+      lines.extend(full_name + sample for sample in samples)
+    #endfor
+    lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+class _TimersCalibration(_TimersMixin):
+  """
+  Private timers used by `calibrate_timers_overhead` so that the measurements never
+  touch the sections, handles, limits or settings of the calibrated logger
+  """
+  def __init__(self, track_cpu=False, track_memory=False):
+    super(_TimersCalibration, self).__init__()
+    self._timers_track_cpu = track_cpu
+    self._timers_track_memory = track_memory and tracemalloc.is_tracing()
+    return
+
+  def P(self, *args, **kwargs):
+    return
@@ -28,6 +28,7 @@ import hashlib
 import numpy as np
 
 from io import BytesIO, TextIOWrapper
+from collections import deque
 
 class _UtilsMixin(object):
   """
@@ -74,25 +75,170 @@ class _UtilsMixin(object):
     return list(itertools.chain.from_iterable(lst))
 
   @staticmethod
-  def get_obj_size(obj, seen=None):
-    """Recursively finds size of objects"""
-    size = sys.getsizeof(obj)
+  def _get_obj_size(root, seen, seen_buffers, breakdown, sample_threshold, sample_size):
+    """
+    Iterative (explicit stack) deep size of `root`. Updates `seen`, `seen_buffers`
+    and `breakdown` in place and returns the total size in bytes.
+    """
+    total = 0
+    stack = [root]
+    while len(stack) > 0:
+      obj = stack.pop()
+      obj_id = id(obj)
+      if obj_id in seen:
+        continue
+      seen.add(obj_id)
+      obj_type = type(obj)
+      type_name = obj_type.__name__ if obj_type.__module__ == 'builtins' else '{}.{}'.format(
+        obj_type.__module__, obj_type.__name__
+      )
+      size = 0
+
+      if isinstance(obj, (str, bytes, bytearray, int, float, bool, complex)) or obj is None:
+        size = sys.getsizeof(obj)
+
+      elif isinstance(obj, np.ndarray):
+        # header only (getsizeof includes the buffer only for data-owning arrays)
+        size = sys.getsizeof(obj) - (obj.nbytes if obj.flags.owndata else 0)
+        # the data buffer is counted once for all the views on the same base
+        buff = obj
+        while isinstance(buff.base, np.ndarray):
+          buff = buff.base
+        buff_owner = buff if buff.base is None else buff.base
+        if id(buff_owner) not in seen_buffers:
+          seen_buffers.add(id(buff_owner))
+          size += buff.nbytes
+        if obj.dtype == object:
+          stack.extend(obj.ravel().tolist())
+
+      elif obj_type.__module__.startswith('pandas') and hasattr(obj, 'memory_usage'):
+        usage = obj.memory_usage(deep=True)
+        size = int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+
+      elif isinstance(obj, dict):
+        size = sys.getsizeof(obj)
+        n = len(obj)
+        if sample_threshold is not None and n > sample_threshold:
+          keys = list(itertools.islice(obj.keys(), sample_size))
+          values = [obj[k] for k in keys]
+          sampled_keys = _UtilsMixin._get_sampled_size(
+            keys, n / len(keys), seen, seen_buffers, breakdown,
+            sample_threshold, sample_size,
+          )
+          sampled_values = _UtilsMixin._get_sampled_size(
+            values, n / len(keys), seen, seen_buffers, breakdown,
+            sample_threshold, sample_size,
+          )
+          if sampled_keys is None:
+            stack.extend(obj.keys())
+          else:
+            size += sampled_keys
+          if sampled_values is None:
+            stack.extend(obj.values())
+          else:
+            size += sampled_values
+        else:
+          stack.extend(obj.keys())
+          stack.extend(obj.values())
+
+      elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size = sys.getsizeof(obj)
+        n = len(obj)
+        if sample_threshold is not None and n > sample_threshold:
+          if isinstance(obj, (list, tuple)):
+            step = max(n // sample_size, 1)
+            items = obj[::step][:sample_size]
+          else:
+            items = list(itertools.islice(obj, sample_size))
+          sampled = _UtilsMixin._get_sampled_size(
+            items, n / len(items), seen, seen_buffers, breakdown,
+            sample_threshold, sample_size,
+          )
+          if sampled is None:
+            stack.extend(obj)
+          else:
+            size += sampled
+        else:
+          stack.extend(obj)
+
+      else:
+        size = sys.getsizeof(obj)
+        if hasattr(obj, '__dict__'):
+          stack.append(obj.__dict__)
+        for slot in getattr(obj_type, '__slots__', ()):
+          if isinstance(slot, str) and hasattr(obj, slot):
+            stack.append(getattr(obj, slot))
+        if (
+          not hasattr(obj, '__dict__') and hasattr(obj, '__iter__') and
+          not hasattr(obj, '__next__') # do not consume iterators/generators
+        ):
+          try:
+            stack.extend(obj)
+          except Exception:
+            pass
+      #endif
+
+      total += size
+      breakdown[type_name] = breakdown.get(type_name, 0) + size
+    #endwhile
+    return total
+
+  @staticmethod
+  def _get_sampled_size(items, factor, seen, seen_buffers, breakdown, sample_threshold, sample_size):
+    """
+    Estimates the size of a huge container from a sample of its items if the
+    items are homogeneous (same type), otherwise returns None
+    """
+    if len(items) == 0 or len(set(type(x) for x in items)) > 1:
+      return None
+    sample_breakdown = {}
+    size = 0
+    for item in items:
+      size += _UtilsMixin._get_obj_size(
+        item, seen, seen_buffers, sample_breakdown, sample_threshold, sample_size
+      )
+    for k, v in sample_breakdown.items():
+      breakdown[k] = breakdown.get(k, 0) + int(v * factor)
+    return int(size * factor)
+
+  @staticmethod
+  def get_obj_size(obj, seen=None, return_breakdown=False, sample_threshold=None, sample_size=100):
+    """
+    Deep memory footprint of an object in bytes (iterative, no recursion limits).
+    Knows about numpy buffers (`nbytes`, counted once per shared base) and
+    pandas objects (`memory_usage(deep=True)`).
+
+    Parameters
+    ----------
+    obj : any, mandatory
+
+    seen : set, optional
+      ids of already counted objects. The default is None.
+
+    return_breakdown : bool, optional
+      If True returns `(size, dict)` where the dict is the size by type name
+      (largest first). The default is False.
+
+    sample_threshold : int, optional
+      Containers with more items than this are estimated from `sample_size`
+      items if the sampled items are homogeneous. The default is None (exact).
+
+    sample_size : int, optional
+      Number of items sampled from huge containers. The default is 100.
+
+    Returns
+    -------
+    size : int
+    """
     if seen is None:
       seen = set()
-    obj_id = id(obj)
-    if obj_id in seen:
-      return 0
-    # Important mark as seen *before* entering recursion to gracefully handle
-    # self-referential objects
-    seen.add(obj_id)
-    if isinstance(obj, dict):
-      size += sum([_UtilsMixin.get_obj_size(v, seen) for v in obj.values()])
-      size += sum([_UtilsMixin.get_obj_size(k, seen) for k in obj.keys()])
-    elif hasattr(obj, '__dict__'):
-      size += _UtilsMixin.get_obj_size(obj.__dict__, seen)
-    elif hasattr(obj, '__iter__') and not isinstance(obj, (str, bytes, bytearray)):
-      size += sum([_UtilsMixin.get_obj_size(i, seen) for i in obj])
-
+    breakdown = {}
+    size = _UtilsMixin._get_obj_size(
+      obj, seen, set(), breakdown, sample_threshold, sample_size
+    )
+    if return_breakdown:
+      breakdown = dict(sorted(breakdown.items(), key=lambda x: x[1], reverse=True))
+      return size, breakdown
     return size
 
   @staticmethod
@@ -0,0 +1,79 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.  
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project: 
+@description:
+"""
+
+import numpy as np
+
+from time import sleep
+
+from libraries.model_server_v2.example_endpoints.fake import FakeWorker
+
+_CONFIG = {
+  'ADD' : 7,
+  'PREDICT_OVERHEAD_MS' : 20, # simulated fixed cost of one model call (e.g. GPU launch / sync)
+  'PREDICT_ITEM_MS' : 1, # simulated cost of each item in the model call
+  'MODEL_SIZE_MB' : 50, # simulated model weights
+  'SHARED_MODEL' : False,
+}
+
+class FakeBatchWorker(FakeWorker):
+
+  """
+  Example implementation of a batch-aware worker: a model call has a fixed overhead plus a
+  small cost per item, so predicting N requests together is much cheaper than N calls.
+  Use it with `MAX_BATCH_SIZE` > 1 in the endpoint configuration.
+  """
+
+  @property
+  def cfg_predict_overhead_ms(self):
+    return self.config_worker['PREDICT_OVERHEAD_MS']
+
+  @property
+  def cfg_predict_item_ms(self):
+    return self.config_worker['PREDICT_ITEM_MS']
+
+  @property
+  def cfg_model_size_mb(self):
+    return self.config_worker['MODEL_SIZE_MB']
+
+  def _load_shared_model(self):
+    ### see docstring in parent
+    return np.ones(int(self.cfg_model_size_mb * 1024 ** 2 / 8), dtype=np.float64)
+
+  def _load_model(self):
+    ### see docstring in parent
+    ### without `SHARED_MODEL` each worker loads its own copy of the weights
+    self.model = self.shared_model if self.shared_model is not None else self._load_shared_model()
+    return
+
+  def _simulate_model_call(self, nr_items):
+    sleep((self.cfg_predict_overhead_ms + nr_items * self.cfg_predict_item_ms) / 1000)
+    return
+
+  def _predict(self, prep_inputs):
+    ### see docstring in parent
+    self._simulate_model_call(nr_items=1)
+    return super()._predict(prep_inputs)
+
+  def _predict_batch(self, lst_prep_inputs):
+    ### see docstring in parent
+    ### one simulated model call for the whole batch
+    self._simulate_model_call(nr_items=len(lst_prep_inputs))
+    return [super(FakeBatchWorker, self)._predict(x) for x in lst_prep_inputs]
@@ -34,14 +34,20 @@ import requests
 import flask
 
 from functools import partial
+from threading import Thread, Event
 from time import sleep
 
 from libraries import Logger
 from libraries import LummetryObject
 from libraries.logger_mixins.serialization_json_mixin import NPJson
+from libraries.logger_mixins.timers_mixin import METRICS_CONTENT_TYPE
 from libraries.model_server_v2.request_utils import get_api_request_body
 
-__VER__ = '0.1.2.5'
+__VER__ = '0.1.2.8'
+
+TIMERS_SECTION = 'FlaskGateway'
+FLEET_SECTION_PREFIX = 'FLEET:'
+DEFAULT_TIMERS_POLL_INTERVAL = 60
 
 DEFAULT_NR_WORKERS = 5
 DEFAULT_HOST = '127.0.0.1'
@@ -58,6 +64,7 @@ class FlaskGateway(LummetryObject):
                port=None,
                first_server_port=None,
                server_execution_path=None,
+               timers_poll_interval=None,
                **kwargs
               ):
 
@@ -95,6 +102,11 @@ class FlaskGateway(LummetryObject):
     server_execution_path: str, optional
       The API rule where the worker logic is executed.
       The default is None ('/analyze')
+
+    timers_poll_interval: int, optional
+      Seconds between pulling the timers of the servers into '<server>:<section>' and
+      fleet-wide 'FLEET:<section>' timer sections (0 disables the polling).
+      The default is None ('TIMERS_POLL_INTERVAL' from config or 60)
     """
 
     self.__version__ = __VER__
@@ -113,6 +125,12 @@ class FlaskGateway(LummetryObject):
 
     self._servers = {}
     self._paths = None
+
+    self._timers_poll_interval = timers_poll_interval
+    self._timers_poll_thread = None
+    self._timers_poll_stop = Event()
+    self._servers_timers_sections = {} # server name -> section -> '<server>:<section>'
+    self._fleet_sections = set()
     super(FlaskGateway, self).__init__(log=log, prefix_log='[FSKGW]', **kwargs)
     return
 
@@ -176,6 +194,15 @@ class FlaskGateway(LummetryObject):
       methods=['GET', 'POST']
     )
 
+    self.app.add_url_rule(
+      rule='/metrics',
+      endpoint='MetricsEndpoint',
+      view_func=self._view_func_metrics,
+      methods=['GET']
+    )
+
+    self._start_timers_polling()
+
     self.app.run(
       host=self._host,
       port=self._port,
@@ -183,6 +210,71 @@ class FlaskGateway(LummetryObject):
     )
     return
 
+  def _start_timers_polling(self):
+    if self._timers_poll_interval is None:
+      self._timers_poll_interval = self.config_data.get('TIMERS_POLL_INTERVAL', DEFAULT_TIMERS_POLL_INTERVAL)
+    if self._timers_poll_interval <= 0:
+      return
+    self._timers_poll_thread = Thread(target=self._timers_poll_loop, daemon=True)
+    self._timers_poll_thread.start()
+    return
+
+  def _timers_poll_loop(self):
+    while not self._timers_poll_stop.wait(self._timers_poll_interval):
+      try:
+        self.poll_servers_timers()
+      except Exception as exc:
+        self.P("Timers polling failed: {}".format(exc), color='r')
+    #endwhile
+    return
+
+  def poll_servers_timers(self):
+    """
+    Pulls the timers of all the servers into '<server>:<section>' sections and merges
+    the sections with the same name into fleet-wide 'FLEET:<section>' sections
+    """
+    for server_name, server in list(self._servers.items()):
+      url = 'http://{}:{}{}'.format(server['HOST'], server['PORT'], '/timers')
+      try:
+        dct_compact = requests.get(url, timeout=10).json()
+      except Exception as exc:
+        # the last pulled sections of the server are kept
+        self.P("Could not get timers from server {}: {}".format(server_name, exc), color='r')
+        continue
+      prefix = '{}:'.format(server_name)
+      imported = set(self.log.import_timers_compact(dct_compact, section_prefix=prefix))
+      dct_sections = {section: prefix + section for section in dct_compact if prefix + section in imported}
+      old_sections = self._servers_timers_sections.get(server_name, {})
+      for server_section in set(old_sections.values()) - imported:
+        # no longer reported by the server
+        self.log.delete_timers_section(server_section)
+      self._servers_timers_sections[server_name] = dct_sections
+      if server_name not in self._servers:
+        # killed meanwhile
+        self._drop_server_timers(server_name)
+    #endfor
+    self._merge_fleet_timers()
+    return
+
+  def _merge_fleet_timers(self):
+    """ rebuilds the 'FLEET:<section>' sections from the sections of the live servers """
+    dct_fleet = {}
+    for server_name, dct_sections in list(self._servers_timers_sections.items()):
+      for section, server_section in dct_sections.items():
+        dct_fleet.setdefault(section, []).append(server_section)
+    #endfor
+    for section, server_sections in dct_fleet.items():
+      self.log.merge_timers_sections(server_sections, target_section=FLEET_SECTION_PREFIX + section)
+    for section in self._fleet_sections - set(dct_fleet):
+      self.log.delete_timers_section(FLEET_SECTION_PREFIX + section)
+    self._fleet_sections = set(dct_fleet)
+    return
+
+  def _drop_server_timers(self, server_name):
+    for server_section in self._servers_timers_sections.pop(server_name, {}).values():
+      self.log.delete_timers_section(server_section)
+    return
+
   def _start_server(self, server_name, port, execution_path, host=None, nr_workers=None, verbosity=1):
     config_endpoint = self._config_endpoints.get(server_name, {})
 
@@ -295,10 +387,13 @@ class FlaskGateway(LummetryObject):
     process = self._get_server_process(server_name)
     process.terminate()
     self._servers.pop(server_name)
+    self._drop_server_timers(server_name)
+    self._merge_fleet_timers()
     return
 
   def kill_servers(self):
-    for server_name in self._servers:
+    self._timers_poll_stop.set()
+    for server_name in list(self._servers.keys()):
       self._kill_server_by_name(server_name)
     return
 
@@ -318,9 +413,13 @@ class FlaskGateway(LummetryObject):
       path
     )
 
-    response = requests.post(url, json=params)
+    with self.log.timer(signature, section=TIMERS_SECTION):
+      response = requests.post(url, json=params)
     return flask.jsonify(response.json())
 
+  def _view_func_metrics(self):
+    return flask.Response(self.log.export_metrics(), mimetype=METRICS_CONTENT_TYPE)
+
   def _view_func_start_server(self):
     request = flask.request
     params = get_api_request_body(request, self.log)
@@ -0,0 +1,141 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.  
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+*
+*
+*  RO:
+*    Modul software TempRent, proiect finanțat în cadrul POC, Axa prioritara 2 - Tehnologia Informației și Comunicațiilor (TIC) 
+*    pentru o economie digitală competitivă, Prioritatea de investiții 2b - Dezvoltarea produselor și s
+*    erviciilor TIC, a comerțului electronic și a cererii de TIC, cod SMIS 142474, 
+*    Contractul de finanțare nr. 2/221_ap3/24.06.2021.
+*
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project: 
+@description:
+"""
+
+from threading import Condition, Event
+from time import perf_counter
+
+
+class MicroBatcher(object):
+  """
+  Gathers concurrent requests in batches of at most `max_batch_size` requests, waiting
+  at most `max_wait_ms` after the first request of the batch, and runs each batch on one
+  worker from `workers_pool` via `FlaskWorker.execute_batch`.
+
+  There is no dispatcher thread: the first request of a batch is the batch leader - it
+  waits for the batch to fill (or for the deadline), acquires a worker, executes the batch
+  and wakes up the other requests with their own answers. Several batches can run in
+  parallel on different workers.
+  """
+
+  def __init__(self, workers_pool, max_batch_size, max_wait_ms, wait_worker_timeout=None):
+    self._workers_pool = workers_pool
+    self._max_batch_size = max_batch_size
+    self._max_wait = max_wait_ms / 1000
+    self._wait_worker_timeout = wait_worker_timeout
+
+    self._cond = Condition()
+    self._pending = None # the batch that currently accepts requests
+
+    self.nr_batches = 0
+    self.nr_batched_requests = 0
+    return
+
+  @property
+  def avg_batch_size(self):
+    return self.nr_batched_requests / max(self.nr_batches, 1)
+
+  def submit(self, inputs, counter):
+    """
+    Adds the request to the pending batch and blocks until its answer is ready.
+
+    Returns
+    -------
+    (worker, answer, wid) as `FlaskModelServer._wait_predict`
+    """
+    with self._cond:
+      batch = self._pending
+      is_leader = batch is None
+      if is_leader:
+        batch = {'INPUTS': [], 'COUNTERS': [], 'RESULTS': None, 'DONE': Event()}
+        self._pending = batch
+      #endif
+      idx = len(batch['INPUTS'])
+      batch['INPUTS'].append(inputs)
+      batch['COUNTERS'].append(counter)
+      if len(batch['INPUTS']) >= self._max_batch_size:
+        # batch full - closed for new requests, the leader can start
+        self._pending = None
+        self._cond.notify_all()
+      #endif
+
+      if is_leader:
+        deadline = perf_counter() + self._max_wait
+        while self._pending is batch:
+          remaining = deadline - perf_counter()
+          if remaining <= 0:
+            self._pending = None
+            break
+          self._cond.wait(remaining)
+        #endwhile
+      #endif
+    #endwith
+
+    if is_leader:
+      try:
+        batch['RESULTS'] = self._execute(batch)
+      except Exception as exc:
+        # every request of the batch gets an error answer
+        batch['RESULTS'] = self._error_results(batch, 'Batch execution failed: {}'.format(exc))
+      finally:
+        batch['DONE'].set()
+    else:
+      batch['DONE'].wait()
+    #endif
+
+    results = batch['RESULTS']
+    if results is None:
+      return None, None, -1
+    worker, answers, wid = results
+    return worker, answers[idx], wid
+
+  @staticmethod
+  def _error_results(batch, err_msg):
+    return None, [{'ERROR': err_msg} for _ in batch['INPUTS']], -1
+
+  def _execute(self, batch):
+    nr_inputs = len(batch['INPUTS'])
+    wid = self._workers_pool.acquire(timeout=self._wait_worker_timeout)
+    if wid is None:
+      return self._error_results(
+        batch, 'All workers busy, request timed out after {}s'.format(self._wait_worker_timeout)
+      )
+
+    worker = self._workers_pool.workers[wid]
+    try:
+      answers = worker.execute_batch(
+        lst_inputs=batch['INPUTS'],
+        lst_counters=batch['COUNTERS']
+      )
+    finally:
+      self._workers_pool.release(wid)
+
+    with self._cond:
+      self.nr_batches += 1
+      self.nr_batched_requests += nr_inputs
+    return worker, answers, wid
@@ -0,0 +1,266 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.  
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+*
+*
+*  RO:
+*    Modul software TempRent, proiect finanțat în cadrul POC, Axa prioritara 2 - Tehnologia Informației și Comunicațiilor (TIC) 
+*    pentru o economie digitală competitivă, Prioritatea de investiții 2b - Dezvoltarea produselor și s
+*    erviciilor TIC, a comerțului electronic și a cererii de TIC, cod SMIS 142474, 
+*    Contractul de finanțare nr. 2/221_ap3/24.06.2021.
+*
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project: 
+@description:
+"""
+
+import importlib
+import traceback
+import multiprocessing as mp
+
+from threading import Lock
+
+from libraries import Logger
+from libraries import LummetryObject
+
+
+def _process_worker_main(conn, log_kwargs, module_name, class_name, worker_kwargs):
+  """
+  Entry point of a worker child process: builds its own logger and the `FlaskWorker`
+  subclass instance, then serves the commands received on `conn` one by one.
+  Each reply is (status, result, notifications) - the notifications created by the
+  worker meanwhile are relayed with it so the server never has to ask for them.
+  """
+  try:
+    log = Logger(**log_kwargs)
+    _cls_def = getattr(importlib.import_module(module_name), class_name)
+    worker = _cls_def(log=log, **worker_kwargs)
+  except:
+    conn.send(('ERROR', traceback.format_exc(), []))
+    return
+  conn.send(('READY', None, worker.get_notifications()))
+
+  while True:
+    try:
+      cmd, payload = conn.recv()
+    except (EOFError, OSError):
+      # parent is gone
+      break
+    try:
+      if cmd == 'EXECUTE':
+        result = worker.execute(**payload)
+      elif cmd == 'EXECUTE_BATCH':
+        result = worker.execute_batch(**payload)
+      elif cmd == 'TIMERS':
+        result = log.export_timers_compact(max_laps=payload)
+      elif cmd == 'STOP':
+        conn.send(('OK', None, worker.get_notifications()))
+        break
+      else:
+        raise ValueError("Unknown command '{}'".format(cmd))
+      conn.send(('OK', result, worker.get_notifications()))
+    except:
+      conn.send(('ERROR', traceback.format_exc(), worker.get_notifications()))
+  #endwhile
+  return
+
+
+class ProcessWorkerProxy(LummetryObject):
+
+  """
+  Runs a `FlaskWorker` subclass in a child process (`WORKER_MODE: "process"`) so that
+  CPU-bound pre/post-processing is not serialized by the GIL of the server process.
+  Exposes the same `execute` / `execute_batch` / `get_notifications` API as the worker;
+  requests and answers are pickled through a `multiprocessing.Pipe`. The notifications
+  of the child arrive with the answers so `get_notifications` never waits for it.
+
+  The child is supervised: if it dies (or does not answer in `request_timeout` seconds)
+  the current request gets an error answer and a new child is started for the next ones.
+  """
+
+  def __init__(self, log : Logger,
+               module_name,
+               class_name,
+               worker_kwargs,
+               start_method='spawn',
+               request_timeout=None,
+               **kwargs):
+    self._module_name = module_name
+    self.worker_class_name = class_name
+    self._worker_kwargs = worker_kwargs
+    self._start_method = start_method
+    self._request_timeout = request_timeout
+
+    self._process = None
+    self._conn = None
+    self._ready = False
+    self._lock = Lock()
+    self.nr_restarts = 0
+    super(ProcessWorkerProxy, self).__init__(log=log, prefix_log='[PRCWKR]', maxlen_notifications=1000, **kwargs)
+    return
+
+  def startup(self):
+    super().startup()
+    self._start_process()
+    return
+
+  @property
+  def _worker_id(self):
+    return self._worker_kwargs.get('worker_id')
+
+  def _start_process(self):
+    ctx = mp.get_context(self._start_method)
+    parent_conn, child_conn = ctx.Pipe()
+    log_kwargs = dict(
+      lib_name='{}W{}'.format(self.log.log_suffix, self._worker_id),
+      base_folder=self.log._root_folder,
+      app_folder=self.log._app_folder,
+      DEBUG=self.log.DEBUG,
+      TF_KERAS=False,
+    )
+    if self.log.config_file != 'default_config.txt':
+      log_kwargs['config_file'] = self.log.config_file
+    self._process = ctx.Process(
+      target=_process_worker_main,
+      args=(child_conn, log_kwargs, self._module_name, self.worker_class_name, self._worker_kwargs),
+      name='{}:{}'.format(self.worker_class_name, self._worker_id),
+      daemon=True,
+    )
+    self._process.start()
+    child_conn.close()
+    self._conn = parent_conn
+    self._ready = False
+    return
+
+  def wait_ready(self):
+    """ blocks until the child process has loaded the worker; returns False if it failed """
+    with self._lock:
+      return self._ready or self._wait_ready()
+
+  def get_process_memory(self):
+    """
+    Memory of the child process in MB - PSS where available (pages shared with the
+    server after a fork are split between the processes), RSS otherwise
+    """
+    import psutil
+    try:
+      mem = psutil.Process(self._process.pid).memory_full_info()
+      return getattr(mem, 'pss', mem.rss) / pow(1024, 2)
+    except (psutil.Error, AttributeError):
+      return 0
+
+  def _recv(self):
+    status, result, notifications = self._conn.recv()
+    # relayed notifications are kept here and served by `get_notifications`
+    self._messages.extend(notifications)
+    return status, result
+
+  def _wait_ready(self):
+    # the child loads the model while the server starts the other workers
+    try:
+      status, result = self._recv()
+    except (EOFError, OSError):
+      status, result = 'ERROR', 'process exited with code {}'.format(self._process.exitcode)
+    self._ready = status == 'READY'
+    if not self._ready:
+      self.P("Worker process {}:{} failed to start: {}".format(
+        self.worker_class_name, self._worker_id, result), color='r'
+      )
+    return self._ready
+
+  def _stop_process(self, kill=False):
+    if self._process is None:
+      return
+    if not kill and self._process.is_alive():
+      try:
+        self._conn.send(('STOP', None))
+        self._process.join(timeout=5)
+      except (EOFError, OSError):
+        pass
+    if self._process.is_alive():
+      self._process.kill()
+      self._process.join()
+    self._conn.close()
+    self._process = None
+    self._conn = None
+    self._ready = False
+    return
+
+  def _restart_process(self, reason):
+    self.nr_restarts += 1
+    msg = "Worker process {}:{} {} - restarting it (restart #{})".format(
+      self.worker_class_name, self._worker_id, reason, self.nr_restarts
+    )
+    self.P(msg, color='r')
+    self._create_notification(notif='exception', msg=msg)
+    self._stop_process(kill=True)
+    self._start_process()
+    return
+
+  def _call(self, cmd, payload=None, timeout=None, blocking=True):
+    """
+    Sends one command to the child and returns (success, result). With `blocking=False`
+    returns (False, None) right away if the child is busy with another command.
+    """
+    if not self._lock.acquire(blocking=blocking):
+      return False, None
+    try:
+      if self._process is None or not self._process.is_alive():
+        self._restart_process(reason='is not running')
+      if not self._ready and not self._wait_ready():
+        return False, 'Worker process is not available'
+
+      try:
+        self._conn.send((cmd, payload))
+        if timeout is not None and not self._conn.poll(timeout):
+          self._restart_process(reason='did not answer in {}s'.format(timeout))
+          return False, 'Worker process timeout'
+        status, result = self._recv()
+      except (EOFError, OSError):
+        self._restart_process(reason='crashed (exit code {})'.format(self._process.exitcode))
+        return False, 'Worker process crashed'
+    finally:
+      self._lock.release()
+    return status == 'OK', result
+
+  def _error_answer(self, err):
+    return {'{}_ERROR'.format(self.worker_class_name): err}
+
+  def execute(self, inputs, counter):
+    success, result = self._call(
+      'EXECUTE', {'inputs': inputs, 'counter': counter}, timeout=self._request_timeout
+    )
+    return result if success else self._error_answer(result)
+
+  def execute_batch(self, lst_inputs, lst_counters):
+    success, result = self._call(
+      'EXECUTE_BATCH', {'lst_inputs': lst_inputs, 'lst_counters': lst_counters}, timeout=self._request_timeout
+    )
+    return result if success else [self._error_answer(result) for _ in lst_inputs]
+
+  def export_timers(self, max_laps=100):
+    """
+    The timers of the child process (`export_timers_compact` format) or None if the
+    child is busy - metrics scrapes do not wait for running requests.
+    """
+    success, result = self._call('TIMERS', max_laps, timeout=self._request_timeout, blocking=False)
+    return result if success else None
+
+  def shutdown(self):
+    with self._lock:
+      self._stop_process()
+    super().shutdown()
+    return
@@ -0,0 +1,164 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.  
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+*
+*
+*  RO:
+*    Modul software TempRent, proiect finanțat în cadrul POC, Axa prioritara 2 - Tehnologia Informației și Comunicațiilor (TIC) 
+*    pentru o economie digitală competitivă, Prioritatea de investiții 2b - Dezvoltarea produselor și s
+*    erviciilor TIC, a comerțului electronic și a cererii de TIC, cod SMIS 142474, 
+*    Contractul de finanțare nr. 2/221_ap3/24.06.2021.
+*
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project: 
+@description:
+"""
+
+import json
+import hashlib
+
+from copy import deepcopy
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+# request params that identify the caller / the call, not the work to be done
+DEFAULT_EXCLUDED_FIELDS = ['client', 'call_id', 'counter', 'signature']
+
+
+def get_request_key(params, key_fields=None, excluded_fields=DEFAULT_EXCLUDED_FIELDS):
+  """
+  Canonical hash of the request params: sha1 of the sorted keys json of `key_fields`
+  (or of all the params except `excluded_fields`)
+  """
+  if key_fields is not None:
+    dct_key = {k: params.get(k) for k in key_fields}
+  else:
+    dct_key = {k: v for k, v in params.items() if k not in excluded_fields}
+  str_key = json.dumps(dct_key, sort_keys=True, separators=(',', ':'), default=str)
+  return hashlib.sha1(str_key.encode()).hexdigest()
+
+
+class ResponseCache(object):
+  """
+  In-process LRU cache with time-to-live for the answers of idempotent requests, keyed by
+  a canonical hash of the request params (sorted keys json of `key_fields` or of all the
+  params except `excluded_fields`).
+  """
+
+  def __init__(self, size=1000, ttl=None, key_fields=None, excluded_fields=None):
+    """
+    Parameters:
+    -----------
+    size: int, optional
+      Max number of cached answers, the least recently used one is evicted first.
+      The default is 1000
+
+    ttl: float, optional
+      Seconds an answer stays valid. The default is None (no expiration)
+
+    key_fields: list, optional
+      Only these params are part of the cache key. The default is None (all the params)
+
+    excluded_fields: list, optional
+      Params ignored when `key_fields` is None. The default is None (`DEFAULT_EXCLUDED_FIELDS`)
+    """
+    self._size = size
+    self._ttl = ttl
+    self._key_fields = key_fields
+    self._excluded_fields = set(excluded_fields if excluded_fields is not None else DEFAULT_EXCLUDED_FIELDS)
+
+    self._cache = OrderedDict() # key -> (expire time, answer, signature)
+    self._lock = Lock()
+
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.expirations = 0
+    return
+
+  def __len__(self):
+    return len(self._cache)
+
+  @property
+  def hit_ratio(self):
+    nr_requests = self.hits + self.misses
+    return self.hits / nr_requests if nr_requests > 0 else 0
+
+  def get_key(self, params):
+    return get_request_key(params, key_fields=self._key_fields, excluded_fields=self._excluded_fields)
+
+  def get(self, key):
+    """ returns (answer copy, signature) or None """
+    with self._lock:
+      entry = self._cache.get(key)
+      if entry is not None and entry[0] is not None and entry[0] < monotonic():
+        del self._cache[key]
+        self.expirations += 1
+        entry = None
+      if entry is None:
+        self.misses += 1
+        return None
+      self._cache.move_to_end(key)
+      self.hits += 1
+    #endwith
+    return deepcopy(entry[1]), entry[2]
+
+  def put(self, key, answer, signature=None):
+    expire = monotonic() + self._ttl if self._ttl is not None else None
+    entry = (expire, deepcopy(answer), signature)
+    with self._lock:
+      self._cache[key] = entry
+      self._cache.move_to_end(key)
+      while len(self._cache) > self._size:
+        self._cache.popitem(last=False)
+        self.evictions += 1
+    #endwith
+    return
+
+  def clear(self):
+    with self._lock:
+      self._cache.clear()
+    return
+
+  def get_stats(self):
+    return {
+      'SIZE': len(self._cache),
+      'MAX_SIZE': self._size,
+      'HITS': self.hits,
+      'MISSES': self.misses,
+      'HIT_RATIO': self.hit_ratio,
+      'EVICTIONS': self.evictions,
+      'EXPIRATIONS': self.expirations,
+    }
+
+  def export_metrics(self, prefix, labels=''):
+    """ OpenMetrics lines (without `# EOF`) with the cache counters and hit ratio """
+    stats = self.get_stats()
+    lines = []
+    for name, metric_type, description, value in [
+      ('response_cache_hits', 'counter', 'Requests answered from the response cache.', stats['HITS']),
+      ('response_cache_misses', 'counter', 'Requests not found in the response cache.', stats['MISSES']),
+      ('response_cache_evictions', 'counter', 'Answers evicted from the full response cache.', stats['EVICTIONS']),
+      ('response_cache_hit_ratio', 'gauge', 'Response cache hits / requests.', stats['HIT_RATIO']),
+      ('response_cache_size', 'gauge', 'Answers in the response cache.', stats['SIZE']),
+    ]:
+      full_name = '{}_{}'.format(prefix, name)
+      lines.append('# TYPE {} {}'.format(full_name, metric_type))
+      lines.append('# HELP {} {}'.format(full_name, description))
+      lines.append('{}{}{{{}}} {}'.format(full_name, '_total' if metric_type == 'counter' else '', labels, value))
+    #endfor
+    return lines
@@ -28,19 +28,29 @@ Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Res
 """
 
 import flask
-import numpy as np
-from time import sleep
 
 from threading import Lock
+from time import perf_counter
 
 from libraries import Logger
 from libraries import LummetryObject
 from libraries import _PluginsManagerMixin
 from libraries.logger_mixins.serialization_json_mixin import NPJson
+from libraries.logger_mixins.timers_mixin import METRICS_CONTENT_TYPE, METRICS_PREFIX
 
 from libraries.model_server_v2.request_utils import get_api_request_body
+from libraries.model_server_v2.worker import FlaskWorker
+from libraries.model_server_v2.workers_pool import WorkersPool
+from libraries.model_server_v2.micro_batcher import MicroBatcher
+from libraries.model_server_v2.process_worker import ProcessWorkerProxy
+from libraries.model_server_v2.response_cache import ResponseCache
+from libraries.model_server_v2.single_flight import SingleFlight
 
-__VER__ = '0.1.2.2'
+__VER__ = '0.1.2.15'
+
+TIMERS_SECTION = 'FlaskModelServer'
+LOCAL_ADDRESSES = ['127.0.0.1', '::1']
+WORKERS_SECTION_PREFIX = 'WORKERS:' # timers of the 'process' mode workers merged by section
 
 class FlaskModelServer(LummetryObject, _PluginsManagerMixin):
 
@@ -86,6 +96,23 @@ class FlaskModelServer(LummetryObject, _PluginsManagerMixin):
     config_endpoint: dict, optional
       The configuration of the endpoint:
         * 'NR_WORKERS'
+        * 'WAIT_WORKER_TIMEOUT' - max seconds a request waits for a free worker (default None - no limit)
+        * 'MAX_BATCH_SIZE', 'MAX_WAIT_MS' - if `MAX_BATCH_SIZE` > 1 concurrent requests are gathered in
+          batches of at most `MAX_BATCH_SIZE` requests waiting at most `MAX_WAIT_MS` (default 5) and
+          each batch is executed with `FlaskWorker.execute_batch`
+        * 'WORKER_MODE' - 'thread' (default) or 'process' (each worker runs in a supervised child process)
+        * 'WORKER_START_METHOD' - multiprocessing start method for 'process' mode (default 'spawn')
+        * 'SHARED_MODEL' - the workers share one read-only model loaded with `FlaskWorker._load_shared_model`
+          (once per process; with 'process' mode and 'fork' it is loaded once in the server before forking).
+          Ignored, with a warning, if the worker class does not implement `_load_shared_model`
+        * 'WORKER_REQUEST_TIMEOUT' - in 'process' mode a child that does not answer in this many seconds
+          is restarted (default None - no limit)
+        * 'RESPONSE_CACHE' - dict {'SIZE', 'TTL', 'KEY_FIELDS', 'EXCLUDED_FIELDS'} that enables the LRU/TTL cache
+          of the answers of identical requests (see `ResponseCache`); responses get the header 'X-Cache: HIT/MISS'
+        * 'COALESCE_REQUESTS' - true or dict {'KEY_FIELDS', 'EXCLUDED_FIELDS'}: identical requests that arrive while
+          one is computed wait for it and share its answer (see `SingleFlight`); header 'X-Coalesced: true/false'
+        * 'PROFILER_ENDPOINT' - exposes the '/profiler' route (start/stop the sampling profiler) to the
+          clients on the same machine (default False)
         * other params that will be passed as upstream configuration to the worker
       The default is None ({})
 
@@ -113,11 +140,14 @@ class FlaskModelServer(LummetryObject, _PluginsManagerMixin):
     self._verbosity_level = verbosity_level
     self._config_endpoint = config_endpoint or {}
 
-    self._lst_workers = []
-    self._mask_workers_in_use = []
+    self._workers_pool = WorkersPool()
+    self._batcher = None
+    self._response_cache = None
+    self._single_flight = None
+    self._workers_timers_sections = {} # wid -> {section: 'W<wid>:<section>'} imported from the 'process' mode workers
+    self._workers_merged_sections = set() # sections merged in 'WORKERS:<section>'
     self._counter = 0
 
-    self._lock = Lock()
     self._lock_counter = Lock()
     self._paths = None
 
@@ -129,6 +159,40 @@ class FlaskModelServer(LummetryObject, _PluginsManagerMixin):
     self._log_banner()
     self._update_nr_workers(self.__initial_nr_workers)
 
+    max_batch_size = self._config_endpoint.get('MAX_BATCH_SIZE', 1)
+    if max_batch_size > 1:
+      self._batcher = MicroBatcher(
+        workers_pool=self._workers_pool,
+        max_batch_size=max_batch_size,
+        max_wait_ms=self._config_endpoint.get('MAX_WAIT_MS', 5),
+        wait_worker_timeout=self._wait_worker_timeout,
+      )
+      self.P("Micro-batching enabled: max {} requests / {}ms".format(
+        max_batch_size, self._config_endpoint.get('MAX_WAIT_MS', 5)), color='g'
+      )
+    #endif
+
+    dct_cache_config = self._config_endpoint.get('RESPONSE_CACHE', None)
+    if dct_cache_config:
+      self._response_cache = ResponseCache(
+        size=dct_cache_config.get('SIZE', 1000),
+        ttl=dct_cache_config.get('TTL', None),
+        key_fields=dct_cache_config.get('KEY_FIELDS', None),
+        excluded_fields=dct_cache_config.get('EXCLUDED_FIELDS', None),
+      )
+      self.P("Response cache enabled: {}".format(dct_cache_config), color='g')
+    #endif
+
+    coalesce_config = self._config_endpoint.get('COALESCE_REQUESTS', None)
+    if coalesce_config:
+      dct_coalesce_config = coalesce_config if isinstance(coalesce_config, dict) else {}
+      self._single_flight = SingleFlight(
+        key_fields=dct_coalesce_config.get('KEY_FIELDS', None),
+        excluded_fields=dct_coalesce_config.get('EXCLUDED_FIELDS', None),
+      )
+      self.P("Requests coalescing enabled: {}".format(coalesce_config), color='g')
+    #endif
+
     if not self._execution_path.startswith('/'):
       self._execution_path = '/' + self._execution_path
 
@@ -164,6 +228,29 @@ class FlaskModelServer(LummetryObject, _PluginsManagerMixin):
       methods=['GET', 'POST']
     )
 
+    self.app.add_url_rule(
+      rule='/metrics',
+      endpoint='MetricsEndpoint',
+      view_func=self._view_func_metrics_endpoint,
+      methods=['GET']
+    )
+
+    self.app.add_url_rule(
+      rule='/timers',
+      endpoint='TimersEndpoint',
+      view_func=self._view_func_timers_endpoint,
+      methods=['GET', 'POST']
+    )
+
+    if self._config_endpoint.get('PROFILER_ENDPOINT', False):
+      self.app.add_url_rule(
+        rule='/profiler',
+        endpoint='ProfilerEndpoint',
+        view_func=self._view_func_profiler_endpoint,
+        methods=['GET', 'POST']
+      )
+    #endif
+
     self.app.run(
       host=self._host,
       port=self._port,
@@ -189,37 +276,67 @@ class FlaskModelServer(LummetryObject, _PluginsManagerMixin):
     self.log.P("")
     return
 
-  def _create_worker(self):
-    _module_name, _class_name, _cls_def, _config_dict = self._get_module_name_and_class(
+  def _get_worker_class(self):
+    return self._get_module_name_and_class(
       locations=self.__workers_location,
       name=self.__worker_name,
       suffix=self.__worker_suffix
     )
 
-    if _cls_def is None:
-      return
-
-    worker_id = len(self._mask_workers_in_use)
-
-    worker = _cls_def(
-      log=self.log,
-      default_config=_config_dict,
+  def _get_worker_kwargs(self, worker_id, config_dict):
+    return dict(
+      default_config=config_dict,
       verbosity_level=self._verbosity_level,
       worker_id=worker_id,
       upstream_config=self._config_endpoint
     )
 
-    self._lst_workers.append(worker)
-    self._mask_workers_in_use.append(0)
+  def _create_worker(self):
+    _module_name, _class_name, _cls_def, _config_dict = self._get_worker_class()
+
+    if _cls_def is None:
+      return
+
+    worker_id = len(self._workers_pool)
+    worker_kwargs = self._get_worker_kwargs(worker_id, _config_dict)
+
+    if self._is_process_mode:
+      worker = ProcessWorkerProxy(
+        log=self.log,
+        module_name=_module_name,
+        class_name=_class_name,
+        worker_kwargs=worker_kwargs,
+        start_method=self._worker_start_method,
+        request_timeout=self._config_endpoint.get('WORKER_REQUEST_TIMEOUT', None),
+      )
+    else:
+      worker = _cls_def(log=self.log, **worker_kwargs)
+
+    self._workers_pool.add_worker(worker)
+    return
+
+  def _preload_shared_model(self):
+    """
+    'process' mode with 'fork': the shared model is loaded once in the server process and
+    the forked workers inherit it (copy-on-write) instead of loading it in each child
+    """
+    _, _, _cls_def, _config_dict = self._get_worker_class()
+    if _cls_def is not None:
+      _cls_def.preload_shared_model(log=self.log, **self._get_worker_kwargs(-1, _config_dict))
     return
 
   def _update_nr_workers(self, nr_workers):
-    nr_crt_workers = len(self._lst_workers)
+    nr_crt_workers = len(self._workers_pool)
     nr_new_workers = nr_workers - nr_crt_workers
 
     if nr_new_workers > 0:
+      t_start = perf_counter()
+      rss_start = self.log.get_current_process_memory()
+      if self._is_process_mode and self._worker_start_method == 'fork' and self._config_endpoint.get('SHARED_MODEL', False):
+        self._preload_shared_model()
       for _ in range(nr_new_workers):
         self._create_worker()
+      self._report_workers_startup(t_start, rss_start)
       str_msg = "Created {} new workers. (were:{}, total:{})".format(nr_new_workers, nr_crt_workers, nr_workers)
       self._create_notification(notif='log', msg=str_msg)
     elif nr_new_workers < 0:
@@ -232,48 +349,111 @@ class FlaskModelServer(LummetryObject, _PluginsManagerMixin):
     #endif
     return
 
-  def _mask_worker_locked(self, wid):
-    self._mask_workers_in_use[wid] = 1
+  def _report_workers_startup(self, t_start, rss_start):
+    rss = self.log.get_current_process_memory()
+    str_msg = "Workers startup: {:.2f}s, server RSS {:.1f} -> {:.1f} MB".format(
+      perf_counter() - t_start, rss_start, rss
+    )
+    if self._is_process_mode:
+      # wait for the children to load their models so the report is complete
+      rss_children = sum(w.get_process_memory() for w in self._lst_workers if w.wait_ready())
+      str_msg += ", worker processes memory {:.1f} MB (ready after {:.2f}s)".format(
+        rss_children, perf_counter() - t_start
+      )
+    #endif
+    for key, info in FlaskWorker.get_shared_models_info().items():
+      str_msg += ", shared model '{}' loaded once in {:.2f}s (+{:.1f} MB) for {} workers".format(
+        key, info['LOAD_TIME'], info['RSS_DELTA_MB'], info['NR_WORKERS'] or len(self._lst_workers)
+      )
+    self.P(str_msg, color='g')
+    self._create_notification(notif='log', msg=str_msg)
     return
 
-  def _mask_worker_unlocked(self, wid):
-    self._mask_workers_in_use[wid] = 0
+  @property
+  def _worker_start_method(self):
+    return self._config_endpoint.get('WORKER_START_METHOD', 'spawn')
 
-  def _find_unlocked_worker(self, counter):
-    self._lock.acquire()
-    unlocked_workers = np.where(np.array(self._mask_workers_in_use) == 0)[0]
-    if unlocked_workers.shape[0] == 0:
-      self._lock.release()
-      return
+  @property
+  def _is_process_mode(self):
+    return str(self._config_endpoint.get('WORKER_MODE', 'thread')).lower() == 'process'
 
-    wid = int(np.random.choice(unlocked_workers))
-    self._mask_worker_locked(wid)
-    self._lock.release()
-    return wid
+  @property
+  def _lst_workers(self):
+    return self._workers_pool.workers
 
-  def _wait_predict(self, data, counter):
-    wid = self._find_unlocked_worker(counter)
-    if wid is None:
-      # All model servers in use. Waiting...
+  @property
+  def _wait_worker_timeout(self):
+    # seconds a request waits for a free worker; None waits forever
+    return self._config_endpoint.get('WAIT_WORKER_TIMEOUT', None)
 
-      while wid is None:
-        sleep(1)
-        wid = self._find_unlocked_worker(counter)
-      #endwhile
+  def _wait_predict(self, data, counter):
+    if self._batcher is not None:
+      with self.log.timer('batch', section=TIMERS_SECTION):
+        return self._batcher.submit(inputs=data, counter=counter)
 
-      # Waiting done.
-    #endif
+    self.log.start_timer('wait_worker', section=TIMERS_SECTION)
+    wid = self._workers_pool.acquire(timeout=self._wait_worker_timeout)
+    self.log.end_timer('wait_worker', section=TIMERS_SECTION)
+    if wid is None:
+      return None, {'ERROR': 'All workers busy, request timed out after {}s'.format(self._wait_worker_timeout)}, -1
 
     # now worker is locked...
     worker = self._lst_workers[wid]
-    answer = worker.execute(
-      inputs=data,
-      counter=counter
-    )
-    self._mask_worker_unlocked(wid)
+    try:
+      answer = worker.execute(
+        inputs=data,
+        counter=counter
+      )
+    finally:
+      self._workers_pool.release(wid)
     return worker, answer, wid
 
+  @staticmethod
+  def _get_signature(worker, wid):
+    if worker is None:
+      return None
+    return '{}:{}'.format(getattr(worker, 'worker_class_name', worker.__class__.__name__), wid)
+
+  @staticmethod
+  def _is_cacheable(answer):
+    if isinstance(answer, str):
+      return True
+    return isinstance(answer, dict) and not any('ERROR' in str(k).upper() for k in answer)
+
+  def _predict_cached(self, data, counter):
+    """ returns (answer, signature, dict with the extra response headers) """
+    headers = {}
+    # keys computed before the worker changes the inputs
+    cache_key = None
+    if self._response_cache is not None:
+      cache_key = self._response_cache.get_key(data)
+      cached = self._response_cache.get(cache_key)
+      if cached is not None:
+        answer, signature = cached
+        headers['X-Cache'] = 'HIT'
+        return answer, signature, headers
+      headers['X-Cache'] = 'MISS'
+    #endif
+
+    def _predict():
+      worker, answer, wid = self._wait_predict(data=data, counter=counter)
+      signature = self._get_signature(worker, wid)
+      if cache_key is not None and self._is_cacheable(answer):
+        self._response_cache.put(cache_key, answer, signature)
+      return answer, signature
+
+    if self._single_flight is None:
+      answer, signature = _predict()
+    else:
+      (answer, signature), coalesced = self._single_flight.do(self._single_flight.get_key(data), _predict)
+      headers['X-Coalesced'] = 'true' if coalesced else 'false'
+    return answer, signature, headers
+
   def _view_func_plugin_endpoint(self):
+    with self.log.timer('request', section=TIMERS_SECTION):
+      return self._process_plugin_request()
+
+  def _process_plugin_request(self):
     self._lock_counter.acquire()
     self._counter += 1
     counter = self._counter
@@ -299,9 +479,9 @@ class FlaskModelServer(LummetryObject, _PluginsManagerMixin):
       err_msg = str(self.log.get_error_info()) # maybe use
       self.P("Request processing generated exception: {}".format(err_msg), color='r')
 
-    worker, wid = None, -1
+    signature, headers = None, {}
     if method != 'OPTIONS' and not failed_request:
-      worker, answer, wid = self._wait_predict(data=params, counter=counter)
+      answer, signature, headers = self._predict_cached(data=params, counter=counter)
     else:
       answer = {'request_error' : err_msg}
 
@@ -315,8 +495,8 @@ class FlaskModelServer(LummetryObject, _PluginsManagerMixin):
     else:
       if isinstance(answer, dict):
         answer['call_id'] = counter
-        if worker is not None:
-          answer['signature'] = '{}:{}'.format(worker.__class__.__name__, wid)
+        if signature is not None:
+          answer['signature'] = signature
         jresponse = flask.jsonify(answer)
       else:
         assert isinstance(answer, str)
@@ -324,6 +504,8 @@ class FlaskModelServer(LummetryObject, _PluginsManagerMixin):
       #endif
     #endif
 
+    for k, v in headers.items():
+      jresponse.headers[k] = v
     jresponse.headers["Access-Control-Allow-Origin"] = "*"
     jresponse.headers["Access-Control-Allow-Methods"] = "POST, GET, OPTIONS, DELETE"
     jresponse.headers["Access-Control-Allow-Headers"] = "Content-Type"
@@ -380,3 +562,87 @@ class FlaskModelServer(LummetryObject, _PluginsManagerMixin):
 
   def _view_func_get_paths_endpoint(self):
     return flask.jsonify({'PATHS' : self._paths})
+
+  def _sync_process_workers_timers(self, max_laps=100):
+    """
+    In 'process' mode the worker timers live in the child processes: imports them as
+    `W<wid>:<section>` and merges them in `WORKERS:<section>`. Only the sections imported
+    here are replaced or deleted - the sections of the server process are never touched.
+    """
+    if not self._is_process_mode:
+      return
+    for wid, worker in enumerate(self._lst_workers):
+      dct_compact = worker.export_timers(max_laps=max_laps)
+      if dct_compact is None:
+        # busy workers keep their previously imported timers
+        continue
+      prefix = 'W{}:'.format(wid)
+      imported = set(self.log.import_timers_compact(dct_compact, section_prefix=prefix))
+      old_sections = self._workers_timers_sections.get(wid, {})
+      for worker_section in set(old_sections.values()) - imported:
+        # no longer reported by the worker (e.g. restarted child process)
+        self.log.delete_timers_section(worker_section)
+      self._workers_timers_sections[wid] = {
+        section: prefix + section for section in dct_compact if prefix + section in imported
+      }
+    #endfor
+    dct_sections = {}
+    for dct_worker_sections in self._workers_timers_sections.values():
+      for section, worker_section in dct_worker_sections.items():
+        dct_sections.setdefault(section, []).append(worker_section)
+    #endfor
+    for section, lst_sections in dct_sections.items():
+      self.log.merge_timers_sections(lst_sections, target_section=WORKERS_SECTION_PREFIX + section)
+    for section in self._workers_merged_sections - set(dct_sections):
+      self.log.delete_timers_section(WORKERS_SECTION_PREFIX + section)
+    self._workers_merged_sections = set(dct_sections)
+    return
+
+  def _get_metrics_sections(self):
+    """
+    All the timer sections except the `W<wid>:` ones of the 'process' mode workers that
+    are already summed up in `WORKERS:<section>` (so a `sum()` does not count them twice)
+    """
+    worker_sections = set(
+      worker_section
+      for dct_worker_sections in self._workers_timers_sections.values()
+      for worker_section in dct_worker_sections.values()
+    )
+    return [x for x in list(self.log.timers.keys()) if x not in worker_sections]
+
+  def _view_func_metrics_endpoint(self):
+    self._sync_process_workers_timers()
+    str_metrics = self.log.export_metrics(selected_sections=self._get_metrics_sections())
+    extra_lines = []
+    labels = 'endpoint="{}"'.format(self.log._metrics_label_value(self._execution_path))
+    for obj in [self._response_cache, self._single_flight]:
+      if obj is not None:
+        extra_lines += obj.export_metrics(prefix=METRICS_PREFIX, labels=labels)
+    if len(extra_lines) > 0:
+      # before the final '# EOF'
+      lines = str_metrics.rstrip('\n').split('\n')
+      str_metrics = '\n'.join(lines[:-1] + extra_lines + lines[-1:]) + '\n'
+    return flask.Response(str_metrics, mimetype=METRICS_CONTENT_TYPE)
+
+  def _view_func_timers_endpoint(self):
+    params = get_api_request_body(request=flask.request, log=self.log)
+    max_laps = int(params.get('MAX_LAPS', 100))
+    self._sync_process_workers_timers(max_laps=max_laps)
+    return flask.jsonify(self.log.export_timers_compact(max_laps=max_laps))
+
+  def _view_func_profiler_endpoint(self):
+    if flask.request.remote_addr not in LOCAL_ADDRESSES:
+      return flask.jsonify({'ERROR': 'The profiler is available only from the local machine'}), 403
+    params = get_api_request_body(request=flask.request, log=self.log)
+    action = str(params.get('ACTION', '')).lower()
+    if action == 'start':
+      self.log.start_sampling_profiler(
+        interval_ms=float(params.get('INTERVAL_MS', 10)),
+        duration=params.get('DURATION', None),
+      )
+      return flask.jsonify({'MESSAGE': 'OK'})
+    elif action == 'stop':
+      paths = self.log.stop_sampling_profiler(top_n=int(params.get('TOP_N', 30)))
+      top_self, _ = self.log.get_sampling_profile_top(top_n=int(params.get('TOP_N', 30)))
+      return flask.jsonify({'MESSAGE': 'OK', 'FILES': paths, 'TOP': top_self})
+    return flask.jsonify({'ERROR': "Bad input. 'ACTION' must be 'start' or 'stop'"})
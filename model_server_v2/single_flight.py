@@ -0,0 +1,117 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.  
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+*
+*
+*  RO:
+*    Modul software TempRent, proiect finanțat în cadrul POC, Axa prioritara 2 - Tehnologia Informației și Comunicațiilor (TIC) 
+*    pentru o economie digitală competitivă, Prioritatea de investiții 2b - Dezvoltarea produselor și s
+*    erviciilor TIC, a comerțului electronic și a cererii de TIC, cod SMIS 142474, 
+*    Contractul de finanțare nr. 2/221_ap3/24.06.2021.
+*
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project: 
+@description:
+"""
+
+from copy import deepcopy
+from threading import Lock, Event
+
+from libraries.model_server_v2.response_cache import get_request_key, DEFAULT_EXCLUDED_FIELDS
+
+
+class SingleFlight(object):
+  """
+  In-flight requests coalescing: while a request is being computed, the identical requests
+  (same `get_request_key`) that arrive do not take a worker - they wait for the first one
+  and get a copy of its result.
+  """
+
+  def __init__(self, key_fields=None, excluded_fields=None):
+    self._key_fields = key_fields
+    self._excluded_fields = set(excluded_fields if excluded_fields is not None else DEFAULT_EXCLUDED_FIELDS)
+
+    self._inflight = {} # key -> {'DONE', 'RESULT', 'EXCEPTION'}
+    self._lock = Lock()
+
+    self.nr_calls = 0
+    self.nr_coalesced = 0
+    return
+
+  @property
+  def nr_inflight(self):
+    return len(self._inflight)
+
+  def get_key(self, params):
+    return get_request_key(params, key_fields=self._key_fields, excluded_fields=self._excluded_fields)
+
+  def do(self, key, func):
+    """
+    Runs `func()` unless an identical call (`key`) is already running, in which case it
+    waits for that call. Returns (result, coalesced); the exceptions of `func` are raised
+    in all the coalesced callers.
+    """
+    with self._lock:
+      call = self._inflight.get(key)
+      is_leader = call is None
+      if is_leader:
+        call = {'DONE': Event(), 'RESULT': None, 'EXCEPTION': None}
+        self._inflight[key] = call
+        self.nr_calls += 1
+      else:
+        self.nr_coalesced += 1
+    #endwith
+
+    if is_leader:
+      try:
+        result = func()
+        # private copy - the caller is free to change its own result
+        call['RESULT'] = deepcopy(result)
+        return result, False
+      except Exception as exc:
+        call['EXCEPTION'] = exc
+        raise
+      finally:
+        with self._lock:
+          del self._inflight[key]
+        call['DONE'].set()
+    #endif
+
+    call['DONE'].wait()
+    if call['EXCEPTION'] is not None:
+      raise call['EXCEPTION']
+    return deepcopy(call['RESULT']), True
+
+  def get_stats(self):
+    return {
+      'CALLS': self.nr_calls,
+      'COALESCED': self.nr_coalesced,
+      'INFLIGHT': self.nr_inflight,
+    }
+
+  def export_metrics(self, prefix, labels=''):
+    """ OpenMetrics lines (without `# EOF`) with the coalescing counters """
+    lines = []
+    for name, description, value in [
+      ('single_flight_calls', 'Requests computed by a worker with coalescing enabled.', self.nr_calls),
+      ('single_flight_coalesced', 'Requests that shared the result of an identical in-flight request.', self.nr_coalesced),
+    ]:
+      full_name = '{}_{}'.format(prefix, name)
+      lines.append('# TYPE {} counter'.format(full_name))
+      lines.append('# HELP {} {}'.format(full_name, description))
+      lines.append('{}_total{{{}}} {}'.format(full_name, labels, value))
+    #endfor
+    return lines
@@ -31,6 +31,9 @@ import abc
 import base64
 import json
 
+from threading import Lock
+from time import perf_counter
+
 from libraries import Logger
 from libraries import LummetryObject
 from libraries import _ConfigHandlerMixin
@@ -41,6 +44,10 @@ class FlaskWorker(LummetryObject, _ConfigHandlerMixin):
   Base class for any worker / endpoint business logic
   """
 
+  # models loaded with `_load_shared_model`, one per (class, config) in each process
+  _shared_models = {}
+  _shared_models_lock = Lock()
+
   def __init__(self, log : Logger,
                default_config,
                verbosity_level,
@@ -77,22 +84,100 @@ class FlaskWorker(LummetryObject, _ConfigHandlerMixin):
 
     self._verbosity_level = verbosity_level
 
+    self.shared_model = None
+    self._shared_model_only = kwargs.pop('shared_model_only', False)
+
     self._counter = None
+    self._batch_counters = None # call ids of the batch being predicted by `_predict_batch`
     self.__encountered_error = None
-    super(FlaskWorker, self).__init__(log=log, maxlen_notifications=1000, prefix_log='[FSKWKR]', **kwargs)
+    kwargs['prefix_log'] = kwargs.get('prefix_log', '[FSKWKR]')
+    super(FlaskWorker, self).__init__(log=log, maxlen_notifications=1000, **kwargs)
     return
 
   def startup(self):
     super().startup()
     self.config_worker = self._merge_prepare_config()
-    self._load_model()
+    if self.cfg_shared_model:
+      if self.implements_shared_model():
+        self.shared_model = self.__get_shared_model()
+      else:
+        self.P("{} does not implement `_load_shared_model`: SHARED_MODEL ignored, the model is loaded by `_load_model`".format(
+          self.__class__.__name__), color='r'
+        )
+    #endif
+    if not self._shared_model_only:
+      self._load_model()
     return
 
+  @property
+  def cfg_shared_model(self):
+    return self.config_worker.get('SHARED_MODEL', False)
+
+  @classmethod
+  def implements_shared_model(cls):
+    """ True if the worker class overrides `_load_shared_model` """
+    return cls._load_shared_model is not FlaskWorker._load_shared_model
+
+  @classmethod
+  def preload_shared_model(cls, log, **worker_kwargs):
+    """
+    Loads the shared model of this worker class in the current process without creating
+    a full worker (no `_load_model`), e.g. in the server process before forking the
+    worker processes, which then inherit it. Returns None if the class has no shared model.
+    """
+    if not cls.implements_shared_model():
+      return
+    worker = cls(log=log, shared_model_only=True, **worker_kwargs)
+    return worker.shared_model
+
+  @classmethod
+  def get_shared_models_info(cls):
+    """ returns {'<class>:<config hash>': {'LOAD_TIME': seconds, 'RSS_DELTA_MB': MB, 'NR_WORKERS': n}} """
+    with cls._shared_models_lock:
+      return {k: dict(v['INFO']) for k, v in cls._shared_models.items()}
+
+  def __get_shared_model(self):
+    key = '{}:{}'.format(self.__class__.__name__, self.log.hash_object(self.config_worker)[:8])
+    with FlaskWorker._shared_models_lock:
+      dct_shared = FlaskWorker._shared_models.get(key)
+      if dct_shared is None:
+        # loaded under lock: the other workers wait for the first one and reuse the model
+        rss_start = self.log.get_current_process_memory()
+        t_start = perf_counter()
+        model = self._load_shared_model()
+        dct_shared = {
+          'MODEL': model,
+          'INFO': {
+            'LOAD_TIME': perf_counter() - t_start,
+            'RSS_DELTA_MB': self.log.get_current_process_memory() - rss_start,
+            'NR_WORKERS': 0,
+          }
+        }
+        FlaskWorker._shared_models[key] = dct_shared
+        self.P("Loaded shared model '{}' in {:.2f}s, RSS +{:.1f} MB".format(
+          key, dct_shared['INFO']['LOAD_TIME'], dct_shared['INFO']['RSS_DELTA_MB']), color='g'
+        )
+      #endif
+      if not self._shared_model_only:
+        dct_shared['INFO']['NR_WORKERS'] += 1
+    #endwith
+    return dct_shared['MODEL']
+
+  def _load_shared_model(self):
+    """
+    Implement this method in sub-class in order to use `SHARED_MODEL: true` - loads and returns the
+    model that is shared (read-only!) by all the workers of the process; the workers access it as
+    `self.shared_model`. It is called once per process (per worker class and configuration).
+    Any per-worker mutable state (buffers, counters, sessions) must still be created in `_load_model`.
+    """
+    raise NotImplementedError("{} does not implement `_load_shared_model`".format(self.__class__.__name__))
+
   @abc.abstractmethod
   def _load_model(self):
     """
     Implement this method in sub-class - custom logic for loading the model. If the worker has no model, then implement
-    it as a simple `return`.
+    it as a simple `return`. With `SHARED_MODEL: true` the model is already in `self.shared_model`
+    (see `_load_shared_model`) and this method should only prepare the per-worker state.
     """
     raise NotImplementedError
 
@@ -128,6 +213,24 @@ class FlaskWorker(LummetryObject, _ConfigHandlerMixin):
     """
     raise NotImplementedError
 
+  def _predict_batch(self, lst_prep_inputs):
+    """
+    Override this method in sub-class in order to predict a whole batch in a single call
+    (used when the server runs with `MAX_BATCH_SIZE` > 1). The default implementation
+    calls `_predict` for each item.
+
+    Parameters:
+    -----------
+    lst_prep_inputs: list
+      The objects returned by `_pre_process` for each request of the batch
+
+    Returns:
+    --------
+    lst_preds: list
+      One prediction for each item of `lst_prep_inputs` (same order)
+    """
+    return [self._predict(x) for x in lst_prep_inputs]
+
   @abc.abstractmethod
   def _post_process(self, pred):
     """
@@ -188,6 +291,35 @@ class FlaskWorker(LummetryObject, _ConfigHandlerMixin):
 
     return pred
 
+  def __predict_batch(self, lst_prep_inputs, lst_errors):
+    idxs = [i for i, x in enumerate(lst_prep_inputs) if x is not None]
+    lst_preds = [None] * len(lst_prep_inputs)
+    if len(idxs) == 0:
+      return lst_preds
+
+    try:
+      preds = self._predict_batch([lst_prep_inputs[i] for i in idxs])
+      if len(preds) != len(idxs):
+        raise ValueError("_predict_batch returned {} predictions for {} inputs".format(len(preds), len(idxs)))
+      for i, pred in zip(idxs, preds):
+        lst_preds[i] = pred
+    except:
+      err_dict = self.__err_dict(*self.log.get_error_info(return_err_val=True))
+      msg = 'Exception in _predict_batch, falling back to _predict for each request:\n{}'.format(err_dict)
+      self._create_notification(
+        notif='exception',
+        msg=msg
+      )
+      # isolate the faulty request(s) - only those will get an error answer
+      for i in idxs:
+        self._counter = self._batch_counters[i] if self._batch_counters is not None else None
+        self.__encountered_error = None
+        lst_preds[i] = self.__predict(lst_prep_inputs[i])
+        lst_errors[i] = self.__encountered_error
+      #endfor
+    #endtry
+    return lst_preds
+
   def __post_process(self, pred):
     if pred is None:
       return
@@ -226,6 +358,87 @@ class FlaskWorker(LummetryObject, _ConfigHandlerMixin):
     self._counter = counter
     self.__encountered_error = None
 
+    base64_outputs, encoding = self.__decode_inputs(inputs)
+
+    section = self.__class__.__name__
+    with self.log.timer('pre_process', section=section):
+      prep_inputs = self.__pre_process(inputs)
+
+    with self.log.timer('predict', section=section):
+      pred = self.__predict(prep_inputs)
+
+    with self.log.timer('post_process', section=section):
+      answer = self.__post_process(pred)
+
+    return self.__encode_answer(answer, base64_outputs, encoding, self.__encountered_error)
+
+  def execute_batch(self, lst_inputs, lst_counters):
+    """
+    Batched version of `execute`: each request is pre-processed alone, all the valid
+    requests are predicted with a single `_predict_batch` call and then each prediction
+    is post-processed alone. A request that fails gets its own error answer and does not
+    affect the other requests of the batch.
+
+    Parameters:
+    ----------
+    lst_inputs: list[dict], mandatory
+      The requests jsons
+
+    lst_counters: list[int], mandatory
+      The call ids
+
+    Returns:
+    --------
+    lst_answers: list[dict]
+      The answers that go to the end-users (same order as `lst_inputs`)
+    """
+    nr_inputs = len(lst_inputs)
+    lst_errors = [None] * nr_inputs
+    lst_decode = [None] * nr_inputs
+    lst_prep_inputs = [None] * nr_inputs
+
+    section = self.__class__.__name__
+    with self.log.timer('pre_process', section=section):
+      for i, inputs in enumerate(lst_inputs):
+        self._counter = lst_counters[i]
+        self.__encountered_error = None
+        try:
+          lst_decode[i] = self.__decode_inputs(inputs)
+        except:
+          lst_decode[i] = ([], None)
+          lst_errors[i] = 'Invalid inputs: {}'.format(self.log.get_error_info(return_err_val=True)[-1])
+          continue
+        lst_prep_inputs[i] = self.__pre_process(inputs)
+        lst_errors[i] = self.__encountered_error
+      #endfor
+
+    self._counter = None
+    self._batch_counters = lst_counters
+    try:
+      with self.log.timer('predict_batch', section=section):
+        lst_preds = self.__predict_batch(lst_prep_inputs, lst_errors)
+    finally:
+      self._batch_counters = None
+
+    lst_answers = [None] * nr_inputs
+    with self.log.timer('post_process', section=section):
+      for i, pred in enumerate(lst_preds):
+        self._counter = lst_counters[i]
+        self.__encountered_error = None
+        answer = self.__post_process(pred)
+        base64_outputs, encoding = lst_decode[i]
+        try:
+          lst_answers[i] = self.__encode_answer(
+            answer, base64_outputs, encoding, lst_errors[i] or self.__encountered_error
+          )
+        except:
+          lst_answers[i] = self.__encode_answer(
+            None, [], encoding, 'Invalid outputs: {}'.format(self.log.get_error_info(return_err_val=True)[-1])
+          )
+      #endfor
+    return lst_answers
+
+  def __decode_inputs(self, inputs):
     base64_keys = inputs.pop('BASE64_KEYS', [])
     base64_outputs = inputs.pop('BASE64_OUTPUTS', [])
     encoding = inputs.pop('ENCODING', 'ansi')
@@ -235,12 +448,15 @@ class FlaskWorker(LummetryObject, _ConfigHandlerMixin):
       else:
         self.P("Key {} sent in 'BASE64_KEYS' does not exist in input", color='e')
     #endfor
+    return base64_outputs, encoding
 
-    prep_inputs = self.__pre_process(inputs)
-
-    pred = self.__predict(prep_inputs)
-
-    answer = self.__post_process(pred)
+  def __encode_answer(self, answer, base64_outputs, encoding, encountered_error):
+    if encountered_error:
+      answer = {'{}_ERROR'.format(self.__class__.__name__) : encountered_error}
+      self.P("Worker {}:{} execute error: {}".format(
+        self.__class__.__name__, self._worker_id, encountered_error), color='r'
+      )
+      return answer
 
     for k in base64_outputs:
       if k in answer:
@@ -251,16 +467,9 @@ class FlaskWorker(LummetryObject, _ConfigHandlerMixin):
       else:
         self.P("Key {} sent in 'BASE64_OUTPUTS' does not exist in answer", color='e')
     #endfor
-
-    if self.__encountered_error:
-      answer = {'{}_ERROR'.format(self.__class__.__name__) : self.__encountered_error}
-      self.P("Worker {}:{} execute error: {}".format(
-        self.__class__.__name__, self._worker_id, self.__encountered_error), color='r'
-      )
-
     return answer
 
   def _create_notification(self, notif, msg, info=None, stream_name=None, **kwargs):
-    msg = (self._counter or "INIT", msg)
+    msg = (self._counter or self._batch_counters or "INIT", msg)
     super()._create_notification(notif=notif, msg=msg, info=info, stream_name=stream_name, **kwargs)
     return
@@ -0,0 +1,100 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.  
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+*
+*
+*  RO:
+*    Modul software TempRent, proiect finanțat în cadrul POC, Axa prioritara 2 - Tehnologia Informației și Comunicațiilor (TIC) 
+*    pentru o economie digitală competitivă, Prioritatea de investiții 2b - Dezvoltarea produselor și s
+*    erviciilor TIC, a comerțului electronic și a cererii de TIC, cod SMIS 142474, 
+*    Contractul de finanțare nr. 2/221_ap3/24.06.2021.
+*
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project: 
+@description:
+"""
+
+from collections import deque
+from threading import Lock, Event
+
+
+class WorkersPool(object):
+  """
+  Pool of worker ids with an O(1) free list and FIFO handoff: a released worker is
+  given directly to the oldest waiting request (no polling), otherwise it goes back
+  to the free list.
+  """
+
+  def __init__(self):
+    self._workers = []
+    self._free = deque()
+    self._waiters = deque() # [event, wid] of the blocked `acquire` calls in arrival order
+    self._lock = Lock()
+    return
+
+  def __len__(self):
+    return len(self._workers)
+
+  @property
+  def workers(self):
+    return self._workers
+
+  @property
+  def nr_free(self):
+    return len(self._free)
+
+  @property
+  def nr_waiting(self):
+    return len(self._waiters)
+
+  def add_worker(self, worker):
+    """ adds a new worker (available immediately) and returns its id """
+    with self._lock:
+      wid = len(self._workers)
+      self._workers.append(worker)
+    self.release(wid)
+    return wid
+
+  def acquire(self, timeout=None):
+    """
+    Returns the id of a free worker, blocking (FIFO with the other waiting callers)
+    until one is released or `timeout` seconds passed. Returns None on timeout.
+    """
+    with self._lock:
+      if len(self._free) > 0 and len(self._waiters) == 0:
+        return self._free.popleft()
+      waiter = [Event(), None]
+      self._waiters.append(waiter)
+    #endwith
+
+    waiter[0].wait(timeout)
+    with self._lock:
+      if waiter[1] is None:
+        # timeout - nobody handed us a worker
+        self._waiters.remove(waiter)
+      return waiter[1]
+    #endwith
+
+  def release(self, wid):
+    with self._lock:
+      if len(self._waiters) > 0:
+        waiter = self._waiters.popleft()
+        waiter[1] = wid
+        waiter[0].set()
+      else:
+        self._free.append(wid)
+    #endwith
+    return
@@ -32,6 +32,7 @@ from libraries.logger_mixins import (
   _DownloadMixin,
   _UploadMixin,
   _ProcessMixin,
+  _SamplingProfilerMixin,
   _MachineMixin,
   _GPUMixin,
   _PackageLoaderMixin,
@@ -56,6 +57,7 @@ class Logger(
   _PackageLoaderMixin,
   _ProcessMixin,
   _PublicTFKerasMixin,
+  _SamplingProfilerMixin,
   _GeneralSerializationMixin,
   _JSONSerializationMixin,
   _PickleSerializationMixin,
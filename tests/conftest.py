@@ -0,0 +1,63 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: pytest fixtures - run with `python -m pytest -q` from the repository folder
+"""
+
+import os
+import sys
+import importlib.util
+
+import pytest
+
+# `Logger` reports the conda environment and expects it to be set
+os.environ.setdefault('CONDA_PREFIX', os.path.join(os.path.sep, 'opt', 'conda'))
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_libraries():
+  """
+  The repository is the `libraries` package: imported from the parent folder when
+  cloned as `libraries`, otherwise loaded under that name from the repository folder
+  """
+  sys.path.insert(0, os.path.dirname(ROOT_FOLDER))
+  try:
+    import libraries
+    if os.path.dirname(os.path.abspath(libraries.__file__)) == ROOT_FOLDER:
+      return
+  except ImportError:
+    pass
+  for name in [x for x in sys.modules if x == 'libraries' or x.startswith('libraries.')]:
+    del sys.modules[name]
+  spec = importlib.util.spec_from_file_location(
+    'libraries', os.path.join(ROOT_FOLDER, '__init__.py'),
+    submodule_search_locations=[ROOT_FOLDER],
+  )
+  module = importlib.util.module_from_spec(spec)
+  sys.modules['libraries'] = module
+  spec.loader.exec_module(module)
+  return
+
+_import_libraries()
+
+
+@pytest.fixture
+def log(tmp_path):
+  from libraries import Logger
+  return Logger('TST', base_folder=str(tmp_path), app_folder='_cache', TF_KERAS=False)
@@ -0,0 +1,87 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: framed compressed bytes streams
+"""
+
+import os
+
+import pytest
+
+from libraries.logger_mixins.serialization_general_mixin import STREAM_MAGIC
+
+
+def _slices(data, sizes):
+  pos, i = 0, 0
+  while pos < len(data):
+    size = sizes[i % len(sizes)]
+    yield data[pos:pos + size]
+    pos += size
+    i += 1
+  return
+
+
+class TestBytesStream:
+
+  @pytest.mark.parametrize('algorithm', ['zlib', 'bz2', 'lzma'])
+  def test_round_trip_arbitrary_slices(self, log, algorithm):
+    data = os.urandom(50_000) + b'abc' * 100_000
+    chunks = list(_slices(data, [1, 7000, 65536, 13]))
+    stream = b''.join(log.compress_stream(chunks, algorithm=algorithm, chunk_size=16_384))
+    assert stream.startswith(STREAM_MAGIC)
+    pieces = list(log.decompress_stream(_slices(stream, [3, 1000, 4096]), max_output_size=8192))
+    assert all(len(x) <= 8192 for x in pieces)
+    assert b''.join(pieces) == data
+
+  def test_compress_equals_iter_compress(self, log):
+    data = b'0123456789' * 10_000
+    compressor_a = log.get_bytes_compressor(chunk_size=4096)
+    compressor_b = log.get_bytes_compressor(chunk_size=4096)
+    stream_a = compressor_a.compress(data) + compressor_a.flush()
+    stream_b = b''.join(compressor_b.iter_compress(data)) + compressor_b.flush()
+    assert stream_a == stream_b
+    assert compressor_a.bytes_in == len(data)
+    assert compressor_a.bytes_out == len(stream_a)
+
+  def test_empty_stream(self, log):
+    stream = b''.join(log.compress_stream([]))
+    assert b''.join(log.decompress_stream([stream])) == b''
+
+  def test_unknown_algorithm(self, log):
+    with pytest.raises(ValueError):
+      log.get_bytes_compressor(algorithm='snappy')
+
+  def test_unknown_algorithm_id(self, log):
+    stream = bytearray(b''.join(log.compress_stream([b'data'])))
+    stream[len(STREAM_MAGIC)] = 250
+    with pytest.raises(ValueError, match='algorithm id'):
+      list(log.decompress_stream([bytes(stream)]))
+
+  def test_invalid_header(self, log):
+    with pytest.raises(ValueError, match='header'):
+      list(log.decompress_stream([b'NOT A STREAM']))
+
+  def test_truncated_stream(self, log):
+    stream = b''.join(log.compress_stream([os.urandom(10_000)]))
+    with pytest.raises(ValueError, match='end frame'):
+      list(log.decompress_stream([stream[:-4]]))
+
+  def test_data_after_end(self, log):
+    stream = b''.join(log.compress_stream([b'data']))
+    with pytest.raises(ValueError, match='after the end'):
+      list(log.decompress_stream([stream, b'more']))
@@ -0,0 +1,74 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: gateway aggregation of the model servers timers
+"""
+
+from libraries import Logger
+
+
+def _export_laps(log, laps, section='FakeWorker', sname='predict'):
+  """ timers of a 'remote' process in `export_timers_compact` format """
+  for _ in range(laps):
+    log.start_timer(sname, section=section)
+    log.end_timer(sname, section=section)
+  return log.export_timers_compact(selected_sections=[section])
+
+
+class TestGatewayTimers:
+
+  def _get_gateway(self, log):
+    from libraries.model_server_v2.gateway.gateway import FlaskGateway
+    gateway = FlaskGateway.__new__(FlaskGateway)
+    gateway.log = log
+    gateway._servers = {}
+    gateway._servers_timers_sections = {}
+    gateway._fleet_sections = set()
+    return gateway
+
+  def test_fleet_sections_follow_the_live_servers(self, log, tmp_path, monkeypatch):
+    from libraries.model_server_v2.gateway import gateway as gateway_module
+    remote = Logger('REMOTE', base_folder=str(tmp_path), app_folder='_remote', TF_KERAS=False)
+    dct_timers = {'A': _export_laps(remote, 4, section='S'), 'B': _export_laps(remote, 4, section='S')}
+
+    class _Answer(object):
+      def __init__(self, url):
+        self.port = int(url.split(':')[2].split('/')[0])
+        return
+
+      def json(self):
+        return dct_timers['A' if self.port == 1 else 'B']
+
+    monkeypatch.setattr(gateway_module.requests, 'get', lambda url, timeout: _Answer(url))
+    gateway = self._get_gateway(log)
+    for port, name in enumerate(['A', 'B'], start=1):
+      gateway._servers[name] = {'HOST': '127.0.0.1', 'PORT': port, 'PROCESS': None}
+    gateway.poll_servers_timers()
+    assert log.get_timer_count('predict', section='A:S') == 4
+    assert log.get_timer_count('predict', section='FLEET:S') == 12 # B exported after 8 laps
+
+    gateway._servers.pop('B')
+    gateway._drop_server_timers('B')
+    gateway._merge_fleet_timers()
+    assert 'B:S' not in log.timers
+    assert log.get_timer_count('predict', section='FLEET:S') == 4
+
+    dct_timers['A'] = {}
+    gateway.poll_servers_timers()
+    assert 'A:S' not in log.timers
+    assert 'FLEET:S' not in log.timers
@@ -0,0 +1,73 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: logs cleanup and per-period archives
+"""
+
+import os
+import zipfile
+
+import pytest
+
+
+def _make_logs(log, dates):
+  paths = []
+  for str_date in dates:
+    path = os.path.join(log._logs_dir, '{}_120000_TST_001_log.txt'.format(str_date))
+    with open(path, 'w') as fh:
+      fh.write('log of {}\n'.format(str_date) * 100)
+    paths.append(path)
+  return paths
+
+
+def _zip_members(path_zip):
+  with zipfile.ZipFile(path_zip) as zip:
+    return zip.namelist()
+
+
+class TestLogsCleanup:
+
+  @pytest.mark.parametrize('archive_period', ['day', 'month'])
+  def test_cleanup_logs(self, log, archive_period):
+    paths = _make_logs(log, ['20200101', '20200102', '20200201'])
+    log.cleanup_logs(archive_period=archive_period)
+    assert not any(os.path.isfile(x) for x in paths)
+    archives = sorted(x for x in os.listdir(log._logs_dir) if x.endswith('.zip'))
+    assert len(archives) == (3 if archive_period == 'day' else 2)
+    members = sum([_zip_members(os.path.join(log._logs_dir, x)) for x in archives], [])
+    assert sorted(members) == sorted(os.path.basename(x) for x in paths)
+
+  def test_failed_period_is_archived_once(self, log, monkeypatch):
+    paths = _make_logs(log, ['20200101', '20200102'])
+    path_zip = os.path.join(log._logs_dir, '_logs_archive_202001.zip')
+    write = zipfile.ZipFile.write
+
+    def failing_write(zip, filename, *args, **kwargs):
+      if filename == paths[1]:
+        raise OSError('disk full')
+      return write(zip, filename, *args, **kwargs)
+
+    monkeypatch.setattr(zipfile.ZipFile, 'write', failing_write)
+    log.cleanup_logs()
+    # nothing archived and nothing deleted
+    assert all(os.path.isfile(x) for x in paths)
+    assert not any(x.endswith(('.zip', '.tmp')) for x in os.listdir(log._logs_dir))
+    monkeypatch.undo()
+    log.cleanup_logs()
+    assert not any(os.path.isfile(x) for x in paths)
+    assert _zip_members(path_zip) == [os.path.basename(x) for x in paths]
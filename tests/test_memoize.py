@@ -0,0 +1,96 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: disk-backed memoize decorator
+"""
+
+import os
+import threading
+
+import pytest
+
+
+class TestMemoize:
+
+  def test_hits_and_misses(self, log):
+    calls = []
+
+    @log.memoize()
+    def square(x):
+      calls.append(x)
+      return x * x
+
+    assert [square(x) for x in [1, 2, 1, 2, 3]] == [1, 4, 1, 4, 9]
+    assert calls == [1, 2, 3]
+    stats = list(log.get_memoize_stats().values())[0]
+    assert (stats['HITS'], stats['MISSES']) == (2, 3)
+    assert stats['HIT_RATIO'] == pytest.approx(0.4)
+
+  def test_kwargs_and_version_are_part_of_the_key(self, log):
+    @log.memoize(version=1)
+    def add(a, b=0):
+      return a + b
+
+    @log.memoize(version=2)
+    def add_v2(a, b=0):
+      return a + b
+
+    assert add(1, b=2) == 3
+    assert add(1, b=3) == 4
+    assert add(1, b=2) == 3
+    assert add_v2(1, b=2) == 3
+    stats = log.get_memoize_stats()
+    assert [(x['HITS'], x['MISSES']) for x in stats.values()] == [(1, 2), (0, 1)]
+
+  def test_unpicklable_result_is_not_cached(self, log):
+    calls = []
+
+    @log.memoize()
+    def make_lock(x):
+      calls.append(x)
+      return threading.Lock()
+
+    make_lock(1)
+    make_lock(1)
+    assert calls == [1, 1]
+    assert os.listdir(make_lock.cache_folder) == [] # no result, no orphaned tmp file
+    stats = list(log.get_memoize_stats().values())[0]
+    assert (stats['HITS'], stats['MISSES']) == (0, 2)
+
+  def test_corrupted_result_is_a_miss(self, log):
+    @log.memoize()
+    def double(x):
+      return 2 * x
+
+    double(5)
+    for fn in os.listdir(double.cache_folder):
+      with open(os.path.join(double.cache_folder, fn), 'wb') as fh:
+        fh.write(b'not a pickle')
+    assert double(5) == 10
+    stats = list(log.get_memoize_stats().values())[0]
+    assert (stats['HITS'], stats['MISSES']) == (0, 2)
+
+  def test_cache_clear(self, log):
+    @log.memoize(compressed=True)
+    def inc(x):
+      return x + 1
+
+    inc(1)
+    assert len(os.listdir(inc.cache_folder)) == 1
+    inc.cache_clear()
+    assert os.listdir(inc.cache_folder) == []
@@ -0,0 +1,135 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: micro-batching of concurrent requests
+"""
+
+import threading
+
+from libraries.model_server_v2.micro_batcher import MicroBatcher
+from libraries.model_server_v2.workers_pool import WorkersPool
+from libraries.model_server_v2.example_endpoints.fake import FakeWorker
+
+
+class _BatchWorker(object):
+  """ `FlaskWorker.execute_batch` that records the batches """
+  def __init__(self, fail=False):
+    self.fail = fail
+    self.batches = []
+    return
+
+  def execute_batch(self, lst_inputs, lst_counters):
+    self.batches.append(list(lst_counters))
+    if self.fail:
+      raise RuntimeError('model crashed')
+    return [{'OUTPUT': x['INPUT'] * 2} for x in lst_inputs]
+
+
+def _submit_all(batcher, nr_requests):
+  results = [None] * nr_requests
+  barrier = threading.Barrier(nr_requests)
+
+  def run(i):
+    barrier.wait()
+    results[i] = batcher.submit({'INPUT': i}, counter=i)
+    return
+
+  threads = [threading.Thread(target=run, args=(i,)) for i in range(nr_requests)]
+  for thr in threads:
+    thr.start()
+  for thr in threads:
+    thr.join()
+  return results
+
+
+def _get_batcher(worker, max_batch_size=4, max_wait_ms=200, wait_worker_timeout=5):
+  pool = WorkersPool()
+  if worker is not None:
+    pool.add_worker(worker)
+  batcher = MicroBatcher(pool, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+                         wait_worker_timeout=wait_worker_timeout)
+  return batcher, pool
+
+
+class TestMicroBatcher:
+
+  def test_requests_are_batched(self):
+    worker = _BatchWorker()
+    batcher, pool = _get_batcher(worker)
+    results = _submit_all(batcher, 8)
+    assert [answer for _, answer, _ in results] == [{'OUTPUT': 2 * i} for i in range(8)]
+    assert all(w is worker and wid == 0 for w, _, wid in results)
+    assert sorted(x for batch in worker.batches for x in batch) == list(range(8))
+    assert all(len(batch) <= 4 for batch in worker.batches)
+    assert batcher.nr_batched_requests == 8
+    assert batcher.avg_batch_size > 1
+    assert pool.nr_free == 1
+
+  def test_single_request_waits_at_most_max_wait(self):
+    batcher, _ = _get_batcher(_BatchWorker(), max_wait_ms=20)
+    assert batcher.submit({'INPUT': 3}, counter=1)[1] == {'OUTPUT': 6}
+    assert batcher.nr_batches == 1
+
+  def test_failed_batch_answers_all_requests(self):
+    worker = _BatchWorker(fail=True)
+    batcher, pool = _get_batcher(worker)
+    results = _submit_all(batcher, 4)
+    for w, answer, wid in results:
+      assert (w, wid) == (None, -1)
+      assert answer == {'ERROR': 'Batch execution failed: model crashed'}
+    # the worker is given back to the pool
+    assert pool.nr_free == 1
+    assert batcher.submit({'INPUT': 1}, counter=5)[1]['ERROR'].startswith('Batch execution failed')
+
+  def test_no_free_worker(self):
+    batcher, _ = _get_batcher(None, max_wait_ms=1, wait_worker_timeout=0.05)
+    worker, answer, wid = batcher.submit({'INPUT': 1}, counter=1)
+    assert (worker, wid) == (None, -1)
+    assert 'All workers busy' in answer['ERROR']
+
+
+class _CapturingFakeWorker(FakeWorker):
+  """ records the call ids seen by `_predict_batch` """
+  def _predict_batch(self, lst_prep_inputs):
+    self.seen = (self._counter, self._batch_counters)
+    if any(x == 13 for x in lst_prep_inputs):
+      raise ValueError('bad batch')
+    return super()._predict_batch(lst_prep_inputs)
+
+
+class TestWorkerExecuteBatch:
+
+  def _get_worker(self, log):
+    return _CapturingFakeWorker(log=log, default_config={'ADD': 7}, verbosity_level=1, worker_id=0)
+
+  def test_batch_call_ids(self, log):
+    worker = self._get_worker(log)
+    answers = worker.execute_batch([{'INPUT_VALUE': 1}, {'INPUT_VALUE': 2}], [10, 11])
+    assert answers == [{'output_value': '1+7=8 PREDICTED'}, {'output_value': '2+7=9 PREDICTED'}]
+    # the batch is not attributed to any single request
+    assert worker.seen == (None, [10, 11])
+    assert worker._batch_counters is None
+
+  def test_failed_batch_falls_back_to_each_request(self, log):
+    worker = self._get_worker(log)
+    answers = worker.execute_batch([{'INPUT_VALUE': 1}, {'INPUT_VALUE': 13}, {'INPUT_VALUE': 'x'}], [20, 21, 22])
+    assert answers[0] == {'output_value': '1+7=8 PREDICTED'}
+    assert answers[1] == {'output_value': '13+7=20 PREDICTED'}
+    assert '_CapturingFakeWorker_ERROR' in answers[2]
+    notifs = worker.get_notifications()
+    assert any(notif['NOTIFICATION_TYPE'] == 'exception' for notif in notifs)
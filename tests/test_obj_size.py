@@ -0,0 +1,53 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: deep object sizes
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+class TestObjSize:
+
+  def test_deep_nesting_beyond_the_recursion_limit(self, log):
+    obj = []
+    for _ in range(sys.getrecursionlimit() * 2):
+      obj = [obj]
+    assert log.get_obj_size(obj) >= sys.getsizeof([[]]) * sys.getrecursionlimit()
+
+  def test_numpy_views_count_the_buffer_once(self, log):
+    arr = np.zeros(1_000_000, dtype=np.uint8)
+    size_one = log.get_obj_size([arr])
+    size_views = log.get_obj_size([arr, arr[:10], arr[10:], arr.reshape(1000, 1000)])
+    assert size_one >= arr.nbytes
+    assert size_views < 2 * arr.nbytes
+
+  def test_pandas_and_breakdown(self, log):
+    df = pd.DataFrame({'a': np.arange(10_000), 'b': ['x' * 20] * 10_000})
+    size, breakdown = log.get_obj_size({'df': df}, return_breakdown=True)
+    assert size >= df.memory_usage(deep=True).sum()
+    assert list(breakdown)[0] == 'pandas.DataFrame'
+
+  def test_sampled_estimate(self, log):
+    obj = [str(i).zfill(20) for i in range(100_000)]
+    exact = log.get_obj_size(obj)
+    estimate = log.get_obj_size(obj, sample_threshold=1000, sample_size=100)
+    assert abs(estimate - exact) / exact < 0.05
@@ -0,0 +1,173 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: 'process' mode workers and the aggregation of their timers
+"""
+
+import threading
+import multiprocessing as mp
+
+import pytest
+
+from libraries import Logger
+
+FAKE_MODULE = 'libraries.model_server_v2.example_endpoints.fake'
+
+
+def _export_laps(log, laps, section='FakeWorker', sname='predict'):
+  """ timers of a 'remote' process in `export_timers_compact` format """
+  for _ in range(laps):
+    log.start_timer(sname, section=section)
+    log.end_timer(sname, section=section)
+  return log.export_timers_compact(selected_sections=[section])
+
+
+class _FakeWorkerProxy(object):
+  """ `ProcessWorkerProxy.export_timers` without the child process """
+  def __init__(self, dct_compact):
+    self.dct_compact = dct_compact
+    return
+
+  def export_timers(self, max_laps=100):
+    return self.dct_compact
+
+
+class _FakeWorkersPool(object):
+  def __init__(self, workers):
+    self.workers = workers
+    return
+
+
+class TestProcessWorkersTimers:
+
+  def _get_server(self, log, workers):
+    from libraries.model_server_v2.server import FlaskModelServer
+    server = FlaskModelServer.__new__(FlaskModelServer)
+    server.log = log
+    server._config_endpoint = {'WORKER_MODE': 'process'}
+    server._workers_pool = _FakeWorkersPool(workers)
+    server._workers_timers_sections = {}
+    server._workers_merged_sections = set()
+    return server
+
+  def test_scrape_keeps_server_counters(self, log, tmp_path):
+    remote = Logger('REMOTE', base_folder=str(tmp_path), app_folder='_remote', TF_KERAS=False)
+    dct_compact = _export_laps(remote, 10)
+    # the server process has its own sections with the same names
+    for _ in range(3):
+      log.start_timer('predict', section='FakeWorker')
+      log.end_timer('predict', section='FakeWorker')
+    server = self._get_server(log, [_FakeWorkerProxy(dct_compact), _FakeWorkerProxy(dct_compact)])
+    for _ in range(2):
+      server._sync_process_workers_timers()
+    assert log.get_timer_count('predict', section='FakeWorker') == 3
+    assert log.get_timer_count('predict', section='W0:FakeWorker') == 10
+    assert log.get_timer_count('predict', section='WORKERS:FakeWorker') == 20
+
+  def test_scrape_keeps_user_sections(self, log, tmp_path):
+    remote = Logger('REMOTE', base_folder=str(tmp_path), app_folder='_remote', TF_KERAS=False)
+    log.start_timer('mine', section='W7:custom')
+    log.end_timer('mine', section='W7:custom')
+    server = self._get_server(log, [_FakeWorkerProxy(_export_laps(remote, 5))])
+    server._sync_process_workers_timers()
+    assert log.get_timer_count('mine', section='W7:custom') == 1
+
+  def test_sections_no_longer_reported_are_dropped(self, log, tmp_path):
+    remote = Logger('REMOTE', base_folder=str(tmp_path), app_folder='_remote', TF_KERAS=False)
+    dct_compact = {**_export_laps(remote, 5, section='OLD'), **_export_laps(remote, 5)}
+    worker = _FakeWorkerProxy(dct_compact)
+    server = self._get_server(log, [worker])
+    server._sync_process_workers_timers()
+    assert log.get_timer_count('predict', section='WORKERS:OLD') == 5
+    # e.g. the child process was restarted
+    worker.dct_compact = {'FakeWorker': worker.dct_compact['FakeWorker']}
+    server._sync_process_workers_timers()
+    assert 'W0:OLD' not in log.timers
+    assert 'WORKERS:OLD' not in log.timers
+    assert log.get_timer_count('predict', section='WORKERS:FakeWorker') == 5
+
+  def test_metrics_count_worker_laps_once(self, log, tmp_path):
+    remote = Logger('REMOTE', base_folder=str(tmp_path), app_folder='_remote', TF_KERAS=False)
+    dct_compact = _export_laps(remote, 5)
+    server = self._get_server(log, [_FakeWorkerProxy(dct_compact), _FakeWorkerProxy(dct_compact)])
+    server._sync_process_workers_timers()
+    sections = server._get_metrics_sections()
+    assert 'WORKERS:FakeWorker' in sections
+    assert not any(x.startswith(('W0:', 'W1:')) for x in sections)
+    str_metrics = log.export_metrics(selected_sections=sections)
+    assert 'section="WORKERS:FakeWorker"' in str_metrics
+    assert 'section="W0:FakeWorker"' not in str_metrics
+
+  def test_busy_workers_keep_their_timers(self, log, tmp_path):
+    remote = Logger('REMOTE', base_folder=str(tmp_path), app_folder='_remote', TF_KERAS=False)
+    worker = _FakeWorkerProxy(_export_laps(remote, 5))
+    server = self._get_server(log, [worker])
+    server._sync_process_workers_timers()
+    worker.dct_compact = None
+    server._sync_process_workers_timers()
+    assert log.get_timer_count('predict', section='WORKERS:FakeWorker') == 5
+
+  def test_thread_mode_is_not_scraped(self, log):
+    server = self._get_server(log, [_FakeWorkerProxy({'X': {}})])
+    server._config_endpoint = {'WORKER_MODE': 'thread'}
+    server._sync_process_workers_timers()
+    assert 'W0:X' not in log.timers
+
+
+@pytest.mark.skipif('fork' not in mp.get_all_start_methods(), reason="requires the 'fork' start method")
+
+
+class TestProcessWorkerProxy:
+
+  @pytest.fixture
+  def proxy(self, log):
+    from libraries.model_server_v2.process_worker import ProcessWorkerProxy
+    proxy = ProcessWorkerProxy(
+      log=log, module_name=FAKE_MODULE, class_name='FakeWorker',
+      worker_kwargs=dict(default_config={'ADD': 7}, verbosity_level=1, worker_id=0),
+      start_method='fork', request_timeout=30,
+    )
+    assert proxy.wait_ready()
+    yield proxy
+    proxy.shutdown()
+
+  def test_execute(self, proxy):
+    assert proxy.execute({'INPUT_VALUE': 5}, counter=1) == {'output_value': '5+7=12 PREDICTED'}
+    assert proxy.execute_batch([{'INPUT_VALUE': 1}, {'INPUT_VALUE': 2}], [2, 3]) == [
+      {'output_value': '1+7=8 PREDICTED'}, {'output_value': '2+7=9 PREDICTED'}
+    ]
+
+  def test_notifications_do_not_wait_for_the_child(self, proxy):
+    proxy.get_notifications()
+    answer = proxy.execute({'INPUT_VALUE': 'not a number'}, counter=1)
+    assert 'FakeWorker_ERROR' in answer
+    lst_notifs = []
+    # the pipe is busy - the relayed notifications are served by the proxy itself
+    with proxy._lock:
+      thr = threading.Thread(target=lambda: lst_notifs.extend(proxy.get_notifications()))
+      thr.start()
+      thr.join(timeout=5)
+    assert not thr.is_alive()
+    assert any(notif['MODULE'] == 'FakeWorker' for notif in lst_notifs)
+
+  def test_export_timers(self, proxy):
+    proxy.execute({'INPUT_VALUE': 5}, counter=1)
+    dct_compact = proxy.export_timers()
+    assert any(len(dct_section['TIMERS']) > 0 for dct_section in dct_compact.values())
+    with proxy._lock:
+      assert proxy.export_timers() is None # busy
@@ -0,0 +1,66 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: sampling profiler
+"""
+
+import os
+import queue
+import threading
+import time
+
+
+def get(stop):
+  """ busy user function named like a blocking call """
+  nr = 0
+  while not stop[0]:
+    nr += 1
+  return nr
+
+
+class TestSamplingProfiler:
+
+  def test_idle_threads_are_matched_by_module(self, log):
+    stop, waiting = [False], queue.Queue()
+    busy = threading.Thread(target=get, args=(stop,), name='busy')
+    blocked = threading.Thread(target=waiting.get, name='blocked')
+    busy.start()
+    blocked.start()
+    try:
+      time.sleep(0.05)
+      thread_names = {}
+      for _ in range(20):
+        log._sample_stacks(threading.get_ident(), thread_names, max_depth=128, include_idle=False)
+        time.sleep(0.001)
+    finally:
+      stop[0] = True
+      waiting.put(None)
+      busy.join()
+      blocked.join()
+    threads = [key.split(';')[0] for key in log.get_sampling_profile()]
+    assert 'busy' in threads
+    assert 'blocked' not in threads
+    assert any(label.startswith('get (test_profiler.py') for label, _, _ in log.get_sampling_profile_top()[0])
+
+  def test_profiler_saves_the_folded_stacks(self, log):
+    log.start_sampling_profiler(interval_ms=1)
+    time.sleep(0.05)
+    paths = log.stop_sampling_profiler(fname='prof')
+    assert log._profiler_nr_samples > 0
+    assert sorted(paths) == ['FOLDED', 'TOP']
+    assert all(os.path.isfile(x) for x in paths.values())
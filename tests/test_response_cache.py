@@ -0,0 +1,77 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: LRU/TTL response cache
+"""
+
+import time
+
+import pytest
+
+from libraries.model_server_v2.response_cache import ResponseCache
+
+
+class TestResponseCache:
+
+  def test_key_ignores_call_fields(self):
+    cache = ResponseCache()
+    key = cache.get_key({'INPUT': 1, 'counter': 5, 'signature': 'a'})
+    assert key == cache.get_key({'counter': 6, 'INPUT': 1})
+    assert key != cache.get_key({'INPUT': 2})
+    assert ResponseCache(key_fields=['INPUT']).get_key({'INPUT': 1, 'OTHER': 2}) == \
+      ResponseCache(key_fields=['INPUT']).get_key({'INPUT': 1, 'OTHER': 3})
+
+  def test_hits_misses_and_copies(self):
+    cache = ResponseCache()
+    assert cache.get('k') is None
+    answer = {'RESULT': [1, 2]}
+    cache.put('k', answer, signature='sig')
+    answer['RESULT'].append(3)
+    cached, signature = cache.get('k')
+    assert (cached, signature) == ({'RESULT': [1, 2]}, 'sig')
+    cached['RESULT'].append(4)
+    assert cache.get('k')[0] == {'RESULT': [1, 2]}
+    stats = cache.get_stats()
+    assert (stats['HITS'], stats['MISSES']) == (2, 1)
+    assert stats['HIT_RATIO'] == pytest.approx(2 / 3)
+
+  def test_lru_eviction(self):
+    cache = ResponseCache(size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a')[0] == 1 and cache.get('c')[0] == 3
+    assert cache.evictions == 1
+    assert len(cache) == 2
+
+  def test_ttl(self):
+    cache = ResponseCache(ttl=0.05)
+    cache.put('a', 1)
+    assert cache.get('a')[0] == 1
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+  def test_export_metrics(self):
+    cache = ResponseCache()
+    cache.get('a')
+    lines = cache.export_metrics(prefix='lummetry', labels='endpoint="x"')
+    assert 'lummetry_response_cache_misses_total{endpoint="x"} 1' in lines
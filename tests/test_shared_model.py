@@ -0,0 +1,65 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: workers sharing one read-only model
+"""
+
+import pytest
+
+from libraries.model_server_v2.worker import FlaskWorker
+from libraries.model_server_v2.example_endpoints.fake import FakeWorker
+from libraries.model_server_v2.example_endpoints.fake_batch import FakeBatchWorker, _CONFIG as FAKE_BATCH_CONFIG
+
+
+@pytest.fixture(autouse=True)
+def shared_models(monkeypatch):
+  monkeypatch.setattr(FlaskWorker, '_shared_models', {})
+  return
+
+
+def _get_worker(log, worker_class, default_config, worker_id=0):
+  return worker_class(
+    log=log, default_config=default_config, verbosity_level=1, worker_id=worker_id,
+    upstream_config={'SHARED_MODEL': True, 'MODEL_SIZE_MB': 1},
+  )
+
+
+class TestSharedModel:
+
+  def test_workers_share_one_model(self, log):
+    workers = [_get_worker(log, FakeBatchWorker, FAKE_BATCH_CONFIG, worker_id=i) for i in range(3)]
+    assert all(x.model is workers[0].shared_model for x in workers)
+    info = list(FakeBatchWorker.get_shared_models_info().values())
+    assert len(info) == 1 and info[0]['NR_WORKERS'] == 3
+
+  def test_preloaded_model_is_reused(self, log):
+    model = FakeBatchWorker.preload_shared_model(
+      log=log, default_config=FAKE_BATCH_CONFIG, verbosity_level=1, worker_id=-1,
+      upstream_config={'SHARED_MODEL': True, 'MODEL_SIZE_MB': 1},
+    )
+    worker = _get_worker(log, FakeBatchWorker, FAKE_BATCH_CONFIG)
+    assert worker.model is model
+    assert list(FakeBatchWorker.get_shared_models_info().values())[0]['NR_WORKERS'] == 1
+
+  def test_fallback_to_load_model(self, log):
+    assert not FakeWorker.implements_shared_model()
+    assert FakeWorker.preload_shared_model(log=log, default_config={'ADD': 7}, verbosity_level=1, worker_id=-1) is None
+    worker = _get_worker(log, FakeWorker, {'ADD': 7})
+    assert worker.shared_model is None
+    assert worker.execute({'INPUT_VALUE': 1}, counter=1) == {'output_value': '1+7=8 PREDICTED'}
+    assert FlaskWorker.get_shared_models_info() == {}
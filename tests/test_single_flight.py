@@ -0,0 +1,97 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: single-flight coalescing of identical requests
+"""
+
+import time
+import threading
+
+from libraries.model_server_v2.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+
+  def test_identical_calls_are_coalesced(self):
+    single_flight = SingleFlight()
+    nr_threads = 8
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def compute():
+      calls.append(1)
+      started.set()
+      release.wait()
+      return {'RESULT': 42}
+
+    def run():
+      results.append(single_flight.do('key', compute))
+      return
+
+    leader = threading.Thread(target=run)
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=run) for _ in range(nr_threads - 1)]
+    for thr in followers:
+      thr.start()
+    while single_flight.nr_coalesced < nr_threads - 1:
+      time.sleep(0.001)
+    release.set()
+    for thr in [leader] + followers:
+      thr.join()
+    assert len(calls) == 1
+    assert sorted(coalesced for _, coalesced in results) == [False] + [True] * (nr_threads - 1)
+    assert all(result == {'RESULT': 42} for result, _ in results)
+    # each caller owns its result
+    assert len(set(id(result) for result, _ in results)) == nr_threads
+    assert single_flight.get_stats() == {'CALLS': 1, 'COALESCED': nr_threads - 1, 'INFLIGHT': 0}
+
+  def test_exceptions_are_raised_in_all_callers(self):
+    single_flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def compute():
+      started.set()
+      release.wait()
+      raise ValueError('bad input')
+
+    def run():
+      try:
+        single_flight.do('key', compute)
+      except ValueError as exc:
+        errors.append(exc)
+      return
+
+    threads = [threading.Thread(target=run)]
+    threads[0].start()
+    started.wait()
+    threads.append(threading.Thread(target=run))
+    threads[1].start()
+    while single_flight.nr_coalesced < 1:
+      time.sleep(0.001)
+    release.set()
+    for thr in threads:
+      thr.join()
+    assert len(errors) == 2
+    assert single_flight.nr_inflight == 0
+
+  def test_sequential_calls_are_not_coalesced(self):
+    single_flight = SingleFlight()
+    assert single_flight.do('key', lambda: 1) == (1, False)
+    assert single_flight.do('key', lambda: 2) == (2, False)
@@ -0,0 +1,406 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: timers counters, handles, statistics, export/import and archiving
+"""
+
+import json
+import os
+import threading
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from libraries.logger_mixins.timers_mixin import (
+  DEFAULT_PERCENTILES, FOLD_SIZE, HIST_PRECISION, MAX_LAPS,
+)
+
+
+def _run_laps(log, sname, nr_laps, section=None):
+  for _ in range(nr_laps):
+    log.start_timer(sname, section=section)
+    log.end_timer(sname, section=section)
+  return
+
+
+class TestTimersThreads:
+
+  def test_threads(self, log):
+    nr_threads, nr_laps = 8, 2_000
+    barrier = threading.Barrier(nr_threads)
+
+    def run():
+      barrier.wait() # all the threads race to create the timer
+      _run_laps(log, 'thread', nr_laps, section='T')
+      return
+
+    threads = [threading.Thread(target=run) for _ in range(nr_threads)]
+    for thr in threads:
+      thr.start()
+    for thr in threads:
+      thr.join()
+    tmr = log.get_timer('thread', section='T')
+    assert tmr['COUNT'] == nr_threads * nr_laps
+    assert tmr['START_COUNT'] == nr_threads * nr_laps
+
+  def test_timer_ended_by_another_thread(self, log):
+    section = log.default_timers_section
+    for _ in range(3):
+      log.start_timer('job')
+      thr = threading.Thread(target=log.end_timer, args=('job',))
+      thr.start()
+      thr.join()
+    # nothing left opened on the starting thread
+    assert all(len(stack) == 0 for stack in log.opened_timers[section].values())
+    assert log.get_faulty_timers()[section] == []
+    tmr = log.get_timer('job')
+    assert tmr['COUNT'] == tmr['START_COUNT'] == tmr['STOP_COUNT'] == 3
+    assert tmr['MIN'] > 0
+    _run_laps(log, 'after', 5)
+    assert log.get_timer('after')['LEVEL'] == 0
+    assert list(log.timers_graph[section]['ROOT']['SLOW']) == ['job', 'after']
+    # the top level laps are back on the fast path
+    assert log.timer('after')._root_ready
+
+  def test_nested_timers_graph(self, log):
+    for _ in range(10):
+      log.start_timer('outer')
+      _run_laps(log, 'inner', 3)
+      log.end_timer('outer')
+    assert log.get_timer_count('outer') == 10
+    assert log.get_timer_count('inner') == 30
+    assert log.get_timer('inner')['LEVEL'] == 1
+    graph = log.timers_graph[log.default_timers_section]
+    assert list(graph['ROOT']['SLOW']) == ['outer']
+    assert list(graph['outer']['SLOW']) == ['inner']
+    assert any(line.strip().startswith('outer = ') for line in log.format_timers())
+
+
+class TestTimerHandles:
+
+  def test_fast_path_counts(self, log):
+    nr_laps = 3 * FOLD_SIZE + 17 # folded in batches and on read
+    _run_laps(log, 'loop', nr_laps)
+    tmr = log.get_timer('loop')
+    assert tmr['COUNT'] == nr_laps
+    assert tmr['START_COUNT'] == nr_laps
+    assert tmr['STOP_COUNT'] == nr_laps
+    assert 0 <= tmr['MIN'] <= tmr['MEAN'] <= tmr['MAX']
+
+  def test_handle_context_and_decorator_share_the_timer(self, log):
+    handle = log.timer('work', section='S')
+    for _ in range(5):
+      handle.start()
+      handle.end()
+    for _ in range(5):
+      with log.timer('work', section='S'):
+        pass
+
+    @log.timed('work', section='S')
+    def work():
+      return 1
+
+    assert sum(work() for _ in range(5)) == 5
+    _run_laps(log, 'work', 5, section='S')
+    assert log.get_timer_count('work', section='S') == 20
+    assert log.get_timer('work', section='S')['START_COUNT'] == 20
+
+  def test_skip_first_timing(self, log):
+    for _ in range(4):
+      log.start_timer('warm')
+      log.end_timer('warm', skip_first_timing=True)
+    assert log.get_timer_count('warm') == 3
+
+
+class TestTimersSwitches:
+
+  def test_debug_off_stubs(self, log):
+    handle = log.timer('a')
+
+    @log.timed('a')
+    def work():
+      return 1
+
+    _run_laps(log, 'a', 2)
+    log.DEBUG = False
+    assert log.timer('b') is log.timer('c')
+    _run_laps(log, 'a', 5)
+    _run_laps(log, 'b', 5)
+    with handle:
+      pass
+    assert work() == 1
+    assert log.get_timer_count('a') == 2
+    assert 'b' not in log.timers[log.default_timers_section]
+    # timers started before turning DEBUG off are dropped on turning it on
+    log.DEBUG = True
+    log.start_timer('open')
+    log.DEBUG = False
+    log.DEBUG = True
+    assert all(len(x) == 0 for x in log.opened_timers[log.default_timers_section].values())
+    handle.start()
+    handle.end()
+    assert work() == 1
+    assert log.get_timer_count('a') == 4
+
+  def test_disabled_section(self, log):
+    handle = log.timer('a', section='OFF')
+    _run_laps(log, 'a', 2, section='OFF')
+    log.disable_timers_section('OFF')
+    _run_laps(log, 'a', 5, section='OFF')
+    with handle:
+      pass
+    _run_laps(log, 'a', 3, section='ON')
+    assert log.get_timer_count('a', section='OFF') == 2
+    assert log.get_timer_count('a', section='ON') == 3
+    log.enable_timers_section('OFF')
+    handle.start()
+    handle.end()
+    assert log.get_timer_count('a', section='OFF') == 3
+
+
+class TestTimersStatistics:
+
+  def test_statistics(self, log):
+    laps = np.array([0.001, 0.002, 0.004, 0.008])
+    handle = log.timer('stats')
+    for lap in laps:
+      handle._pending.append(lap)
+    tmr = log.get_timer('stats')
+    assert tmr['COUNT'] == len(laps)
+    assert tmr['MEAN'] == pytest.approx(laps.mean())
+    assert log.get_timer_std('stats') == pytest.approx(laps.std())
+    assert (tmr['MIN'], tmr['MAX']) == (laps.min(), laps.max())
+
+  def test_lifetime_percentiles(self, log):
+    laps = np.random.default_rng(0).lognormal(mean=-6, sigma=1, size=10 * MAX_LAPS)
+    handle = log.timer('latency')
+    for lap in laps:
+      handle._pending.append(lap)
+    lifetime = log.get_timer_percentiles('latency')
+    window = log.get_timer_percentiles('latency', window=True)
+    assert list(lifetime) == DEFAULT_PERCENTILES
+    for prc in DEFAULT_PERCENTILES:
+      # the histogram covers all the laps within its relative precision
+      assert lifetime[prc] == pytest.approx(np.percentile(laps, prc), rel=2 * HIST_PRECISION)
+      assert window[prc] == pytest.approx(np.percentile(laps[-MAX_LAPS:], prc))
+    assert log.get_timer_percentiles('missing') == {prc: -1 for prc in DEFAULT_PERCENTILES}
+    assert any('p95: ' in line for line in log.format_timers())
+
+
+class TestTimersOverhead:
+
+  def test_format_timers_does_not_calibrate(self, log):
+    _run_laps(log, 'a', 5)
+    assert log.get_timers_overhead() is None
+    log.format_timers()
+    assert log._timers_overhead is None
+
+  def test_calibration_leaves_the_timers_untouched(self, log):
+    _run_laps(log, 'a', 3, section='S1')
+    log.set_timers_limits(max_sections=2)
+    handle = log.timer('a', section='S1')
+    sections, archived = list(log.timers), list(log.timers_archive)
+    overhead = log.calibrate_timers_overhead(nr_iters=200, verbose=False)
+    assert overhead['PAIR'] >= 0 and overhead['LAP'] >= 0
+    assert list(log.timers) == sections
+    assert list(log.timers_archive) == archived
+    assert not log._timers_overhead_correction
+    assert not handle._stale
+    assert log.get_timers_overhead('S1') == pytest.approx(3 * overhead['FAST_PAIR'])
+
+
+class TestTimersTracing:
+
+  def test_trace_export(self, log):
+    log.start_tracing(max_spans=100)
+    for _ in range(3):
+      log.start_timer('outer', section='S')
+      _run_laps(log, 'inner', 2, section='S')
+      log.end_timer('outer', section='S')
+    log.stop_tracing()
+    _run_laps(log, 'untraced', 5, section='S')
+    spans = log.get_trace_spans()
+    assert [x[0] for x in spans].count('outer') == 3
+    assert [x[0] for x in spans].count('inner') == 6
+    assert 'untraced' not in [x[0] for x in spans]
+    with open(log.export_trace(fname='trace.json', clear=True)) as fh:
+      trace = json.load(fh)
+    events = [x for x in trace['traceEvents'] if x['ph'] == 'X' and x['cat'] == 'S']
+    assert len(events) == 9
+    assert all(x['dur'] >= 0 for x in events)
+    # the inner spans are nested in their outer span
+    outer = [x for x in events if x['name'] == 'outer']
+    for event in events:
+      if event['name'] == 'inner':
+        assert any(o['ts'] <= event['ts'] and event['ts'] + event['dur'] <= o['ts'] + o['dur'] for o in outer)
+    assert log.get_trace_spans() == []
+
+  def test_max_spans(self, log):
+    log.start_tracing(max_spans=10)
+    _run_laps(log, 'a', 25)
+    assert len(log.get_trace_spans()) == 10
+
+
+class TestTimersResources:
+
+  def test_cpu_and_memory(self, log):
+    log.enable_timers_resources(cpu=True, memory=True)
+    try:
+      for _ in range(3):
+        with log.timer('work'):
+          data = [bytes(1_000) for _ in range(1_000)]
+          sum(i * i for i in range(100_000))
+      tmr = log.get_timer('work')
+      assert tmr['RES_COUNT'] == 3
+      assert tmr['CPU_THREAD'] > 0 and tmr['CPU_PROCESS'] >= tmr['CPU_THREAD'] * 0.5
+      assert tmr['MEM_PEAK'] >= len(data) * 1_000
+    finally:
+      log.disable_timers_resources()
+    assert not tracemalloc.is_tracing()
+    _run_laps(log, 'work', 2)
+    assert log.get_timer('work')['RES_COUNT'] == 3
+
+
+class TestTimersExport:
+
+  def test_compact_round_trip(self, log):
+    _run_laps(log, 'a', 50, section='S')
+    log.start_timer('b', section='S')
+    _run_laps(log, 'c', 5, section='S')
+    log.end_timer('b', section='S')
+    dct_compact = json.loads(json.dumps(log.export_timers_compact(max_laps=10)))
+    assert log.import_timers_compact(dct_compact, section_prefix='W0:') == [
+      'W0:' + x for x in dct_compact
+    ]
+    for sname in ['a', 'b', 'c']:
+      src, dst = log.get_timer(sname, section='S'), log.get_timer(sname, section='W0:S')
+      for key in ['COUNT', 'START_COUNT', 'MEAN', 'MIN', 'MAX', 'M2']:
+        assert dst[key] == pytest.approx(src[key])
+    assert len(log.get_timer('a', section='W0:S')['LAPS']) == 10
+    assert list(log.timers_graph['W0:S']['b']['SLOW']) == ['c']
+    assert log.get_timer_percentiles('a', section='W0:S') == pytest.approx(log.get_timer_percentiles('a', section='S'))
+
+  def test_export_import_section(self, log):
+    _run_laps(log, 'a', 7, section='S')
+    dct_timers, dct_graph = log.export_timers_section('S')
+    assert dct_timers['a']['COUNT'] == 7
+    assert not log.import_timers_section(dct_timers, dct_graph, section='S')
+    assert log.import_timers_section(dct_timers, dct_graph, section='S2')
+    assert log.get_timer_count('a', section='S2') == 7
+
+  def test_merge_sections(self, log):
+    _run_laps(log, 'a', 10, section='S1')
+    _run_laps(log, 'a', 30, section='S2')
+    _run_laps(log, 'b', 5, section='S2')
+    t1, t2 = log.get_timer('a', section='S1'), log.get_timer('a', section='S2')
+    laps = np.concatenate([np.array(t1['LAPS']), np.array(t2['LAPS'])])
+    assert log.merge_timers_sections(['S1', 'S2'], target_section='ALL')
+    merged = log.get_timer('a', section='ALL')
+    assert merged['COUNT'] == 40
+    assert merged['START_COUNT'] == 40
+    assert merged['MEAN'] == pytest.approx(laps.mean())
+    assert log.get_timer_std('a', section='ALL') == pytest.approx(laps.std())
+    assert merged['MAX'] == max(t1['MAX'], t2['MAX'])
+    assert log.get_timer_count('b', section='ALL') == 5
+    # the merged sections are left untouched
+    assert log.get_timer_count('a', section='S1') == 10
+
+  def test_export_metrics(self, log):
+    _run_laps(log, 'a', 20, section='S"1')
+    text = log.export_metrics(selected_sections=['S"1'])
+    lines = text.splitlines()
+    assert lines[-1] == '# EOF'
+    labels = 'section="S\\"1",timer="a",process="{}:{}"'.format(log.__lib__, os.getpid())
+    samples = dict(line.rsplit(' ', 1) for line in lines if not line.startswith('#'))
+    assert samples['lummetry_timer_seconds_count{{{}}}'.format(labels)] == '20'
+    assert samples['lummetry_timer_starts_total{{{}}}'.format(labels)] == '20'
+    tmr = log.get_timer('a', section='S"1')
+    assert float(samples['lummetry_timer_seconds_sum{{{}}}'.format(labels)]) == pytest.approx(tmr['MEAN'] * 20)
+    for prc in DEFAULT_PERCENTILES:
+      assert 'lummetry_timer_seconds{{{},quantile="{}"}}'.format(labels, prc / 100) in samples
+    assert '# TYPE lummetry_timer_seconds summary' in lines
+    assert '# UNIT lummetry_timer_seconds seconds' in lines
+    # resources are exported only when tracked
+    assert not any(x.startswith('lummetry_timer_thread_cpu_seconds') for x in samples)
+    assert log.export_metrics(selected_sections=['missing']).count('{') == 0
+
+  def test_pending_laps_are_flushed_for_readers(self, log):
+    _run_laps(log, 'a', 5, section='S')
+    handle = log.timer('a', section='S')
+    assert len(handle._pending) > 0
+    assert log.export_timers_compact()['S']['TIMERS']['a']['COUNT'] == 5
+    assert len(handle._pending) == 0
+
+
+class TestTimersSnapshots:
+
+  def test_snapshot_round_trip(self, log):
+    _run_laps(log, 'a', 5)
+    path = log.save_timers_snapshot(verbose=False)
+    baseline = log.load_timers_snapshot(path)
+    assert baseline['SECTIONS'][log.default_timers_section]['TIMERS']['a']['COUNT'] == 5
+    _run_laps(log, 'a', 5)
+    assert log.import_timers_compact(baseline['SECTIONS'], section_prefix='OLD:')
+    assert log.get_timer_count('a', section='OLD:' + log.default_timers_section) == 5
+
+  def test_compare_single_lap_timers(self, log):
+    _run_laps(log, 'a', 1)
+    baseline = log.load_timers_snapshot(log.save_timers_snapshot(verbose=False))
+    _run_laps(log, 'a', 1)
+    df = log.compare_timers(baseline, min_count=1, verbose=False)
+    row = df[df['TIMER'] == 'a'].iloc[0]
+    assert row['STATUS'] in ['SAME', 'REGRESSION', 'IMPROVEMENT']
+    assert 0 <= row['MEAN_PVAL'] <= 1
+    assert log.compare_timers(baseline, min_count=0, verbose=False) is not None
+
+
+class TestTimersArchiving:
+
+  def test_max_sections_keeps_persistent_sections(self, log):
+    log.set_timers_section_persistent('KEEP')
+    _run_laps(log, 'a', 1, section='KEEP')
+    log.set_timers_limits(max_sections=3)
+    for section in ['S1', 'S2', 'S3']:
+      _run_laps(log, 'a', 1, section=section)
+    assert 'KEEP' in log.timers
+    assert log.default_timers_section in log.timers
+    assert len(log.timers) <= 3
+    assert 'S1' in log.timers_archive
+    assert log.timers_archive['S1']['TIMERS']['a']['COUNT'] == 1
+
+  def test_obsolete_sections_are_archived_only_on_request(self, log):
+    _run_laps(log, 'a', 1, section='OLD')
+    log.timer('a', section='OLD')._fold()
+    log.sections_last_used['OLD'] -= 10 * 3600
+    log.set_timers_limits()
+    assert 'OLD' in log.timers
+    log.set_timers_limits(archive_obsolete=True)
+    assert 'OLD' not in log.timers
+    assert 'OLD' in log.timers_archive
+
+  def test_delete_section(self, log):
+    handle = log.timer('a', section='TMP')
+    _run_laps(log, 'a', 3, section='TMP')
+    assert log.delete_timers_section('TMP')
+    assert 'TMP' not in log.timers
+    assert 'TMP' not in log.timers_archive
+    # stale handles re-create the section on their next use
+    handle.start()
+    handle.end()
+    assert log.get_timer_count('a', section='TMP') == 1
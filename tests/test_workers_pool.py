@@ -0,0 +1,82 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: FIFO workers pool
+"""
+
+import threading
+import time
+
+from libraries.model_server_v2.workers_pool import WorkersPool
+
+
+def _wait_for(condition, timeout=5):
+  t_end = time.time() + timeout
+  while not condition():
+    assert time.time() < t_end
+    time.sleep(0.001)
+  return
+
+
+class TestWorkersPool:
+
+  def test_free_workers(self):
+    pool = WorkersPool()
+    assert [pool.add_worker(x) for x in 'abc'] == [0, 1, 2]
+    assert len(pool) == 3 and pool.workers == ['a', 'b', 'c']
+    assert [pool.acquire() for _ in range(3)] == [0, 1, 2]
+    assert pool.nr_free == 0
+    pool.release(1)
+    assert pool.acquire() == 1
+
+  def test_waiters_are_served_in_arrival_order(self):
+    pool = WorkersPool()
+    pool.add_worker('a')
+    wid = pool.acquire()
+    served = []
+
+    def request(idx):
+      wid = pool.acquire(timeout=5)
+      served.append(idx)
+      pool.release(wid)
+      return
+
+    threads = []
+    for idx in range(5):
+      thr = threading.Thread(target=request, args=(idx,))
+      thr.start()
+      threads.append(thr)
+      _wait_for(lambda: pool.nr_waiting == idx + 1)
+    pool.release(wid)
+    for thr in threads:
+      thr.join()
+    assert served == list(range(5))
+    assert pool.nr_free == 1 and pool.nr_waiting == 0
+
+  def test_acquire_timeout(self):
+    pool = WorkersPool()
+    pool.add_worker('a')
+    wid = pool.acquire()
+    t_start = time.time()
+    assert pool.acquire(timeout=0.05) is None
+    assert time.time() - t_start >= 0.05
+    assert pool.nr_waiting == 0
+    # the released worker is not handed to the timed out caller
+    pool.release(wid)
+    assert pool.nr_free == 1
+    assert pool.acquire(timeout=0) == wid
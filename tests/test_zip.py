@@ -0,0 +1,88 @@
+"""
+Copyright 2019-2022 Lummetry.AI (Knowledge Investment Group SRL). All Rights Reserved.
+
+
+* NOTICE:  All information contained herein is, and remains
+* the property of Knowledge Investment Group SRL.
+* The intellectual and technical concepts contained
+* herein are proprietary to Knowledge Investment Group SRL
+* and may be covered by Romanian and Foreign Patents,
+* patents in process, and are protected by trade secret or copyright law.
+* Dissemination of this information or reproduction of this material
+* is strictly forbidden unless prior written permission is obtained
+* from Knowledge Investment Group SRL.
+
+
+@copyright: Lummetry.AI
+@author: Lummetry.AI - Laurentiu
+@project:
+@description: parallel zip archives writer
+"""
+
+import os
+import zipfile
+
+import numpy as np
+import pytest
+
+
+def _make_files(folder, nr_files, size, seed=0):
+  rnd = np.random.default_rng(seed)
+  words = np.array([b'alpha', b'beta', b'gamma', b'delta', b'epsilon'])
+  paths = []
+  for i in range(nr_files):
+    path = os.path.join(folder, 'file_{:02}.txt'.format(i))
+    with open(path, 'wb') as fh:
+      fh.write(b' '.join(rnd.choice(words, size=size // 5)))
+    paths.append(path)
+  return paths
+
+
+class TestZip:
+
+  def _check_zip(self, path_zip, paths):
+    with zipfile.ZipFile(path_zip) as zip:
+      assert zip.testzip() is None
+      assert zip.namelist() == [os.path.basename(x) for x in paths]
+      for path in paths:
+        with open(path, 'rb') as fh:
+          assert zip.read(os.path.basename(path)) == fh.read()
+    return
+
+  @pytest.mark.parametrize('nr_workers', [1, 4])
+  def test_add_files_to_zip(self, log, tmp_path, nr_workers):
+    paths = _make_files(str(tmp_path), nr_files=10, size=20_000)
+    path_zip = str(tmp_path / 'archive.zip')
+    assert log.add_files_to_zip(path_zip, paths, nr_workers=nr_workers) == path_zip
+    self._check_zip(path_zip, paths)
+
+  def test_parallel_zip_appends_in_order(self, log, tmp_path):
+    paths = _make_files(str(tmp_path), nr_files=9, size=10_000)
+    path_zip = str(tmp_path / 'archive.zip')
+    log.add_files_to_zip(path_zip, paths[:4], nr_workers=3)
+    # larger than `max_parallel_file_size` or missing files are written inline, in order
+    log.add_files_to_zip(path_zip, paths[4:] + [str(tmp_path / 'missing.txt')],
+                         nr_workers=3, max_parallel_file_size=5_000)
+    self._check_zip(path_zip, paths)
+
+  def test_parallel_zip64(self, log, tmp_path, monkeypatch):
+    paths = _make_files(str(tmp_path), nr_files=4, size=20_000)
+    path_zip = str(tmp_path / 'archive.zip')
+    monkeypatch.setattr(zipfile, 'ZIP64_LIMIT', 1_000)
+    assert log.add_files_to_zip(path_zip, paths, nr_workers=2) == path_zip
+    self._check_zip(path_zip, paths)
+    with zipfile.ZipFile(path_zip) as zip:
+      with open(path_zip, 'rb') as fh:
+        for zinfo in zip.infolist():
+          fh.seek(zinfo.header_offset + 28) # local header extra field length
+          assert int.from_bytes(fh.read(2), 'little') > 0
+
+  def test_parallel_zip64_not_allowed(self, log, tmp_path, monkeypatch):
+    path_file = _make_files(str(tmp_path), nr_files=1, size=20_000)[0]
+    with zipfile.ZipFile(str(tmp_path / 'archive.zip'), mode='w', allowZip64=False) as zip:
+      if not log._can_write_deflated_zip_member(zip):
+        pytest.skip('ZipFile internals not available')
+      monkeypatch.setattr(zipfile, 'ZIP64_LIMIT', 1_000)
+      with pytest.raises(zipfile.LargeZipFile):
+        log._write_deflated_zip_member(zip, path_file, 'file.txt', *log._deflate_zip_member(path_file, None))
+      monkeypatch.undo()
@@ -23,4 +23,4 @@ Copyright 2019-2021 Lummetry.AI (Knowledge Investment Group SRL). All Rights Res
 """
 
 
-__VER__ = '9.6.9'
\ No newline at end of file
+__VER__ = '9.7.24'
\ No newline at end of file